@@ -1,6 +1,10 @@
+from django import forms
 from django.contrib import admin
-from django.db import models
-from .models import Aluno, Atividade, Nota, HistoricoNota, CacaNiquel
+from .caca_niquel import tabela_premios
+from .caca_niquel_diario import totais_por_recompensa
+from .models import (
+    Aluno, Atividade, Nota, HistoricoNota, CacaNiquel, CacaNiquelDiario, OrcamentoPremios, Premio
+)
 
 
 @admin.register(Aluno)
@@ -102,12 +106,77 @@ class HistoricoNotaAdmin(admin.ModelAdmin):
         return False  # Não permite editar histórico
 
 
+@admin.register(Premio)
+class PremioAdmin(admin.ModelAdmin):
+    list_display = ('chave', 'emoji', 'rotulo', 'peso', 'chance', 'valor', 'estoque', 'classe_css', 'ativo', 'ordem')
+    list_filter = ('ativo',)
+    search_fields = ('chave', 'rotulo')
+    list_editable = ('peso', 'valor', 'estoque', 'ordem')
+    readonly_fields = ('data_atualizacao',)
+    
+    fieldsets = (
+        ('Prêmio', {
+            'fields': ('chave', 'rotulo', 'emoji', 'classe_css', 'ordem')
+        }),
+        ('Sorteio', {
+            'fields': ('peso', 'valor', 'estoque', 'ativo'),
+            'description': 'A chance de cada prêmio é o seu peso dividido pela soma dos pesos dos prêmios ativos.'
+        }),
+        ('Informações do Sistema', {
+            'fields': ('data_atualizacao',),
+            'classes': ('collapse',)
+        }),
+    )
+    
+    @admin.display(description='Chance')
+    def chance(self, obj):
+        return f'{tabela_premios().chance(obj.chave):.1f}%'
+    
+    def has_delete_permission(self, request, obj=None):
+        # As jogadas guardam a chave do prêmio: desative em vez de excluir
+        return False
+    
+    def save_model(self, request, obj, form, change):
+        if change and 'estoque' not in form.changed_data:
+            # O estoque é descontado pelas jogadas enquanto o formulário está aberto:
+            # só é gravado quando o próprio campo foi alterado
+            obj.save(update_fields=[
+                campo.name for campo in obj._meta.concrete_fields
+                if not campo.primary_key and campo.name != 'estoque'
+            ])
+        else:
+            super().save_model(request, obj, form, change)
+
+
+@admin.register(OrcamentoPremios)
+class OrcamentoPremiosAdmin(admin.ModelAdmin):
+    list_display = ('__str__', 'inicio', 'fim', 'limite', 'gasto', 'saldo')
+    date_hierarchy = 'inicio'
+    readonly_fields = ('gasto', 'saldo', 'data_atualizacao')
+    
+    fieldsets = (
+        ('Período', {
+            'fields': ('descricao', 'inicio', 'fim')
+        }),
+        ('Orçamento', {
+            'fields': ('limite', 'gasto', 'saldo'),
+            'description': 'Cada prêmio sorteado no período desconta o seu valor do orçamento. '
+                           'Quando o saldo não cobre o prêmio, a jogada cai para um prêmio mais barato.'
+        }),
+        ('Informações do Sistema', {
+            'fields': ('data_atualizacao',),
+            'classes': ('collapse',)
+        }),
+    )
+
+
 @admin.register(CacaNiquel)
 class CacaNiquelAdmin(admin.ModelAdmin):
     list_display = ('aluno', 'get_recompensa_display', 'data_jogada', 'resgatado', 'data_resgate', 'resgatado_por')
     list_filter = ('recompensa', 'resgatado', 'data_jogada')
     search_fields = ('aluno__nome', 'aluno__matricula')
     list_editable = ('resgatado',)
+    list_select_related = ('aluno', 'resgatado_por')
     readonly_fields = ('data_jogada', 'valor_recompensa')
     date_hierarchy = 'data_jogada'
     
@@ -120,6 +189,15 @@ class CacaNiquelAdmin(admin.ModelAdmin):
         }),
     )
     
+    def formfield_for_dbfield(self, db_field, request, **kwargs):
+        # As opções de recompensa vêm da configuração de prêmios
+        if db_field.name == 'recompensa':
+            return forms.ChoiceField(
+                choices=[(premio.chave, str(premio)) for premio in tabela_premios().premios.values()],
+                label=db_field.verbose_name,
+            )
+        return super().formfield_for_dbfield(db_field, request, **kwargs)
+    
     def save_model(self, request, obj, form, change):
         # Se está marcando como resgatado e não tinha sido resgatado antes
         if change and obj.resgatado and not obj.data_resgate:
@@ -131,20 +209,20 @@ class CacaNiquelAdmin(admin.ModelAdmin):
     # Estatísticas no admin
     def changelist_view(self, request, extra_context=None):
         extra_context = extra_context or {}
-        from django.db.models import Count
         
-        stats = CacaNiquel.objects.aggregate(
-            total_jogadas=Count('id'),
-            resgatados=Count('id', filter=models.Q(resgatado=True)),
-            pendentes=Count('id', filter=models.Q(resgatado=False))
-        )
+        # Lidas dos totais diários: o custo não cresce com o número de jogadas
+        por_recompensa = totais_por_recompensa()
+        total_jogadas = sum(totais.jogadas for totais in por_recompensa)
+        resgatados = sum(totais.resgatados for totais in por_recompensa)
+        stats = {
+            'total_jogadas': total_jogadas,
+            'resgatados': resgatados,
+            'pendentes': total_jogadas - resgatados,
+        }
         
-        recompensas_stats = (
-            CacaNiquel.objects
-            .values('recompensa')
-            .annotate(quantidade=Count('recompensa'))
-            .order_by('-quantidade')
-        )
+        recompensas_stats = [
+            {'recompensa': totais.chave, 'quantidade': totais.jogadas} for totais in por_recompensa
+        ]
         
         extra_context['stats'] = stats
         extra_context['recompensas_stats'] = recompensas_stats
@@ -152,6 +230,23 @@ class CacaNiquelAdmin(admin.ModelAdmin):
         return super().changelist_view(request, extra_context)
 
 
+@admin.register(CacaNiquelDiario)
+class CacaNiquelDiarioAdmin(admin.ModelAdmin):
+    list_display = ('dia', 'recompensa', 'jogadas', 'resgatados', 'pendentes', 'valor')
+    list_filter = ('recompensa',)
+    date_hierarchy = 'dia'
+    
+    # Totais mantidos pelas jogadas e resgates; para recalcular, use manage.py reconstruir_caca_niquel_diario
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+    
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
 # Configurações adicionais do admin
 admin.site.site_header = 'Sistema de Gamificação Escolar'
 admin.site.site_title = 'Gamificação'
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class GamificacaoConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'gamificacao'
+
+    def ready(self):
+        from . import signals  # noqa: F401
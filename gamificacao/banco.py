@@ -0,0 +1,105 @@
+"""
+Repetição de escritas quando o SQLite está bloqueado.
+
+Com o perfil de produção do SQLite (WAL e ``busy_timeout``, ver ``DATABASES``
+em settings.py) a maioria das disputas por escrita apenas espera o lock. Quando a espera se esgota, o SQLite
+levanta ``OperationalError: database is locked``; ``repetir_se_bloqueado``
+envolve a view de escrita em uma transação e, nesse caso, desfaz tudo e tenta
+de novo com espera exponencial (com variação aleatória, para que as
+requisições em disputa não voltem todas no mesmo instante). Esgotadas as
+tentativas, responde 503 com ``Retry-After``.
+
+``executar_com_repeticao`` faz o mesmo para uma função qualquer, como cada
+lote da importação de notas.
+"""
+import functools
+import logging
+import random
+import time
+
+from django.db import OperationalError, transaction
+from django.http import HttpResponse, JsonResponse
+
+logger = logging.getLogger(__name__)
+
+ERROS_BLOQUEIO = ('database is locked', 'database table is locked', 'database schema is locked')
+METODOS_ESCRITA = frozenset({'POST', 'PUT', 'PATCH', 'DELETE'})
+
+TENTATIVAS = 4
+ESPERA_INICIAL = 0.05  # segundos; dobra a cada tentativa
+ESPERA_MAXIMA = 1.0
+RETRY_AFTER = 1  # segundos sugeridos ao cliente na resposta 503
+
+
+def banco_bloqueado(erro):
+    """Indica se o erro é o SQLite recusando a operação por causa de um lock"""
+    return isinstance(erro, OperationalError) and any(
+        mensagem in str(erro).lower() for mensagem in ERROS_BLOQUEIO
+    )
+
+
+def _espera(tentativa):
+    """Espera exponencial com variação aleatória ("full jitter")"""
+    return random.uniform(0, min(ESPERA_MAXIMA, ESPERA_INICIAL * 2 ** tentativa))
+
+
+def executar_com_repeticao(funcao, *args, tentativas=TENTATIVAS, **kwargs):
+    """
+    Executa ``funcao`` em uma transação, repetindo enquanto o banco estiver bloqueado.
+
+    Dentro de uma transação já aberta não há o que repetir (o lock pertence à
+    transação externa), então a função é chamada diretamente.
+    """
+    if transaction.get_connection().in_atomic_block:
+        return funcao(*args, **kwargs)
+
+    for tentativa in range(tentativas):
+        try:
+            with transaction.atomic():
+                return funcao(*args, **kwargs)
+        except OperationalError as erro:
+            if not banco_bloqueado(erro) or tentativa == tentativas - 1:
+                raise
+            espera = _espera(tentativa)
+            logger.warning(
+                'Banco bloqueado em %s (tentativa %d de %d); repetindo em %.0f ms',
+                getattr(funcao, '__qualname__', funcao), tentativa + 1, tentativas, espera * 1000,
+            )
+            time.sleep(espera)
+
+
+def _resposta_bloqueado(request, resposta_json):
+    mensagem = 'O banco de dados está ocupado. Tente novamente em instantes.'
+    if resposta_json or request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+        resposta = JsonResponse({'sucesso': False, 'erro': mensagem}, status=503)
+    else:
+        resposta = HttpResponse(mensagem, status=503, content_type='text/plain; charset=utf-8')
+    resposta['Retry-After'] = str(RETRY_AFTER)
+    return resposta
+
+
+def repetir_se_bloqueado(view=None, *, metodos=METODOS_ESCRITA, resposta_json=False):
+    """
+    Decorator para views de escrita: transação por requisição com repetição em caso de lock.
+
+    Só age nos ``metodos`` informados (por padrão os de escrita); um GET
+    continua em autocommit. Use ``metodos=None`` para views que alteram dados
+    em qualquer método, e ``resposta_json=True`` para endpoints que o
+    JavaScript consome (o 503 vem no mesmo formato ``{'sucesso', 'erro'}``).
+    """
+    if view is None:
+        return functools.partial(repetir_se_bloqueado, metodos=metodos, resposta_json=resposta_json)
+
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if metodos is not None and request.method not in metodos:
+            return view(request, *args, **kwargs)
+        try:
+            return executar_com_repeticao(view, request, *args, **kwargs)
+        except OperationalError as erro:
+            if not banco_bloqueado(erro):
+                raise
+            logger.error('Banco bloqueado em %s após %d tentativas', request.path, TENTATIVAS)
+            return _resposta_bloqueado(request, resposta_json)
+
+    return wrapper
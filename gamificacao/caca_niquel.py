@@ -0,0 +1,434 @@
+"""
+Sorteio das recompensas do caça-níquel.
+
+Os prêmios são configurados no banco (modelo ``Premio``, editável no admin).
+Cada processo guarda uma cópia compilada da configuração (``TabelaPremios``),
+com as probabilidades já em uma tabela de alias (método de Vose): cada
+sorteio custa um número aleatório para escolher a coluna e outro para decidir
+entre a recompensa da coluna e o seu alias, sem percorrer a lista acumulada.
+
+A cópia vale enquanto o carimbo de versão guardado no cache não mudar; salvar
+ou excluir um ``Premio`` incrementa a versão após o commit (ver signals.py), e
+cada processo recompila na próxima jogada. No caminho quente, a jogada só lê
+a versão no cache (no máximo uma vez por ``INTERVALO_VERIFICACAO``, para que
+páginas com muitas jogadas não façam uma ida ao cache por linha) e nunca
+consulta a tabela de prêmios.
+
+Prêmios com estoque e o orçamento em dinheiro do período vigente
+(``OrcamentoPremios``) são descontados com UPDATEs condicionais
+(``... WHERE estoque > 0``), dentro da transação da jogada: o próprio banco
+decide quem leva a última unidade, sem verificação prévia em Python que
+pudesse ser atropelada por jogadas simultâneas. Se o prêmio sorteado se
+esgotou, a jogada cai para o próximo prêmio mais barato. Só prêmios com
+estoque ou valor geram esses UPDATEs (a tabela compilada já sabe quais são),
+e um lote faz um UPDATE por prêmio sorteado, não por jogada.
+
+A jogada individual e a jogada em lote usam o mesmo sorteador; o lote grava
+todas as jogadas com um único ``bulk_create``. Jogadas e resgates atualizam
+os totais diários (``caca_niquel_diario``) na mesma transação.
+"""
+import random
+import threading
+import time
+from decimal import Decimal
+from typing import NamedTuple
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, F, Q
+from django.utils import timezone
+
+from .caca_niquel_diario import acumular, serie_diaria, totais_por_recompensa, variacoes_jogadas, variacoes_resgate
+from .concorrencia import itens_da_pagina
+from .models import CacaNiquel, OrcamentoPremios, Premio
+from .paginacao import PaginadorCursor
+
+
+CHAVE_VERSAO = 'gamificacao:premios:versao'
+INTERVALO_VERIFICACAO = 1.0  # segundos entre consultas ao carimbo de versão no cache
+
+# Jogadas aceitas em uma única requisição de lote
+LIMITE_JOGADAS_LOTE = 200
+
+JOGADAS_POR_PAGINA = 20
+PREMIOS_POR_PAGINA = 24
+
+
+class SemPremiosAtivos(Exception):
+    """Levantada ao jogar sem nenhum prêmio ativo configurado"""
+
+
+class PremiosEsgotados(SemPremiosAtivos):
+    """Levantada quando o estoque ou o orçamento não cobre nenhum prêmio possível"""
+
+
+class ConfigPremio(NamedTuple):
+    """Cópia imutável de um ``Premio``, usada pelo sorteio e pela exibição"""
+    chave: str
+    rotulo: str
+    emoji: str
+    classe_css: str
+    peso: int
+    valor: Decimal
+    ativo: bool
+    limitado: bool = False  # tem estoque controlado
+
+    @property
+    def valor_centavos(self):
+        return int(self.valor * 100)
+
+    def __str__(self):
+        return f'{self.emoji} {self.rotulo}'.strip()
+
+    def exibicao(self):
+        """Dados de exibição no formato consumido pela página do caça-níquel"""
+        return {'tipo': self.chave, 'emoji': self.emoji, 'texto': self.rotulo, 'classe': self.classe_css}
+
+
+class SorteadorAlias:
+    """Tabela de alias para sortear recompensas com pesos em tempo constante"""
+
+    def __init__(self, pesos):
+        pesos = [(chave, peso) for chave, peso in pesos if peso > 0]
+        if not pesos:
+            raise ValueError('É preciso ao menos uma recompensa com peso positivo.')
+
+        self.chaves = [chave for chave, _ in pesos]
+        total = sum(peso for _, peso in pesos)
+        quantidade = len(pesos)
+
+        # Probabilidades escaladas para média 1; "pequenas" recebem o excesso das "grandes"
+        escaladas = [peso * quantidade / total for _, peso in pesos]
+        self.probabilidades = [1.0] * quantidade
+        self.alias = list(range(quantidade))
+        pequenas = [i for i, p in enumerate(escaladas) if p < 1.0]
+        grandes = [i for i, p in enumerate(escaladas) if p >= 1.0]
+        while pequenas and grandes:
+            pequena, grande = pequenas.pop(), grandes.pop()
+            self.probabilidades[pequena] = escaladas[pequena]
+            self.alias[pequena] = grande
+            escaladas[grande] -= 1.0 - escaladas[pequena]
+            (pequenas if escaladas[grande] < 1.0 else grandes).append(grande)
+        # O que sobrar (por arredondamento) fica com probabilidade 1
+
+        # Faixa de 1 a 100 de cada recompensa, só para exibição do "número sorteado"
+        self.faixas = {}
+        acumulado = 0
+        for chave, peso in pesos:
+            inicio = acumulado * 100 // total + 1
+            acumulado += peso
+            self.faixas[chave] = (inicio, max(inicio, acumulado * 100 // total))
+
+    def sortear(self, rng=random):
+        """Sorteia uma recompensa (dois números aleatórios, sem percorrer a lista)"""
+        coluna = rng.randrange(len(self.chaves))
+        if rng.random() < self.probabilidades[coluna]:
+            return self.chaves[coluna]
+        return self.chaves[self.alias[coluna]]
+
+
+class TabelaPremios:
+    """Configuração dos prêmios compilada: consulta por chave, sorteador e alternativas"""
+
+    def __init__(self, premios, orcamentos=()):
+        self.premios = {premio.chave: premio for premio in premios}
+        self.ativos = [premio for premio in self.premios.values() if premio.ativo and premio.peso > 0]
+        self.peso_total = sum(premio.peso for premio in self.ativos)
+        self.sorteador = (
+            SorteadorAlias((premio.chave, premio.peso) for premio in self.ativos) if self.ativos else None
+        )
+        # Períodos de orçamento: (id, início, fim)
+        self.orcamentos = list(orcamentos)
+
+        # Ordem de tentativa de cada prêmio: ele mesmo e depois os demais ativos
+        # de valor menor ou igual, do mais caro para o mais barato
+        por_valor = sorted(self.ativos, key=lambda premio: -premio.valor)
+        self.alternativas = {
+            premio.chave: [premio] + [
+                outro for outro in por_valor if outro is not premio and outro.valor <= premio.valor
+            ]
+            for premio in self.ativos
+        }
+
+    def premio(self, chave):
+        """Configuração do prêmio ``chave``; prêmios excluídos aparecem pela própria chave"""
+        try:
+            return self.premios[chave]
+        except KeyError:
+            return ConfigPremio(chave, chave, '🎁', 'premio-comum', 0, Decimal('0'), False)
+
+    def chance(self, chave):
+        """Probabilidade atual do prêmio, em %"""
+        premio = self.premio(chave)
+        if not (premio.ativo and self.peso_total):
+            return 0.0
+        return premio.peso * 100 / self.peso_total
+
+    def sortear(self, rng=random):
+        if self.sorteador is None:
+            raise SemPremiosAtivos('Nenhum prêmio ativo configurado para o caça-níquel.')
+        return self.sorteador.sortear(rng)
+
+    def numero(self, chave, rng=random):
+        """Número de 1 a 100 exibido para o prêmio entregue"""
+        return rng.randint(*self.sorteador.faixas[chave])
+
+    def orcamento_vigente(self, dia):
+        """Id do orçamento que cobre o dia, ou None se não há limite de gasto"""
+        for orcamento_id, inicio, fim in self.orcamentos:
+            if inicio <= dia <= fim:
+                return orcamento_id
+        return None
+
+
+def compilar_tabela():
+    """Lê a configuração do banco e monta a tabela de prêmios (duas consultas)"""
+    premios = (
+        ConfigPremio(chave, rotulo, emoji, classe_css, peso, valor, ativo, estoque is not None)
+        for chave, rotulo, emoji, classe_css, peso, valor, ativo, estoque in (
+            Premio.objects.order_by('ordem', 'chave').values_list(
+                'chave', 'rotulo', 'emoji', 'classe_css', 'peso', 'valor', 'ativo', 'estoque'
+            )
+        )
+    )
+    orcamentos = OrcamentoPremios.objects.order_by('inicio').values_list('pk', 'inicio', 'fim')
+    return TabelaPremios(premios, orcamentos)
+
+
+def versao_premios():
+    """Carimbo de versão da configuração, compartilhado entre os processos pelo cache"""
+    versao = cache.get(CHAVE_VERSAO)
+    if versao is None:
+        # Baseado no relógio, como em cache_ranking: nunca reaproveita uma versão antiga
+        cache.add(CHAVE_VERSAO, int(time.time() * 1000), timeout=None)
+        versao = cache.get(CHAVE_VERSAO)
+    return versao
+
+
+def _incrementar_versao():
+    global _verificada_em
+    # Neste processo a mudança vale de imediato; nos demais, na próxima verificação
+    _verificada_em = None
+    versao_premios()
+    try:
+        cache.incr(CHAVE_VERSAO)
+    except ValueError:
+        # Chave despejada entre as duas chamadas: uma nova versão já invalida as cópias
+        versao_premios()
+
+
+def invalidar_premios():
+    """Faz todos os processos recompilarem a tabela após o commit da transação atual"""
+    transaction.on_commit(_incrementar_versao)
+
+
+_compilada = (None, None)
+_verificada_em = None
+_lock_compilacao = threading.Lock()
+
+
+def tabela_premios():
+    """Tabela de prêmios deste processo, recompilada apenas quando a versão muda"""
+    global _compilada, _verificada_em
+    versao_compilada, tabela = _compilada
+    agora = time.monotonic()
+    if tabela is not None and _verificada_em is not None and agora - _verificada_em < INTERVALO_VERIFICACAO:
+        return tabela
+
+    versao = versao_premios()
+    _verificada_em = agora
+    if versao_compilada != versao:
+        with _lock_compilacao:
+            versao_compilada, tabela = _compilada
+            if versao_compilada != versao:
+                tabela = compilar_tabela()
+                _compilada = (versao, tabela)
+    return tabela
+
+
+def resultado_jogada(jogada, numero, tabela):
+    """Dados de uma jogada no formato consumido pela página do caça-níquel"""
+    return {
+        'aluno': jogada.aluno.nome,
+        'aluno_id': jogada.aluno_id,
+        'recompensa': tabela.premio(jogada.recompensa).exibicao(),
+        'numero_sorteado': numero,
+        'jogada_id': jogada.id,
+    }
+
+
+def reservar(premio, orcamento_id, quantidade=1):
+    """
+    Desconta ``quantidade`` unidades do estoque do prêmio e o valor delas do orçamento.
+
+    Cada desconto é um UPDATE condicional: só afeta a linha se ainda houver
+    estoque/saldo para todas as unidades, e o número de linhas afetadas diz
+    se a reserva valeu. Prêmios sem estoque controlado e sem valor não tocam
+    no banco.
+    """
+    if premio.limitado and not (
+        Premio.objects
+        .filter(chave=premio.chave, estoque__gte=quantidade)
+        .update(estoque=F('estoque') - quantidade)
+    ):
+        return False
+
+    custo = premio.valor_centavos * quantidade
+    if orcamento_id is not None and custo and not (
+        OrcamentoPremios.objects
+        .filter(pk=orcamento_id, gasto_centavos__lte=F('limite_centavos') - custo)
+        .update(gasto_centavos=F('gasto_centavos') + custo)
+    ):
+        if premio.limitado:
+            # Devolve as unidades reservadas acima (caso raro: havia estoque, mas não saldo)
+            Premio.objects.filter(chave=premio.chave).update(estoque=F('estoque') + quantidade)
+        return False
+
+    return True
+
+
+def premiar(tabela, sorteado, orcamento_id, esgotados):
+    """
+    Entrega o prêmio sorteado ou, se ele se esgotou, o próximo mais barato disponível.
+
+    ``esgotados`` guarda os prêmios já recusados nesta transação, para que as
+    demais jogadas do lote nem tentem o UPDATE.
+    """
+    for premio in tabela.alternativas[sorteado]:
+        if premio.chave in esgotados:
+            continue
+        if reservar(premio, orcamento_id):
+            return premio.chave
+        esgotados.add(premio.chave)
+        if not premio.limitado:
+            # Faltou saldo: prêmios de valor igual ou maior também não cabem mais
+            esgotados.update(outro.chave for outro in tabela.ativos if outro.valor >= premio.valor)
+    raise PremiosEsgotados('Os prêmios do caça-níquel se esgotaram (estoque ou orçamento do período).')
+
+
+def premiar_lote(tabela, sorteados, orcamento_id):
+    """
+    Reserva os prêmios sorteados agrupados por prêmio: um UPDATE por prêmio, não por jogada.
+
+    Só quando o estoque ou o saldo não cobre o grupo inteiro as jogadas desse
+    prêmio são resolvidas uma a uma, com a queda para prêmios mais baratos.
+    Retorna a chave entregue para cada jogada, na ordem de ``sorteados``.
+    """
+    grupos = {}
+    for indice, chave in enumerate(sorteados):
+        grupos.setdefault(chave, []).append(indice)
+
+    entregues = [None] * len(sorteados)
+    esgotados = set()
+    # Do mais caro para o mais barato: o orçamento vai primeiro para os prêmios maiores
+    for chave in sorted(grupos, key=lambda chave: -tabela.premios[chave].valor):
+        indices = grupos[chave]
+        if chave not in esgotados and reservar(tabela.premios[chave], orcamento_id, len(indices)):
+            for indice in indices:
+                entregues[indice] = chave
+        else:
+            for indice in indices:
+                entregues[indice] = premiar(tabela, chave, orcamento_id, esgotados)
+    return entregues
+
+
+def jogar(alunos, rng=random):
+    """
+    Sorteia uma recompensa para cada aluno e grava todas as jogadas em um INSERT.
+
+    ``alunos`` pode repetir o mesmo aluno (várias jogadas). Estoque e
+    orçamento são descontados na mesma transação das jogadas. Retorna a lista
+    de resultados, na ordem recebida, no formato de ``resultado_jogada``.
+    Levanta ``SemPremiosAtivos`` se não houver prêmio para sortear (ou
+    ``PremiosEsgotados`` se nenhum couber no estoque/orçamento).
+    """
+    tabela = tabela_premios()
+    orcamento_id = tabela.orcamento_vigente(timezone.localdate())
+    sorteados = [tabela.sortear(rng) for _ in alunos]
+    # Sem savepoint: dentro da transação da view, uma falha já desfaz tudo
+    with transaction.atomic(savepoint=False):
+        recompensas = premiar_lote(tabela, sorteados, orcamento_id)
+        jogadas = CacaNiquel.objects.bulk_create(
+            CacaNiquel(aluno=aluno, recompensa=recompensa) for aluno, recompensa in zip(alunos, recompensas)
+        )
+        acumular(variacoes_jogadas(jogadas, tabela))
+    return [
+        resultado_jogada(jogada, tabela.numero(jogada.recompensa, rng), tabela) for jogada in jogadas
+    ]
+
+
+def resgatar(usuario, jogada_ids=None, aluno_id=None):
+    """
+    Marca como resgatados os prêmios pendentes indicados, em um único UPDATE condicional.
+
+    Aceita uma lista de jogadas, os prêmios de um aluno ou ambos (interseção).
+    Só linhas com ``resgatado = false`` são afetadas, então um prêmio nunca é
+    entregue duas vezes, mesmo com cliques ou requisições simultâneas. Retorna
+    a quantidade de prêmios efetivamente resgatados.
+
+    Os resgates entram nos totais diários pelo dia da jogada; o agrupamento
+    é lido na mesma transação do UPDATE, que já detém o lock de escrita.
+    """
+    if jogada_ids is None and aluno_id is None:
+        raise ValueError('Informe as jogadas ou o aluno.')
+
+    pendentes = CacaNiquel.objects.filter(resgatado=False)
+    if jogada_ids is not None:
+        pendentes = pendentes.filter(pk__in=jogada_ids)
+    if aluno_id is not None:
+        pendentes = pendentes.filter(aluno_id=aluno_id)
+
+    with transaction.atomic(savepoint=False):
+        variacoes = variacoes_resgate(pendentes)
+        if not variacoes:
+            return 0
+        resgatados = pendentes.update(resgatado=True, data_resgate=timezone.now(), resgatado_por=usuario)
+        acumular(variacoes)
+    return resgatados
+
+
+def resumo_pendentes(tabela=None):
+    """
+    Totais dos prêmios pendentes em uma única consulta (``aggregate`` com contagens filtradas).
+
+    Retorna ``(total, valor_total, itens)``, com um item por prêmio
+    configurado: ``(config_premio, quantidade, valor)``.
+    """
+    tabela = tabela or tabela_premios()
+    contagens = CacaNiquel.objects.filter(resgatado=False).aggregate(
+        total=Count('pk'),
+        **{f'premio_{chave}': Count('pk', filter=Q(recompensa=chave)) for chave in tabela.premios},
+    )
+    itens = [
+        (premio, contagens[f'premio_{chave}'], premio.valor * contagens[f'premio_{chave}'])
+        for chave, premio in tabela.premios.items()
+    ]
+    return contagens['total'], sum((valor for _, _, valor in itens), Decimal('0')), itens
+
+
+def consultas_historico(cursor=None):
+    """
+    Leituras independentes do histórico: tabela de prêmios, totais por
+    recompensa, série diária e a página de jogadas indicada por ``cursor``.
+
+    As consultas podem rodar em série ou ao mesmo tempo (concorrencia.py). A
+    página é paginada por cursor (paginacao.py): o custo não cresce com a
+    profundidade, e o total vem dos totais por recompensa, sem ``COUNT``.
+    """
+    jogadas = CacaNiquel.objects.select_related('aluno', 'resgatado_por')
+    paginador = PaginadorCursor(jogadas, ('-data_jogada', '-pk'), JOGADAS_POR_PAGINA)
+    return {
+        'tabela': tabela_premios,
+        'por_recompensa': totais_por_recompensa,
+        'serie': serie_diaria,
+        'pagina': lambda: paginador.pagina(cursor),
+    }
+
+
+def consultas_pendentes(numero):
+    """Leituras independentes dos prêmios pendentes: ``resumo_pendentes`` e a página ``numero``"""
+    premios = CacaNiquel.objects.filter(resgatado=False).select_related('aluno').order_by('-data_jogada')
+    return premios, {
+        'resumo': resumo_pendentes,
+        'itens': itens_da_pagina(premios, PREMIOS_POR_PAGINA, numero),
+    }
@@ -0,0 +1,178 @@
+"""
+Totais diários do caça-níquel (``CacaNiquelDiario``).
+
+Uma linha por dia (no fuso local) e recompensa com o número de jogadas,
+quantas delas já foram resgatadas e o valor em dinheiro dos prêmios. O
+histórico e o admin leem os totais daqui, então o custo dessas páginas
+depende do número de dias, não do número de jogadas, e gráficos por período
+saem de uma consulta sobre poucas linhas.
+
+A tabela é atualizada na mesma transação de cada alteração:
+
+- jogadas gravadas com ``bulk_create`` (``caca_niquel.jogar``) e resgates
+  feitos por UPDATE (``caca_niquel.resgatar``) não disparam sinais e chamam
+  ``acumular`` explicitamente;
+- criações, edições e exclusões individuais (admin, exclusão de prêmio,
+  exclusão de aluno em cascata) passam pelos sinais (signals.py).
+
+O valor de cada jogada é o do prêmio no momento em que ela é contabilizada.
+``manage.py reconstruir_caca_niquel_diario`` recalcula a tabela a partir das
+jogadas (com os valores atuais dos prêmios) e verifica divergências.
+"""
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+from typing import NamedTuple
+
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import CacaNiquelDiario
+
+
+CAMPOS_TOTAIS = ('jogadas', 'resgatados', 'valor_centavos')
+
+# Dias exibidos no gráfico do histórico
+DIAS_SERIE = 14
+
+
+class TotaisCacaNiquel(NamedTuple):
+    """Totais de um dia ou de uma recompensa"""
+    chave: object  # dia (date) ou chave da recompensa
+    jogadas: int
+    resgatados: int
+    valor_centavos: int
+
+    @property
+    def pendentes(self):
+        return self.jogadas - self.resgatados
+
+    @property
+    def valor(self):
+        return Decimal(self.valor_centavos) / 100
+
+
+def variacoes_jogadas(jogadas, tabela, sinal=1, variacoes=None):
+    """
+    Soma (ou subtrai, com ``sinal=-1``) jogadas em memória às variações por dia e recompensa.
+
+    Retorna ``{(dia, recompensa): [jogadas, resgatados, valor_centavos]}``.
+    """
+    if variacoes is None:
+        variacoes = defaultdict(lambda: [0, 0, 0])
+    for jogada in jogadas:
+        variacao = variacoes[(timezone.localdate(jogada.data_jogada), jogada.recompensa)]
+        variacao[0] += sinal
+        variacao[1] += sinal * jogada.resgatado
+        variacao[2] += sinal * tabela.premio(jogada.recompensa).valor_centavos
+    return variacoes
+
+
+def totais_por_dia(queryset):
+    """Jogadas e resgatados agrupados por dia (no fuso local) e recompensa, em uma consulta"""
+    return (
+        queryset
+        .annotate(dia=TruncDate('data_jogada'))
+        .order_by()
+        .values_list('dia', 'recompensa')
+        .annotate(quantidade=Count('pk'), quantidade_resgatados=Count('pk', filter=Q(resgatado=True)))
+    )
+
+
+def variacoes_agrupadas(queryset, tabela, sinal=1):
+    """Variações de todas as jogadas do queryset, agrupadas no banco"""
+    return {
+        (dia, recompensa): [
+            sinal * jogadas, sinal * resgatados, sinal * jogadas * tabela.premio(recompensa).valor_centavos
+        ]
+        for dia, recompensa, jogadas, resgatados in totais_por_dia(queryset)
+    }
+
+
+def variacoes_resgate(pendentes):
+    """Variações de resgatar as jogadas pendentes do queryset"""
+    return {
+        (dia, recompensa): [0, jogadas, 0]
+        for dia, recompensa, jogadas, _ in totais_por_dia(pendentes)
+    }
+
+
+def acumular(variacoes):
+    """
+    Soma as variações às linhas da tabela, criando as que faltam (duas consultas).
+
+    A leitura dos totais atuais e o upsert acontecem na mesma transação; com
+    ``transaction_mode`` IMMEDIATE (perfil de produção) ela detém o lock de
+    escrita do SQLite desde o BEGIN, então nenhuma outra escrita se intercala
+    entre os dois. Sem ele, uma escrita intercalada faz o upsert falhar com
+    "database is locked" em vez de somar sobre totais antigos.
+    Retorna o número de linhas gravadas.
+    """
+    variacoes = {chave: variacao for chave, variacao in variacoes.items() if any(variacao)}
+    if not variacoes:
+        return 0
+
+    with transaction.atomic(savepoint=False):
+        atuais = {
+            (dia, recompensa): totais
+            for dia, recompensa, *totais in (
+                CacaNiquelDiario.objects
+                .filter(
+                    dia__in={dia for dia, _ in variacoes},
+                    recompensa__in={recompensa for _, recompensa in variacoes},
+                )
+                .values_list('dia', 'recompensa', *CAMPOS_TOTAIS)
+            )
+        }
+        linhas = [
+            CacaNiquelDiario(
+                dia=dia,
+                recompensa=recompensa,
+                **{
+                    campo: atual + delta
+                    for campo, atual, delta in zip(CAMPOS_TOTAIS, atuais.get((dia, recompensa), (0, 0, 0)), variacao)
+                },
+            )
+            for (dia, recompensa), variacao in variacoes.items()
+        ]
+        CacaNiquelDiario.objects.bulk_create(
+            linhas,
+            update_conflicts=True,
+            unique_fields=['dia', 'recompensa'],
+            update_fields=CAMPOS_TOTAIS + ('data_atualizacao',),
+        )
+    return len(linhas)
+
+
+def totais_por_recompensa():
+    """Totais de todo o histórico por recompensa, das mais jogadas para as menos jogadas"""
+    valores = (
+        CacaNiquelDiario.objects
+        .values_list('recompensa')
+        .annotate(soma_jogadas=Sum('jogadas'), soma_resgatados=Sum('resgatados'), soma_valor=Sum('valor_centavos'))
+        .filter(soma_jogadas__gt=0)
+        .order_by('-soma_jogadas', 'recompensa')
+    )
+    return [TotaisCacaNiquel(*linha) for linha in valores]
+
+
+def serie_diaria(dias=DIAS_SERIE, hoje=None):
+    """Totais de cada um dos últimos ``dias`` dias (até hoje), com zero nos dias sem jogadas"""
+    hoje = hoje or timezone.localdate()
+    inicio = hoje - timedelta(days=dias - 1)
+    totais = {
+        dia: resto
+        for dia, *resto in (
+            CacaNiquelDiario.objects
+            .filter(dia__range=(inicio, hoje))
+            .values_list('dia')
+            .annotate(soma_jogadas=Sum('jogadas'), soma_resgatados=Sum('resgatados'), soma_valor=Sum('valor_centavos'))
+            .order_by()
+        )
+    }
+    return [
+        TotaisCacaNiquel(dia, *totais.get(dia, (0, 0, 0)))
+        for dia in (inicio + timedelta(days=deslocamento) for deslocamento in range(dias))
+    ]
@@ -0,0 +1,53 @@
+"""
+Cache em arquivos com ``add`` e ``incr`` atômicos entre processos.
+
+O ``FileBasedCache`` do Django implementa ``add`` como ``has_key`` seguido de
+``set`` e ``incr`` como ``get`` seguido de ``set``: dois workers podem obter o
+mesmo lock de recálculo (cache_ranking.py) ou perder incrementos dos
+contadores e da versão. Aqui as duas operações rodam sob um lock exclusivo de
+arquivo (``flock``), compartilhado por todos os processos e threads que usam o
+mesmo diretório; leituras e ``set`` continuam sem lock, como no original.
+
+Vale para processos na mesma máquina. Com servidores em várias máquinas, use
+Redis ou Memcached, cujos ``add`` e ``incr`` já são atômicos.
+"""
+import os
+
+from asgiref.sync import sync_to_async
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.files import locks
+
+
+class CacheArquivosAtomico(FileBasedCache):
+    """``FileBasedCache`` em que ``add`` e ``incr`` não se intercalam entre processos"""
+
+    arquivo_lock = 'atomico.lock'
+
+    def _travar(self):
+        self._createdir()
+        arquivo = open(os.path.join(self._dir, self.arquivo_lock), 'ab')
+        locks.lock(arquivo, locks.LOCK_EX)
+        return arquivo
+
+    def _destravar(self, arquivo):
+        locks.unlock(arquivo)
+        arquivo.close()
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        arquivo = self._travar()
+        try:
+            return super().add(key, value, timeout, version)
+        finally:
+            self._destravar(arquivo)
+
+    def incr(self, key, delta=1, version=None):
+        arquivo = self._travar()
+        try:
+            return super().incr(key, delta, version)
+        finally:
+            self._destravar(arquivo)
+
+    async def aincr(self, key, delta=1, version=None):
+        # A versão assíncrona do BaseCache faz aget seguido de aset, sem o lock
+        return await sync_to_async(self.incr, thread_sensitive=True)(key, delta, version)
@@ -0,0 +1,178 @@
+"""
+Cache versionado do ranking.
+
+Todas as entradas ficam sob a versão atual dos dados (um contador guardado no
+próprio backend de cache configurado). Qualquer alteração em notas, presenças,
+alunos ou grupos incrementa a versão após o commit, invalidando o ranking em
+todos os processos de uma vez. Um lock via ``cache.add`` garante que uma falta
+no cache dispare apenas um recálculo, mesmo com várias requisições simultâneas;
+para isso ``add`` e ``incr`` precisam ser atômicos no backend (Redis,
+Memcached ou ``CacheArquivosAtomico``, de cache_arquivos.py; o
+``FileBasedCache`` do Django não serve).
+
+Os contadores de monitoramento (acertos, faltas, recálculos) acumulam em
+memória e vão para o cache a cada ``INTERVALO_ESTATISTICAS`` segundos, para
+que um acerto não custe uma escrita.
+
+A versão também serve de validador para GETs condicionais (ETag) das páginas
+do ranking, e o momento da última invalidação, de ``Last-Modified``: uma
+requisição sem mudanças responde 304 sem consultar o banco. Cada nova versão
+envia o sinal ``ranking_invalidado``, que alimenta o ranking ao vivo
+(ranking_ao_vivo.py).
+"""
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+
+from django.core.cache import cache
+from django.db import transaction
+from django.dispatch import Signal
+
+
+PREFIXO = 'gamificacao:ranking'
+CHAVE_VERSAO = f'{PREFIXO}:versao'
+CHAVE_ESTATISTICAS = f'{PREFIXO}:estatisticas'
+CHAVE_ALTERACAO = f'{PREFIXO}:alterado_em'
+
+# Enviado após o commit de cada alteração que invalida o ranking
+ranking_invalidado = Signal()
+
+TEMPO_CACHE = 60 * 60  # 1 hora; a invalidação é feita pela versão
+TEMPO_LOCK = 30  # tempo máximo de um recálculo antes do lock expirar
+TEMPO_ESPERA = 2.0  # quanto uma requisição espera pelo recálculo de outra
+INTERVALO_ESPERA = 0.05
+INTERVALO_ESTATISTICAS = 5.0  # segundos entre envios dos contadores deste processo
+
+CONTADORES = ('acertos', 'faltas', 'recalculos', 'esperas', 'valores_antigos', 'tempo_recalculo_us')
+
+
+def _incrementar(chave, delta=1):
+    """Incrementa um contador no cache, criando-o se necessário"""
+    try:
+        return cache.incr(chave, delta)
+    except ValueError:
+        if cache.add(chave, delta, timeout=None):
+            return delta
+        return cache.incr(chave, delta)
+
+
+# Contadores deste processo ainda não enviados ao cache
+_pendentes = Counter()
+_lock_pendentes = threading.Lock()
+_enviados_em = time.monotonic()
+
+
+def _contar(nome, delta=1):
+    """Soma ao contador ``nome`` deste processo, enviando ao cache se o intervalo já passou"""
+    with _lock_pendentes:
+        _pendentes[nome] += delta
+        if time.monotonic() - _enviados_em < INTERVALO_ESTATISTICAS:
+            return
+    _enviar_estatisticas()
+
+
+def _enviar_estatisticas():
+    global _enviados_em
+    with _lock_pendentes:
+        pendentes = dict(_pendentes)
+        _pendentes.clear()
+        _enviados_em = time.monotonic()
+    for nome, delta in pendentes.items():
+        if delta:
+            _incrementar(f'{CHAVE_ESTATISTICAS}:{nome}', delta)
+
+
+def versao_atual():
+    """Retorna a versão atual dos dados do ranking"""
+    versao = cache.get(CHAVE_VERSAO)
+    if versao is None:
+        # Começa em um valor baseado no relógio para nunca reaproveitar
+        # entradas antigas caso a chave de versão seja despejada do cache
+        cache.add(CHAVE_VERSAO, int(time.time() * 1000), timeout=None)
+        versao = cache.get(CHAVE_VERSAO)
+    return versao
+
+
+def _incrementar_versao():
+    versao_atual()
+    _incrementar(CHAVE_VERSAO)
+    cache.set(CHAVE_ALTERACAO, time.time(), timeout=None)
+    ranking_invalidado.send(sender=None)
+
+
+def ultima_alteracao():
+    """Momento (UTC) da última invalidação registrada no cache, ou None se desconhecido"""
+    momento = cache.get(CHAVE_ALTERACAO)
+    return datetime.fromtimestamp(momento, tz=timezone.utc) if momento is not None else None
+
+
+def invalidar_ranking():
+    """Invalida o ranking em cache assim que a transação atual for confirmada"""
+    transaction.on_commit(_incrementar_versao)
+
+
+def obter(nome, calcular, timeout=TEMPO_CACHE):
+    """
+    Retorna o valor ``nome`` da versão atual, calculando-o no máximo uma vez.
+
+    Em caso de falta, apenas a requisição que obtiver o lock executa
+    ``calcular``; as demais aguardam o resultado por até ``TEMPO_ESPERA``
+    segundos e, se ele não chegar, usam o último valor calculado.
+    """
+    chave = f'{PREFIXO}:{nome}:{versao_atual()}'
+    chave_ultimo = f'{PREFIXO}:{nome}:ultimo'
+
+    valor = cache.get(chave)
+    if valor is not None:
+        _contar('acertos')
+        return valor
+
+    _contar('faltas')
+    chave_lock = f'{chave}:lock'
+
+    if cache.add(chave_lock, 1, timeout=TEMPO_LOCK):
+        try:
+            inicio = time.perf_counter()
+            valor = calcular()
+            duracao_us = int((time.perf_counter() - inicio) * 1_000_000)
+
+            cache.set_many({chave: valor, chave_ultimo: valor}, timeout=timeout)
+            _contar('recalculos')
+            _contar('tempo_recalculo_us', duracao_us)
+        finally:
+            cache.delete(chave_lock)
+        return valor
+
+    # Outro processo está recalculando: aguardar o resultado dele
+    _contar('esperas')
+    prazo = time.monotonic() + TEMPO_ESPERA
+    while time.monotonic() < prazo:
+        time.sleep(INTERVALO_ESPERA)
+        valor = cache.get(chave)
+        if valor is not None:
+            return valor
+
+    valor = cache.get(chave_ultimo)
+    if valor is not None:
+        _contar('valores_antigos')
+        return valor
+
+    return calcular()
+
+
+def estatisticas_cache():
+    """Contadores de acertos, faltas e tempo de recálculo para monitoramento"""
+    # Os deste processo vão na hora; os dos demais, com até INTERVALO_ESTATISTICAS de atraso
+    _enviar_estatisticas()
+    valores = cache.get_many([f'{CHAVE_ESTATISTICAS}:{nome}' for nome in CONTADORES])
+    estatisticas = {nome: valores.get(f'{CHAVE_ESTATISTICAS}:{nome}', 0) for nome in CONTADORES}
+
+    consultas = estatisticas['acertos'] + estatisticas['faltas']
+    estatisticas['versao'] = cache.get(CHAVE_VERSAO)
+    estatisticas['taxa_acerto'] = round(estatisticas['acertos'] / consultas * 100, 1) if consultas else 0.0
+    estatisticas['tempo_medio_recalculo_ms'] = (
+        round(estatisticas['tempo_recalculo_us'] / estatisticas['recalculos'] / 1000, 2)
+        if estatisticas['recalculos'] else 0.0
+    )
+    return estatisticas
@@ -0,0 +1,97 @@
+"""
+Consultas de classificação calculadas no banco com funções de janela.
+
+``calcular_ranking`` (pontuacao.py) numera o ranking inteiro em Python; para
+saber onde um aluno está, ou mostrar só o topo, não é preciso carregar a
+turma toda. Cada linha traz dois números, calculados sobre a pontuação
+materializada na mesma ordem de critérios do ranking (pontuação total, nota
+média e pontos de presença):
+
+- ``posicao``: ``ROW_NUMBER()`` desempatado pelo nome, o mesmo número do
+  ranking completo, das exportações e do ranking ao vivo;
+- ``classificacao``: ``RANK()`` (ou ``DENSE_RANK()``), em que alunos empatados
+  nos três critérios dividem o número (com ``RANK`` o seguinte pula os
+  empates; com ``DENSE_RANK``, não).
+
+Três modos, todos devolvendo ``LinhaRanking``:
+
+- ``top(n)``: as ``n`` primeiras linhas (``LIMIT`` sobre a janela);
+- ``posicao_aluno(aluno_id)``: a linha de um único aluno;
+- ``ao_redor(aluno_id, k)``: as linhas com classificação até ``k`` acima e
+  abaixo da do aluno (``vizinhos`` faz o mesmo a partir de uma classificação
+  já conhecida).
+"""
+from django.db.models import F, Window
+from django.db.models.functions import DenseRank, Rank, RowNumber
+
+from .models import AlunoPontuacao
+from .pontuacao import CAMPOS_TOTAIS, calcular_linha
+
+
+CRITERIOS_ORDEM = (F('pontuacao_total').desc(), F('nota_media').desc(), F('pontos_presenca').desc())
+CAMPOS_LINHA = ('aluno_id', 'nome', 'matricula', *CAMPOS_TOTAIS, 'posicao', 'classificacao')
+
+TOP_PADRAO = 10
+LIMITE_TOP = 100
+VIZINHOS_PADRAO = 2
+LIMITE_VIZINHOS = 10
+
+
+def classificacao(densa=False):
+    """Alunos ativos com ``posicao`` e ``classificacao`` (``RANK`` ou ``DENSE_RANK``) anotadas, em ordem"""
+    funcao = DenseRank() if densa else Rank()
+    return (
+        AlunoPontuacao.objects
+        .filter(aluno__ativo=True)
+        .annotate(
+            nome=F('aluno__nome'),
+            matricula=F('aluno__matricula'),
+            posicao=Window(RowNumber(), order_by=[*CRITERIOS_ORDEM, F('aluno__nome').asc()]),
+            classificacao=Window(funcao, order_by=list(CRITERIOS_ORDEM)),
+        )
+        .order_by('posicao')
+    )
+
+
+def _linha(valores):
+    *valores_aluno, posicao, classificacao_aluno = valores
+    return calcular_linha(*valores_aluno)._replace(posicao=posicao, classificacao=classificacao_aluno)
+
+
+def _linhas(queryset):
+    return [_linha(valores) for valores in queryset.values_list(*CAMPOS_LINHA)]
+
+
+def top(n=TOP_PADRAO, densa=False):
+    """As ``n`` primeiras linhas da classificação (uma consulta)"""
+    return _linhas(classificacao(densa)[:n])
+
+
+def posicao_aluno(aluno_id, densa=False):
+    """Linha de um único aluno ativo (uma consulta), ou None"""
+    # As janelas são calculadas numa subconsulta sobre a turma inteira e só a
+    # consulta externa filtra o aluno: um WHERE na mesma consulta restringiria
+    # as linhas antes do ROW_NUMBER()/RANK(). O ORM não filtra uma subconsulta
+    # no FROM; o raw() aplica os conversores dos campos do modelo (soma_notas).
+    sql, parametros = classificacao(densa).order_by().values(*CAMPOS_LINHA).query.sql_with_params()
+    pontuacoes = AlunoPontuacao.objects.raw(
+        f'SELECT * FROM ({sql}) classificados WHERE classificados.aluno_id = %s', [*parametros, aluno_id]
+    )
+    for pontuacao in pontuacoes:
+        return _linha([getattr(pontuacao, campo) for campo in CAMPOS_LINHA])
+    return None
+
+
+def vizinhos(classificacao_alvo, k=VIZINHOS_PADRAO, densa=False):
+    """Linhas com classificação entre ``classificacao_alvo - k`` e ``classificacao_alvo + k`` (uma consulta)"""
+    return _linhas(
+        classificacao(densa).filter(classificacao__range=(classificacao_alvo - k, classificacao_alvo + k))
+    )
+
+
+def ao_redor(aluno_id, k=VIZINHOS_PADRAO, densa=False):
+    """Linhas com classificação até ``k`` acima e abaixo da do aluno, incluindo ele (duas consultas)"""
+    linha = posicao_aluno(aluno_id, densa)
+    if linha is None:
+        return []
+    return vizinhos(linha.classificacao, k, densa)
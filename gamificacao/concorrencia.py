@@ -0,0 +1,104 @@
+"""
+Consultas independentes executadas ao mesmo tempo nas views assíncronas.
+
+Os métodos assíncronos do ORM (``acount``, ``aaggregate``, ``async for``)
+rodam todos na mesma thread (``sync_to_async`` com ``thread_sensitive``), então
+um ``asyncio.gather`` sobre eles ainda executa uma consulta de cada vez. Aqui
+cada função independente roda em uma thread própria, com a sua conexão, e o
+``gather`` espera todas: no SQLite em modo WAL as leituras não se bloqueiam, e
+a espera total fica próxima da consulta mais lenta em vez da soma de todas.
+
+O modo em threads é opcional (``GAMIFICACAO_CONSULTAS_PARALELAS`` em
+settings.py): cada thread auxiliar mantém uma conexão própria, e o ganho só
+aparece com várias CPUs e consultas que dominam o tempo da view. Por padrão,
+sob WSGI (runserver, gunicorn síncrono) ou com uma única CPU, as mesmas funções
+rodam em série, na thread e na conexão da própria requisição;
+``manage.py bench_consultas_paralelas`` compara os dois modos na máquina de
+produção antes de ligar. As threads auxiliares recebem o contexto da
+requisição, e as consultas feitas nelas entram na contagem do
+``OrcamentoConsultasMiddleware``.
+
+Para que a página de uma lista rode junto com o total que o paginador usaria,
+``itens_da_pagina`` lê a página pedida sem esperar pelo total e
+``montar_pagina`` junta os dois depois. Uma página além da última só é
+percebida depois das duas leituras: em vez de reler, a view redireciona para
+``ultima_pagina``.
+"""
+import asyncio
+import os
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.core.paginator import Paginator
+from django.db import close_old_connections
+
+
+# Com uma CPU as consultas ficam em série mesmo com o modo em threads ligado
+VARIAS_CPUS = (os.cpu_count() or 1) > 1
+
+
+def em_serie(**consultas):
+    """Executa as funções uma após a outra; retorna ``{nome: resultado}``"""
+    return {nome: funcao() for nome, funcao in consultas.items()}
+
+
+def _em_thread_propria(funcao):
+    def executar():
+        try:
+            return funcao()
+        finally:
+            # Threads auxiliares não recebem os sinais de início/fim de requisição
+            # que reciclam as conexões; fecha aqui as vencidas ou com erro
+            close_old_connections()
+
+    return sync_to_async(executar, thread_sensitive=False)()
+
+
+async def em_paralelo(**consultas):
+    """Executa as funções ao mesmo tempo, cada uma em uma thread; retorna ``{nome: resultado}``"""
+    resultados = await asyncio.gather(*(_em_thread_propria(funcao) for funcao in consultas.values()))
+    return dict(zip(consultas, resultados))
+
+
+def paralelo(request):
+    """Se as consultas independentes da requisição rodam em threads próprias"""
+    return (
+        getattr(settings, 'GAMIFICACAO_CONSULTAS_PARALELAS', False)
+        and VARIAS_CPUS
+        and isinstance(request, ASGIRequest)
+    )
+
+
+async def consultas_independentes(request, **consultas):
+    """Em série, na thread da requisição; em paralelo sob ASGI se ``GAMIFICACAO_CONSULTAS_PARALELAS``"""
+    if paralelo(request):
+        return await em_paralelo(**consultas)
+    return await sync_to_async(em_serie)(**consultas)
+
+
+def numero_pagina(valor):
+    """Número de página pedido na query string (1 se ausente ou inválido)"""
+    try:
+        return max(int(valor), 1)
+    except (TypeError, ValueError):
+        return 1
+
+
+def itens_da_pagina(queryset, por_pagina, numero):
+    """Consulta da página ``numero`` que não depende do total (pode rodar junto com ele)"""
+    return lambda: list(queryset[(numero - 1) * por_pagina:numero * por_pagina])
+
+
+def ultima_pagina(total, por_pagina):
+    """Número da última página com ``total`` itens (1 se não houver nenhum)"""
+    return max(-(-total // por_pagina), 1)
+
+
+def montar_pagina(queryset, por_pagina, total, numero, itens):
+    """Página do paginador com o total e os itens já lidos, sem novas consultas (``numero`` até a última)"""
+    paginator = Paginator(queryset, por_pagina)
+    paginator.count = total
+    page_obj = paginator.page(numero)
+    page_obj.object_list = itens
+    return page_obj
@@ -0,0 +1,166 @@
+"""
+Exportação em streaming do ranking, das notas e das presenças.
+
+As linhas vêm de ``values_list().iterator(chunk_size=...)``: nenhum queryset
+completo nem instância de modelo é montado em memória, e a resposta começa a
+ser enviada assim que o primeiro lote do cursor é lido. Cada exportação é
+formatada como CSV ou NDJSON (um objeto JSON por linha) pelos geradores
+``gerar_csv`` / ``gerar_ndjson``, usados tanto pelas views quanto pelo
+comando ``exportar_dados``.
+
+Sob ASGI o Django consome um iterador síncrono de ``StreamingHttpResponse``
+inteiro em memória antes de enviar; lá a view usa ``exportar_assincrono``,
+que lê cada pedaço na thread do ORM da requisição e o envia em seguida.
+"""
+import csv
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+from asgiref.sync import sync_to_async
+
+from .models import AlunoPontuacao, Nota, Presenca
+from .pontuacao import ORDEM_RANKING, CAMPOS_TOTAIS, calcular_linha
+
+
+TAMANHO_CHUNK = 2000  # linhas lidas do cursor por vez
+LINHAS_POR_ENVIO = 500  # linhas agrupadas em cada pedaço enviado ao cliente
+
+FORMATOS = {
+    'csv': ('text/csv; charset=utf-8', 'csv'),
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+}
+
+COLUNAS_RANKING = (
+    'posicao', 'matricula', 'nome', 'nota_media', 'total_atividades',
+    'pontos_presenca', 'percentual_presenca', 'pontuacao_total',
+)
+COLUNAS_NOTAS = (
+    'matricula', 'aluno', 'atividade', 'valor', 'valor_maximo',
+    'data_lancamento', 'data_atualizacao', 'lancada_por',
+)
+COLUNAS_PRESENCAS = ('data_presenca', 'matricula', 'aluno', 'presente', 'lancada_por')
+
+
+def linhas_ranking():
+    """Ranking dos alunos ativos, na ordem da tabela materializada"""
+    valores = (
+        AlunoPontuacao.objects
+        .filter(aluno__ativo=True)
+        .order_by(*ORDEM_RANKING)
+        .values_list('aluno_id', 'aluno__nome', 'aluno__matricula', *CAMPOS_TOTAIS)
+        .iterator(chunk_size=TAMANHO_CHUNK)
+    )
+    for posicao, valores_aluno in enumerate(valores, 1):
+        linha = calcular_linha(*valores_aluno)
+        yield (
+            posicao, linha.matricula, linha.nome, linha.nota_media, linha.total_atividades,
+            linha.pontos_presenca, linha.percentual_presenca, linha.pontuacao_total,
+        )
+
+
+def linhas_notas():
+    """Todas as notas, com aluno e atividade"""
+    return (
+        Nota.objects
+        .order_by('atividade_id', 'aluno__nome', 'pk')
+        .values_list(
+            'aluno__matricula', 'aluno__nome', 'atividade__nome', 'valor', 'atividade__valor_maximo',
+            'data_lancamento', 'data_atualizacao', 'lancada_por__username',
+        )
+        .iterator(chunk_size=TAMANHO_CHUNK)
+    )
+
+
+def linhas_presencas(data_inicio=None, data_fim=None):
+    """Presenças do período informado (ambas as datas são opcionais e inclusivas)"""
+    presencas = Presenca.objects.all()
+    if data_inicio:
+        presencas = presencas.filter(data_presenca__gte=data_inicio)
+    if data_fim:
+        presencas = presencas.filter(data_presenca__lte=data_fim)
+    return (
+        presencas
+        .order_by('data_presenca', 'aluno__nome', 'pk')
+        .values_list('data_presenca', 'aluno__matricula', 'aluno__nome', 'presente', 'lancada_por__username')
+        .iterator(chunk_size=TAMANHO_CHUNK)
+    )
+
+
+EXPORTACOES = {
+    'ranking': (COLUNAS_RANKING, linhas_ranking),
+    'notas': (COLUNAS_NOTAS, linhas_notas),
+    'presencas': (COLUNAS_PRESENCAS, linhas_presencas),
+}
+
+
+def _valor_serializavel(valor):
+    if isinstance(valor, (date, datetime)):
+        return valor.isoformat()
+    if isinstance(valor, Decimal):
+        return str(valor)
+    return valor
+
+
+class _Eco:
+    """Pseudo-arquivo que devolve o que recebe, para usar o csv.writer sem buffer"""
+    def write(self, valor):
+        return valor
+
+
+def _em_pedacos(textos):
+    """Agrupa as linhas formatadas para não enviar um pedaço por linha"""
+    pedaco = []
+    for texto in textos:
+        pedaco.append(texto)
+        if len(pedaco) >= LINHAS_POR_ENVIO:
+            yield ''.join(pedaco)
+            pedaco = []
+    if pedaco:
+        yield ''.join(pedaco)
+
+
+def gerar_csv(colunas, linhas):
+    """Gera o CSV (cabeçalho + linhas) em pedaços de texto"""
+    escritor = csv.writer(_Eco())
+    yield escritor.writerow(colunas)
+    yield from _em_pedacos(
+        escritor.writerow([_valor_serializavel(valor) for valor in linha]) for linha in linhas
+    )
+
+
+def gerar_ndjson(colunas, linhas):
+    """Gera um objeto JSON por linha em pedaços de texto"""
+    yield from _em_pedacos(
+        json.dumps(
+            {coluna: _valor_serializavel(valor) for coluna, valor in zip(colunas, linha)},
+            ensure_ascii=False,
+        ) + '\n'
+        for linha in linhas
+    )
+
+
+GERADORES = {
+    'csv': gerar_csv,
+    'ndjson': gerar_ndjson,
+}
+
+
+def exportar(tipo, formato, **filtros):
+    """Gerador de texto da exportação ``tipo`` no ``formato`` pedido"""
+    colunas, linhas = EXPORTACOES[tipo]
+    return GERADORES[formato](colunas, linhas(**filtros))
+
+
+async def exportar_assincrono(tipo, formato, **filtros):
+    """Mesmo conteúdo de ``exportar``, como gerador assíncrono para servidores ASGI"""
+    pedacos = exportar(tipo, formato, **filtros)
+    # Todas as leituras na mesma thread (a do ORM da requisição), como exige o cursor do banco
+    proximo = sync_to_async(next)
+    fim = object()
+    try:
+        while (pedaco := await proximo(pedacos, fim)) is not fim:
+            yield pedaco
+    finally:
+        # Cliente desconectado no meio do envio: fecha o cursor na mesma thread
+        await sync_to_async(pedacos.close)()
@@ -1,4 +1,7 @@
+from decimal import Decimal
+
 from django import forms
+from django.db.models import Q
 from .models import Aluno, Atividade, Nota, Presenca, Grupo, MembroGrupo
 
 
@@ -130,6 +133,92 @@ class NotaForm(forms.ModelForm):
         return valor
 
 
+class NotasGradeForm(forms.Form):
+    """Formulário com um campo de nota por aluno, para lançar a turma inteira de uma vez"""
+    motivo_alteracao = forms.CharField(
+        required=False,
+        max_length=500,
+        widget=forms.TextInput(attrs={
+            'class': 'form-control',
+            'placeholder': 'Motivo das alterações (opcional)'
+        }),
+        label='Motivo da Alteração',
+        help_text='Registrado no histórico das notas que já existiam e foram alteradas'
+    )
+    
+    def __init__(self, *args, atividade, alunos, notas_existentes, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.atividade = atividade
+        self.alunos = alunos
+        self.notas_existentes = notas_existentes
+        
+        # Mesmos limites do NotaForm: valor máximo da atividade e do campo Nota.valor
+        valor_maximo = min(atividade.valor_maximo, Decimal('10.0'))
+        
+        for aluno in alunos:
+            self.fields[f'nota_{aluno.id}'] = forms.DecimalField(
+                required=False,
+                min_value=0,
+                max_value=valor_maximo,
+                max_digits=4,
+                decimal_places=1,
+                initial=notas_existentes.get(aluno.id),
+                label=aluno.nome,
+                widget=forms.NumberInput(attrs={
+                    'class': 'form-control form-control-sm',
+                    'min': '0',
+                    'max': str(float(valor_maximo)),
+                    'step': '0.1'
+                })
+            )
+    
+    def linhas(self):
+        """Pares (aluno, campo da nota, nota atual) na ordem dos alunos"""
+        for aluno in self.alunos:
+            yield aluno, self[f'nota_{aluno.id}'], self.notas_existentes.get(aluno.id)
+    
+    def valores(self):
+        """Notas preenchidas, no formato esperado por notas.gravar_notas"""
+        return {
+            (aluno.id, self.atividade.id): self.cleaned_data[f'nota_{aluno.id}']
+            for aluno in self.alunos
+            if self.cleaned_data.get(f'nota_{aluno.id}') is not None
+        }
+
+
+class ImportarNotasForm(forms.Form):
+    """Formulário para importar notas de um arquivo CSV"""
+    DELIMITADORES = [
+        (',', 'Vírgula ( , )'),
+        (';', 'Ponto e vírgula ( ; )'),
+    ]
+    
+    arquivo = forms.FileField(
+        widget=forms.ClearableFileInput(attrs={
+            'class': 'form-control',
+            'accept': '.csv,text/csv'
+        }),
+        label='Arquivo CSV',
+        help_text='Colunas obrigatórias: matricula, atividade e nota (codificação UTF-8)'
+    )
+    delimitador = forms.ChoiceField(
+        choices=DELIMITADORES,
+        initial=',',
+        widget=forms.Select(attrs={'class': 'form-select'}),
+        label='Separador'
+    )
+    motivo_alteracao = forms.CharField(
+        required=False,
+        max_length=500,
+        widget=forms.TextInput(attrs={
+            'class': 'form-control',
+            'placeholder': 'Motivo das alterações (opcional)'
+        }),
+        label='Motivo da Alteração',
+        help_text='Registrado no histórico das notas que já existiam e foram alteradas'
+    )
+
+
 class FiltroNotasForm(forms.Form):
     """Formulário para filtrar notas no histórico"""
     atividade = forms.ModelChoiceField(
@@ -264,23 +353,17 @@ class AdicionarMembrosForm(forms.Form):
         
         if grupo:
             # Excluir alunos que já estão no grupo
-            alunos_no_grupo = [membro.aluno.id for membro in grupo.membros.all()]
+            alunos_no_grupo = list(grupo.membros.values_list('aluno_id', flat=True))
             alunos_disponiveis = Aluno.objects.filter(
                 ativo=True
-            ).exclude(id__in=alunos_no_grupo)
+            ).exclude(id__in=alunos_no_grupo).select_related('pontuacao')
             
             self.fields['alunos'].queryset = alunos_disponiveis
             
-            # Para o campo líder, incluir alunos já no grupo + novos alunos
-            alunos_grupo_existentes = [membro.aluno for membro in grupo.membros.all()]
-            todos_alunos_opcoes = list(alunos_grupo_existentes) + list(alunos_disponiveis)
-            
-            # Ordenar por nome
-            todos_alunos_opcoes.sort(key=lambda x: x.nome)
-            
-            # Criar queryset personalizado
-            ids_todos_alunos = [aluno.id for aluno in todos_alunos_opcoes]
-            self.fields['lider'].queryset = Aluno.objects.filter(id__in=ids_todos_alunos).order_by('nome')
+            # Para o campo líder, incluir alunos já no grupo + novos alunos (ordenados por nome)
+            self.fields['lider'].queryset = Aluno.objects.filter(
+                Q(id__in=alunos_no_grupo) | Q(ativo=True)
+            ).select_related('pontuacao').order_by('nome')
             
             # Definir valor inicial se já há líder
             if grupo.lider:
@@ -294,9 +377,8 @@ class AdicionarMembrosForm(forms.Form):
         # Se um líder foi escolhido, verificar se ele está na lista de alunos selecionados ou já no grupo
         if lider and hasattr(self, 'grupo_instance'):
             grupo = self.grupo_instance
-            alunos_no_grupo = [membro.aluno for membro in grupo.membros.all()]
             
-            if lider not in alunos and lider not in alunos_no_grupo:
+            if lider not in alunos and not grupo.membros.filter(aluno=lider).exists():
                 raise forms.ValidationError(
                     'O líder escolhido deve estar entre os membros do grupo.'
                 )
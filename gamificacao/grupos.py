@@ -0,0 +1,158 @@
+"""
+Ranking interno dos grupos calculado em lote.
+
+Carrega os membros de todos os grupos pedidos em uma consulta e os alunos
+envolvidos (com a pontuação materializada) em outra, de modo que o custo não
+depende da quantidade de grupos nem de membros. Um aluno que participa de
+vários grupos é carregado e pontuado uma única vez.
+
+``Grupo.get_ranking_grupo`` e ``Grupo.media_grupo`` usam o resultado deixado
+em cada instância por ``carregar_rankings``.
+
+Para a competição entre grupos, os totais (soma, média, mediana e número de
+membros) ficam materializados em ``GrupoPontuacao``; ``atualizar_pontuacoes_grupos``
+recalcula apenas os grupos afetados por uma mudança de membros ou de pontuação.
+``incluir_membros`` adiciona vários alunos com um único INSERT e um único
+recálculo do grupo.
+"""
+import statistics
+from typing import NamedTuple
+
+from . import cache_ranking
+from .models import Aluno, GrupoPontuacao, MembroGrupo
+
+
+ORDEM_RANKING_GRUPOS = ('-pontuacao_media', '-pontuacao_total', 'grupo__nome')
+CAMPOS_PONTUACAO_GRUPO = ('qtd_membros', 'pontuacao_total', 'pontuacao_media', 'pontuacao_mediana')
+
+
+class MembroRanking(NamedTuple):
+    """Posição de um aluno no ranking interno de um grupo"""
+    posicao: int
+    aluno: Aluno
+    pontuacao: float
+
+
+def carregar_rankings(grupos):
+    """
+    Calcula o ranking interno e a média de cada grupo em duas consultas.
+
+    O ranking fica em ``grupo.ranking_membros`` (lista de ``MembroRanking``
+    ordenada por pontuação e nome) e a média em ``grupo.media_calculada``.
+    Retorna a própria lista de grupos.
+    """
+    grupos = list(grupos)
+    membros_por_grupo = {grupo.pk: [] for grupo in grupos}
+
+    for grupo_id, aluno_id in (
+        MembroGrupo.objects
+        .filter(grupo_id__in=membros_por_grupo)
+        .order_by()
+        .values_list('grupo_id', 'aluno_id')
+    ):
+        membros_por_grupo[grupo_id].append(aluno_id)
+
+    ids = {aluno_id for membros in membros_por_grupo.values() for aluno_id in membros}
+    alunos = Aluno.objects.filter(pk__in=ids).select_related('pontuacao').order_by().in_bulk() if ids else {}
+    pontuacoes = {aluno_id: float(aluno.pontuacao_total) for aluno_id, aluno in alunos.items()}
+
+    for grupo in grupos:
+        ordenados = sorted(
+            membros_por_grupo[grupo.pk],
+            key=lambda aluno_id: (-pontuacoes[aluno_id], alunos[aluno_id].nome),
+        )
+        grupo.ranking_membros = [
+            MembroRanking(posicao, alunos[aluno_id], pontuacoes[aluno_id])
+            for posicao, aluno_id in enumerate(ordenados, 1)
+        ]
+        grupo.media_calculada = (
+            round(sum(item.pontuacao for item in grupo.ranking_membros) / len(grupo.ranking_membros), 2)
+            if grupo.ranking_membros else 0.0
+        )
+
+    return grupos
+
+
+def pontuacoes_grupos_calculadas(grupo_ids):
+    """Gera instâncias (não salvas) de GrupoPontuacao a partir da pontuação dos membros"""
+    pontos = {grupo_id: [] for grupo_id in grupo_ids}
+    for grupo_id, pontuacao in (
+        MembroGrupo.objects
+        .filter(grupo_id__in=pontos)
+        .order_by()
+        .values_list('grupo_id', 'aluno__pontuacao__pontuacao_total')
+    ):
+        pontos[grupo_id].append(pontuacao or 0.0)
+
+    for grupo_id, pontuacoes in pontos.items():
+        # Mesmo arredondamento de Grupo.media_grupo
+        yield GrupoPontuacao(
+            grupo_id=grupo_id,
+            qtd_membros=len(pontuacoes),
+            pontuacao_total=round(sum(pontuacoes), 2),
+            pontuacao_media=round(sum(pontuacoes) / len(pontuacoes), 2) if pontuacoes else 0.0,
+            pontuacao_mediana=round(statistics.median(pontuacoes), 2) if pontuacoes else 0.0,
+        )
+
+
+def atualizar_pontuacoes_grupos(grupo_ids):
+    """Recalcula os totais materializados dos grupos informados (duas consultas)"""
+    grupo_ids = {grupo_id for grupo_id in grupo_ids if grupo_id is not None}
+    if not grupo_ids:
+        return 0
+
+    pontuacoes = list(pontuacoes_grupos_calculadas(grupo_ids))
+    GrupoPontuacao.objects.bulk_create(
+        pontuacoes,
+        update_conflicts=True,
+        unique_fields=['grupo'],
+        update_fields=CAMPOS_PONTUACAO_GRUPO + ('data_atualizacao',),
+    )
+    return len(pontuacoes)
+
+
+def incluir_membros(grupo, alunos, usuario=None):
+    """
+    Adiciona os alunos ao grupo; retorna quantos entraram (os que já eram membros são ignorados).
+
+    ``bulk_create`` não dispara os sinais de ``MembroGrupo``: os totais do
+    grupo são recalculados uma vez, no fim, e o ranking em cache é invalidado.
+    """
+    alunos_ids = {aluno.pk for aluno in alunos}
+    existentes = set(
+        MembroGrupo.objects.filter(grupo=grupo, aluno_id__in=alunos_ids).values_list('aluno_id', flat=True)
+    )
+    novos = [
+        MembroGrupo(grupo=grupo, aluno_id=aluno_id, adicionado_por=usuario)
+        for aluno_id in sorted(alunos_ids - existentes)
+    ]
+    if not novos:
+        return 0
+
+    # Um membro incluído por outra requisição entre a leitura e o INSERT não é erro
+    MembroGrupo.objects.bulk_create(novos, ignore_conflicts=True)
+    atualizar_pontuacoes_grupos([grupo.pk])
+    cache_ranking.invalidar_ranking()
+    return len(novos)
+
+
+def atualizar_grupos_dos_alunos(aluno_ids):
+    """Recalcula os grupos dos quais os alunos informados participam"""
+    grupo_ids = (
+        MembroGrupo.objects
+        .filter(aluno_id__in=aluno_ids)
+        .order_by()
+        .values_list('grupo_id', flat=True)
+        .distinct()
+    )
+    return atualizar_pontuacoes_grupos(list(grupo_ids))
+
+
+def ranking_grupos():
+    """Ranking dos grupos ativos, lido da tabela materializada em uma consulta indexada"""
+    return list(
+        GrupoPontuacao.objects
+        .filter(grupo__ativo=True)
+        .select_related('grupo__lider')
+        .order_by(*ORDEM_RANKING_GRUPOS)
+    )
@@ -0,0 +1,145 @@
+import io
+import re
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, reset_queries
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, setup_test_environment, teardown_test_environment
+
+from gamificacao.middleware import formato_sql
+
+from .bench_views import VIEWS_IGNORADAS, cache_descartavel, montar_url, parametros_urls, urls_medidas
+
+
+# "SCAN gamificacao_nota" (ou "SCAN TABLE ..." em versões antigas do SQLite) sem índice
+SCAN_COMPLETO = re.compile(r'^SCAN (?:TABLE )?(\w+)(?!.*\bUSING\b)')
+TABELA_PRINCIPAL = re.compile(r'\bFROM "(\w+)"')
+ORDENACAO_TEMPORARIA = re.compile(r'USE TEMP B-TREE FOR (ORDER BY|GROUP BY|DISTINCT|RIGHT PART OF ORDER BY)')
+
+
+class Command(BaseCommand):
+    help = (
+        'Executa EXPLAIN QUERY PLAN nas consultas de cada view de gamificacao/urls.py, sobre dados '
+        'gerados em um banco de teste descartável, e aponta varreduras completas e ordenações temporárias'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--alunos', type=int, default=300, help='Alunos gerados (padrão: 300)')
+        parser.add_argument('--atividades', type=int, default=20, help='Atividades geradas (padrão: 20)')
+        parser.add_argument('--dias', type=int, default=60, help='Dias do período letivo gerado (padrão: 60)')
+        parser.add_argument(
+            '--ignorar-tabelas', default='django_session,auth_user',
+            help='Tabelas cujos problemas não são relatados, separadas por vírgula '
+                 '(padrão: django_session,auth_user)'
+        )
+        parser.add_argument(
+            '--estrito', action='store_true',
+            help='Termina com erro se algum problema for encontrado (para uso em CI)'
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('EXPLAIN QUERY PLAN só está disponível no SQLite.')
+
+        self.verbosity = options['verbosity']
+        ignoradas = {tabela.strip() for tabela in options['ignorar_tabelas'].split(',') if tabela.strip()}
+
+        # Banco e cache descartáveis: o banco configurado e o cache dos workers nunca são tocados
+        setup_test_environment()
+        nome_original = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            with cache_descartavel():
+                self.stderr.write(f'Gerando dados para {options["alunos"]} aluno(s)...')
+                call_command(
+                    'seed_benchmark', alunos=options['alunos'], atividades=options['atividades'],
+                    dias=options['dias'], limpar=True, stdout=io.StringIO(),
+                )
+                # Estatísticas atualizadas, como em produção, para o planejador escolher os índices
+                with connection.cursor() as cursor:
+                    cursor.execute('ANALYZE')
+                problemas = self.auditar_views(ignoradas)
+        finally:
+            connection.creation.destroy_test_db(nome_original, verbosity=0)
+            teardown_test_environment()
+
+        total = sum(len(problemas_sql) for consultas in problemas.values() for _, problemas_sql in consultas)
+        if not total:
+            self.stdout.write(self.style.SUCCESS('Nenhuma varredura completa ou ordenação temporária encontrada.'))
+            return
+
+        for nome, consultas in problemas.items():
+            self.stdout.write(self.style.MIGRATE_HEADING(nome))
+            for sql, problemas_sql in consultas:
+                self.stdout.write(f'  {sql[:200]}{"..." if len(sql) > 200 else ""}')
+                for problema in problemas_sql:
+                    self.stdout.write(self.style.WARNING(f'    - {problema}'))
+
+        mensagem = f'{total} problema(s) em {len(problemas)} view(s).'
+        if options['estrito']:
+            raise CommandError(mensagem)
+        self.stdout.write(self.style.WARNING(mensagem))
+
+    def auditar_views(self, ignoradas):
+        """Executa cada view e analisa o plano das consultas SELECT distintas que ela fez"""
+        usuario = User.objects.create_superuser('auditoria', 'auditoria@auditoria.local', 'auditoria')
+        cliente = Client()
+        cliente.force_login(usuario)
+        parametros = parametros_urls()
+
+        problemas = {}
+        for nome, padrao in urls_medidas():
+            if nome in VIEWS_IGNORADAS:
+                continue
+
+            cache.clear()
+            reset_queries()
+            with CaptureQueriesContext(connection) as consultas:
+                resposta = cliente.get(montar_url(padrao, parametros))
+                if resposta.streaming:
+                    b''.join(resposta.streaming_content)
+
+            encontrados = []
+            vistas = set()
+            for consulta in consultas.captured_queries:
+                sql = consulta['sql']
+                assinatura = formato_sql(sql)
+                if not sql.lstrip().upper().startswith('SELECT') or assinatura in vistas:
+                    continue
+                vistas.add(assinatura)
+                problemas_sql = self.analisar(sql, ignoradas)
+                if problemas_sql:
+                    encontrados.append((sql, problemas_sql))
+
+            if encontrados:
+                problemas[nome] = encontrados
+            if self.verbosity >= 1:
+                self.stderr.write(
+                    f'{nome}: {len(vistas)} consulta(s) distinta(s), {len(encontrados)} com problema(s)'
+                )
+        return problemas
+
+    def analisar(self, sql, ignoradas):
+        """Problemas encontrados no plano de uma consulta (já com os parâmetros interpolados)"""
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            plano = [linha[-1] for linha in cursor.fetchall()]
+
+        if self.verbosity >= 2:
+            self.stdout.write('\n'.join(f'    | {detalhe}' for detalhe in plano))
+
+        tabela_principal = TABELA_PRINCIPAL.search(sql)
+        if tabela_principal and tabela_principal.group(1) in ignoradas:
+            return []
+
+        problemas = []
+        for detalhe in plano:
+            varredura = SCAN_COMPLETO.match(detalhe)
+            if varredura and varredura.group(1) not in ignoradas:
+                problemas.append(f'varredura completa: {detalhe}')
+            if ORDENACAO_TEMPORARIA.search(detalhe):
+                problemas.append(f'ordenação temporária: {detalhe}')
+        return problemas
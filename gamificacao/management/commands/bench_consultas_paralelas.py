@@ -0,0 +1,103 @@
+import asyncio
+import json
+import os
+import statistics
+import time
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from gamificacao.caca_niquel import consultas_historico, consultas_pendentes
+from gamificacao.concorrencia import em_paralelo, em_serie
+from gamificacao.pontuacao import consultas_dashboard
+
+from .bench_views import cache_descartavel
+
+
+# Mesmas leituras independentes das views assíncronas (primeira página do histórico, página 2 dos prêmios)
+CONJUNTOS = {
+    'dashboard': consultas_dashboard,
+    'historico_caca_niquel': consultas_historico,
+    'premios_pendentes': lambda: consultas_pendentes(2)[1],
+}
+
+
+def _percentis(tempos):
+    tempos = sorted(tempos)
+    return {
+        'p50_ms': round(statistics.median(tempos), 2),
+        'p95_ms': round(tempos[min(len(tempos) - 1, int(round(0.95 * (len(tempos) - 1))))], 2),
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        'Compara o tempo das leituras independentes do dashboard, do histórico do caça-níquel e dos '
+        'prêmios pendentes executadas em série (WSGI) e ao mesmo tempo (ASGI), no banco configurado'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeticoes', type=int, default=20, help='Execuções de cada modo (padrão: 20)')
+        parser.add_argument(
+            '--com-cache', action='store_true',
+            help='Mantém o cache do ranking entre execuções (por padrão é limpo antes de cada uma)'
+        )
+        parser.add_argument('--saida', help='Arquivo JSON de saída (padrão: apenas a tabela)')
+
+    def handle(self, *args, **options):
+        if options['repeticoes'] < 1:
+            raise CommandError('--repeticoes deve ser maior que zero.')
+
+        # Só leituras: o banco configurado (com dados do seed_benchmark, de preferência) não é alterado.
+        # O cache limpo a cada execução é um descartável, não o compartilhado pelos workers.
+        with cache_descartavel():
+            medicoes = asyncio.run(self.medir(options))
+        resultado = {
+            'ambiente': {
+                'banco': connection.vendor,
+                'cpus': os.cpu_count(),
+                'repeticoes': options['repeticoes'],
+                'com_cache': options['com_cache'],
+            },
+            'views': medicoes,
+        }
+
+        self.stdout.write(f'{"view":<24} {"série p50":>10} {"paralelo p50":>13} {"redução":>8}')
+        for nome, medicao in resultado['views'].items():
+            serie, paralelo = medicao['serie']['p50_ms'], medicao['paralelo']['p50_ms']
+            medicao['reducao'] = round(1 - paralelo / serie, 3) if serie else 0
+            self.stdout.write(f'{nome:<24} {serie:>8}ms {paralelo:>11}ms {medicao["reducao"]:>8.0%}')
+        if (os.cpu_count() or 1) < 2:
+            self.stderr.write(self.style.WARNING(
+                'Apenas uma CPU: as consultas em threads não têm como rodar ao mesmo tempo.'
+            ))
+
+        if options['saida']:
+            with open(options['saida'], 'w', encoding='utf-8') as arquivo:
+                arquivo.write(json.dumps(resultado, indent=2, ensure_ascii=False, sort_keys=True) + '\n')
+
+    async def medir(self, options):
+        # Um laço de eventos para todas as medições, como em um servidor ASGI: as
+        # threads auxiliares (e as conexões delas) são reaproveitadas entre execuções
+        medicoes = {}
+        for nome, consultas in CONJUNTOS.items():
+            # Aquecimento: cria as conexões das threads e carrega o banco no cache do SO
+            await sync_to_async(em_serie)(**consultas())
+            await em_paralelo(**consultas())
+
+            tempos = {'serie': [], 'paralelo': []}
+            for _ in range(options['repeticoes']):
+                # Alterna os modos para que variações da máquina afetem os dois igualmente
+                for modo in tempos:
+                    if not options['com_cache']:
+                        cache.clear()
+                    inicio = time.perf_counter()
+                    if modo == 'serie':
+                        await sync_to_async(em_serie)(**consultas())
+                    else:
+                        await em_paralelo(**consultas())
+                    tempos[modo].append((time.perf_counter() - inicio) * 1000)
+            medicoes[nome] = {modo: _percentis(valores) for modo, valores in tempos.items()}
+        return medicoes
@@ -0,0 +1,232 @@
+import io
+import json
+import platform
+import statistics
+import tempfile
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+import django
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, reset_queries
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext, setup_test_environment, teardown_test_environment
+from django.urls import URLPattern, reverse
+
+from gamificacao import urls as gamificacao_urls
+from gamificacao.models import Aluno, Atividade, CacaNiquel, Grupo, MembroGrupo, Nota, Presenca
+
+
+# Views que alteram dados ou encerram a sessão em um simples GET
+VIEWS_IGNORADAS = {
+    'logout': 'encerra a sessão do cliente de teste',
+    'remover_membro': 'remove o membro do grupo via GET',
+}
+
+
+@contextmanager
+def cache_descartavel():
+    """Cache padrão em um diretório temporário: limpá-lo não afeta o cache compartilhado pelos workers"""
+    with tempfile.TemporaryDirectory(prefix='gamificacao-cache-') as diretorio:
+        caches = {'default': {'BACKEND': 'gamificacao.cache_arquivos.CacheArquivosAtomico', 'LOCATION': diretorio}}
+        with override_settings(CACHES=caches):
+            yield
+
+
+def parametros_urls():
+    """Valores reais para os parâmetros das URLs, retirados dos dados gerados"""
+    aluno = Aluno.objects.order_by('pk').first()
+    nota = Nota.objects.order_by('pk').first()
+    membro = MembroGrupo.objects.order_by('pk').first()
+    return {
+        'aluno': aluno.pk,
+        'atividade': Atividade.objects.order_by('pk').values_list('pk', flat=True).first(),
+        'presenca': Presenca.objects.order_by('pk').values_list('pk', flat=True).first(),
+        'grupo': membro.grupo_id if membro else Grupo.objects.values_list('pk', flat=True).first(),
+        'nota': nota.pk,
+        'nota_aluno': nota.aluno_id,
+        'nota_atividade': nota.atividade_id,
+        'jogada': CacaNiquel.objects.filter(resgatado=False).values_list('pk', flat=True).first(),
+    }
+
+
+def montar_url(padrao, parametros):
+    """Resolve a URL nomeada preenchendo os parâmetros inteiros com objetos existentes"""
+    nomes = list(padrao.pattern.converters)
+    kwargs = {}
+    for nome in nomes:
+        if nome == 'pk':
+            chave = next(
+                (modelo for modelo in ('aluno', 'atividade', 'presenca') if modelo in padrao.name),
+                None,
+            )
+        elif padrao.name in ('editar_nota', 'lancar_nota_aluno') and nome in ('aluno_id', 'atividade_id'):
+            chave = f'nota_{nome[:-3]}'
+        else:
+            chave = nome[:-3] if nome.endswith('_id') else nome
+        kwargs[nome] = parametros.get(chave)
+    return reverse(padrao.name, kwargs=kwargs)
+
+
+def urls_medidas():
+    """Pares (nome, padrão) das views de gamificacao/urls.py, sem repetir nomes"""
+    vistos = set()
+    for padrao in gamificacao_urls.urlpatterns:
+        if isinstance(padrao, URLPattern) and padrao.name not in vistos:
+            vistos.add(padrao.name)
+            yield padrao.name, padrao
+
+
+class Command(BaseCommand):
+    help = (
+        'Mede consultas, tempo (p50/p95) e pico de memória de cada view de gamificacao/urls.py '
+        'em vários tamanhos de dados, usando um banco de teste descartável'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--tamanhos', default='50,200,800',
+            help='Quantidades de alunos separadas por vírgula (padrão: 50,200,800)'
+        )
+        parser.add_argument('--atividades', type=int, default=20, help='Atividades geradas (padrão: 20)')
+        parser.add_argument('--dias', type=int, default=60, help='Dias do período letivo gerado (padrão: 60)')
+        parser.add_argument('--repeticoes', type=int, default=5, help='Requisições por view (padrão: 5)')
+        parser.add_argument(
+            '--com-cache', action='store_true',
+            help='Mantém o cache entre requisições (por padrão o cache é limpo antes de cada uma)'
+        )
+        parser.add_argument('--saida', help='Arquivo JSON de saída (padrão: stdout)')
+        parser.add_argument('--comparar', help='Arquivo JSON de uma execução anterior para comparação')
+        parser.add_argument(
+            '--limite', type=float, default=0.25,
+            help='Piora relativa máxima de tempo p50 aceita na comparação (padrão: 0.25 = 25%%)'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            tamanhos = [int(t) for t in options['tamanhos'].split(',') if t.strip()]
+        except ValueError:
+            raise CommandError('--tamanhos deve ser uma lista de inteiros, ex.: 50,200,800')
+        if options['repeticoes'] < 1:
+            raise CommandError('--repeticoes deve ser maior que zero.')
+
+        base = None
+        if options['comparar']:
+            with open(options['comparar'], encoding='utf-8') as arquivo:
+                base = json.load(arquivo)
+
+        # Banco e cache descartáveis: o banco configurado e o cache dos workers nunca são tocados
+        setup_test_environment()
+        nome_original = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            with cache_descartavel():
+                resultado = {
+                    'ambiente': {
+                        'python': platform.python_version(),
+                        'django': django.get_version(),
+                        'banco': connection.vendor,
+                        'repeticoes': options['repeticoes'],
+                        'com_cache': options['com_cache'],
+                    },
+                    'tamanhos': {},
+                }
+                for tamanho in tamanhos:
+                    self.stderr.write(f'Gerando dados para {tamanho} aluno(s)...')
+                    call_command(
+                        'seed_benchmark', alunos=tamanho, atividades=options['atividades'],
+                        dias=options['dias'], limpar=True, stdout=io.StringIO(),
+                    )
+                    resultado['tamanhos'][str(tamanho)] = self.medir_views(options)
+        finally:
+            connection.creation.destroy_test_db(nome_original, verbosity=0)
+            teardown_test_environment()
+
+        saida = json.dumps(resultado, indent=2, ensure_ascii=False, sort_keys=True)
+        if options['saida']:
+            with open(options['saida'], 'w', encoding='utf-8') as arquivo:
+                arquivo.write(saida + '\n')
+        else:
+            self.stdout.write(saida)
+
+        if base is not None:
+            regressoes = self.comparar(base, resultado, options['limite'])
+            if regressoes:
+                for regressao in regressoes:
+                    self.stderr.write(self.style.ERROR(regressao))
+                raise CommandError(f'{len(regressoes)} regressão(ões) de desempenho encontrada(s).')
+            self.stderr.write(self.style.SUCCESS('Nenhuma regressão em relação à execução anterior.'))
+
+    def medir_views(self, options):
+        usuario = User.objects.filter(username='benchmark').first() or User.objects.create_superuser(
+            'benchmark', 'benchmark@benchmark.local', 'benchmark'
+        )
+        cliente = Client()
+        cliente.force_login(usuario)
+        parametros = parametros_urls()
+
+        medicoes = {}
+        for nome, padrao in urls_medidas():
+            if nome in VIEWS_IGNORADAS:
+                medicoes[nome] = {'ignorada': VIEWS_IGNORADAS[nome]}
+                continue
+
+            url = montar_url(padrao, parametros)
+            tempos = []
+            for _ in range(options['repeticoes']):
+                if not options['com_cache']:
+                    cache.clear()
+                # O log de consultas tem tamanho máximo; esvaziá-lo mantém a contagem correta
+                reset_queries()
+                with CaptureQueriesContext(connection) as consultas:
+                    inicio = time.perf_counter()
+                    resposta = cliente.get(url)
+                    if resposta.streaming:
+                        # Respostas em streaming só fazem o trabalho quando consumidas
+                        b''.join(resposta.streaming_content)
+                    tempos.append((time.perf_counter() - inicio) * 1000)
+
+            if resposta.status_code == 405:
+                medicoes[nome] = {'ignorada': 'aceita apenas POST'}
+                continue
+
+            if not options['com_cache']:
+                cache.clear()
+            tracemalloc.start()
+            cliente.get(url)
+            _, pico = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            tempos.sort()
+            medicoes[nome] = {
+                'url': url,
+                'status': resposta.status_code,
+                'consultas': len(consultas),
+                'p50_ms': round(statistics.median(tempos), 2),
+                'p95_ms': round(tempos[min(len(tempos) - 1, int(round(0.95 * (len(tempos) - 1))))], 2),
+                'pico_memoria_kb': round(pico / 1024, 1),
+            }
+        return medicoes
+
+    def comparar(self, base, atual, limite):
+        """Lista as views que pioraram em consultas ou em tempo além do limite"""
+        regressoes = []
+        for tamanho, views in atual['tamanhos'].items():
+            views_base = base.get('tamanhos', {}).get(tamanho, {})
+            for nome, medicao in views.items():
+                anterior = views_base.get(nome)
+                if not anterior or 'ignorada' in medicao or 'ignorada' in anterior:
+                    continue
+                if medicao['consultas'] > anterior['consultas']:
+                    regressoes.append(
+                        f'[{tamanho}] {nome}: consultas {anterior["consultas"]} -> {medicao["consultas"]}'
+                    )
+                if medicao['p50_ms'] > anterior['p50_ms'] * (1 + limite):
+                    regressoes.append(
+                        f'[{tamanho}] {nome}: p50 {anterior["p50_ms"]}ms -> {medicao["p50_ms"]}ms'
+                    )
+        return regressoes
@@ -0,0 +1,37 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from gamificacao.exportacao import EXPORTACOES, FORMATOS, exportar
+
+
+class Command(BaseCommand):
+    help = 'Exporta o ranking, as notas ou as presenças em CSV ou NDJSON, em streaming'
+
+    def add_arguments(self, parser):
+        parser.add_argument('tipo', choices=sorted(EXPORTACOES), help='O que exportar')
+        parser.add_argument('--formato', choices=sorted(FORMATOS), default='csv', help='Formato (padrão: csv)')
+        parser.add_argument('--data-inicio', help='Presenças: primeira data (AAAA-MM-DD)')
+        parser.add_argument('--data-fim', help='Presenças: última data (AAAA-MM-DD)')
+        parser.add_argument('--saida', help='Arquivo de saída (padrão: stdout)')
+
+    def handle(self, *args, **options):
+        filtros = {}
+        if options['tipo'] == 'presencas':
+            try:
+                for campo in ('data_inicio', 'data_fim'):
+                    if options[campo]:
+                        filtros[campo] = date.fromisoformat(options[campo])
+            except ValueError:
+                raise CommandError('Data inválida. Use o formato AAAA-MM-DD.')
+        elif options['data_inicio'] or options['data_fim']:
+            raise CommandError('--data-inicio e --data-fim só se aplicam às presenças.')
+
+        pedacos = exportar(options['tipo'], options['formato'], **filtros)
+        if options['saida']:
+            with open(options['saida'], 'w', encoding='utf-8', newline='') as arquivo:
+                arquivo.writelines(pedacos)
+            self.stderr.write(self.style.SUCCESS(f'Exportação gravada em {options["saida"]}.'))
+        else:
+            for pedaco in pedacos:
+                self.stdout.write(pedaco, ending='')
@@ -0,0 +1,54 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from gamificacao.notas import TAMANHO_LOTE_IMPORTACAO, ErroImportacao, importar_notas_csv
+
+
+class Command(BaseCommand):
+    help = 'Importa notas de um arquivo CSV (colunas matricula, atividade e nota) em lotes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('arquivo', help='Caminho do arquivo CSV')
+        parser.add_argument(
+            '--tamanho-lote', type=int, default=TAMANHO_LOTE_IMPORTACAO,
+            help=f'Linhas gravadas por transação (padrão: {TAMANHO_LOTE_IMPORTACAO})'
+        )
+        parser.add_argument('--delimitador', default=',', help='Separador de colunas (padrão: ,)')
+        parser.add_argument('--encoding', default='utf-8-sig', help='Codificação do arquivo (padrão: utf-8-sig)')
+        parser.add_argument('--motivo', default='Importação de CSV', help='Motivo registrado no histórico das notas')
+        parser.add_argument('--usuario', help='Nome de usuário registrado como autor das notas')
+
+    def handle(self, *args, **options):
+        if options['tamanho_lote'] < 1:
+            raise CommandError('--tamanho-lote deve ser maior que zero.')
+
+        usuario = None
+        if options['usuario']:
+            usuario = User.objects.filter(username=options['usuario']).first()
+            if usuario is None:
+                raise CommandError(f'Usuário "{options["usuario"]}" não encontrado.')
+
+        try:
+            with open(options['arquivo'], newline='', encoding=options['encoding']) as arquivo:
+                resumo = importar_notas_csv(
+                    arquivo,
+                    usuario=usuario,
+                    motivo=options['motivo'],
+                    tamanho_lote=options['tamanho_lote'],
+                    delimitador=options['delimitador'],
+                )
+        except (OSError, UnicodeDecodeError, ErroImportacao) as erro:
+            raise CommandError(str(erro))
+
+        for numero_linha, mensagem in resumo.erros:
+            self.stderr.write(self.style.WARNING(f'Linha {numero_linha}: {mensagem}'))
+        if resumo.total_erros > len(resumo.erros):
+            self.stderr.write(self.style.WARNING(
+                f'... e mais {resumo.total_erros - len(resumo.erros)} linha(s) com erro.'
+            ))
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{resumo.linhas} linha(s) lida(s): {resumo.inseridas} nota(s) nova(s), '
+            f'{resumo.atualizadas} alterada(s), {resumo.inalteradas} sem alteração '
+            f'e {resumo.total_erros} com erro.'
+        ))
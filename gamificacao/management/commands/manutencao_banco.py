@@ -0,0 +1,111 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+
+MODOS_CHECKPOINT = ('PASSIVE', 'FULL', 'RESTART', 'TRUNCATE')
+
+
+def _tamanho(caminho):
+    return os.path.getsize(caminho) if os.path.exists(caminho) else 0
+
+
+def _formatar_bytes(tamanho):
+    for unidade in ('B', 'KB', 'MB', 'GB'):
+        if tamanho < 1024 or unidade == 'GB':
+            return f'{tamanho:.0f} {unidade}' if unidade == 'B' else f'{tamanho:.1f} {unidade}'
+        tamanho /= 1024
+
+
+class Command(BaseCommand):
+    help = (
+        'Manutenção do banco SQLite: ANALYZE, VACUUM e checkpoint do WAL, '
+        'relatando o tamanho do arquivo do banco e do WAL antes e depois'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sem-vacuum', action='store_true',
+            help='Não executa o VACUUM (que reescreve o arquivo inteiro e bloqueia as escritas enquanto roda)'
+        )
+        parser.add_argument(
+            '--sem-analyze', action='store_true',
+            help='Não atualiza as estatísticas usadas pelo planejador de consultas'
+        )
+        parser.add_argument(
+            '--checkpoint', choices=MODOS_CHECKPOINT, default='TRUNCATE', type=str.upper,
+            help='Modo do wal_checkpoint (padrão: TRUNCATE, que também zera o arquivo -wal)'
+        )
+        parser.add_argument(
+            '--apenas-relatorio', action='store_true',
+            help='Só mostra o estado atual do banco, sem executar nenhuma operação'
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('Este comando só se aplica ao SQLite.')
+        arquivo = str(connection.settings_dict['NAME'])
+        if connection.is_in_memory_db():
+            raise CommandError('O banco configurado está em memória; não há arquivo para manter.')
+
+        antes = self.estado(arquivo)
+        self.relatar('Antes' if not options['apenas_relatorio'] else 'Estado atual', antes)
+        if options['apenas_relatorio']:
+            return
+
+        with connection.cursor() as cursor:
+            if not options['sem_analyze']:
+                self.stdout.write('ANALYZE...')
+                cursor.execute('ANALYZE')
+            if not options['sem_vacuum']:
+                self.stdout.write('VACUUM...')
+                cursor.execute('VACUUM')
+            self.stdout.write(f'wal_checkpoint({options["checkpoint"]})...')
+            cursor.execute(f'PRAGMA wal_checkpoint({options["checkpoint"]})')
+            ocupado, paginas_wal, paginas_copiadas = cursor.fetchone()
+
+        if ocupado:
+            self.stdout.write(self.style.WARNING(
+                'Checkpoint incompleto: havia leitores ou escritores ativos. '
+                f'{paginas_copiadas} de {paginas_wal} página(s) do WAL copiadas para o banco.'
+            ))
+
+        depois = self.estado(arquivo)
+        self.relatar('Depois', depois)
+        liberado = (antes['banco'] + antes['wal']) - (depois['banco'] + depois['wal'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Manutenção concluída. Espaço em disco liberado: {_formatar_bytes(max(liberado, 0))}.'
+        ))
+
+    def estado(self, arquivo):
+        """Modo de journal, páginas e tamanhos do banco e dos arquivos -wal/-shm"""
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            journal_mode = cursor.fetchone()[0]
+            cursor.execute('PRAGMA page_size')
+            tamanho_pagina = cursor.fetchone()[0]
+            cursor.execute('PRAGMA page_count')
+            paginas = cursor.fetchone()[0]
+            cursor.execute('PRAGMA freelist_count')
+            paginas_livres = cursor.fetchone()[0]
+        return {
+            'journal_mode': journal_mode,
+            'paginas': paginas,
+            'paginas_livres': paginas_livres,
+            'espaco_livre': paginas_livres * tamanho_pagina,
+            'banco': _tamanho(arquivo),
+            'wal': _tamanho(f'{arquivo}-wal'),
+            'shm': _tamanho(f'{arquivo}-shm'),
+        }
+
+    def relatar(self, titulo, estado):
+        self.stdout.write(self.style.MIGRATE_HEADING(f'{titulo}:'))
+        self.stdout.write(f'  journal_mode: {estado["journal_mode"]}')
+        self.stdout.write(
+            f'  páginas: {estado["paginas"]} ({estado["paginas_livres"]} livre(s), '
+            f'{_formatar_bytes(estado["espaco_livre"])})'
+        )
+        self.stdout.write(f'  banco: {_formatar_bytes(estado["banco"])}')
+        self.stdout.write(f'  WAL: {_formatar_bytes(estado["wal"])}')
+        self.stdout.write(f'  memória compartilhada (-shm): {_formatar_bytes(estado["shm"])}')
@@ -0,0 +1,117 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from gamificacao.cache_ranking import invalidar_ranking
+from gamificacao.grupos import CAMPOS_PONTUACAO_GRUPO, atualizar_pontuacoes_grupos, pontuacoes_grupos_calculadas
+from gamificacao.models import Aluno, AlunoPontuacao, Grupo, GrupoPontuacao
+from gamificacao.pontuacao import CAMPOS_PONTUACAO, pontuacoes_calculadas
+
+
+class Command(BaseCommand):
+    help = 'Reconstrói as pontuações materializadas (AlunoPontuacao e GrupoPontuacao) em lotes'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int, default=500,
+            help='Quantidade de alunos processados por lote (padrão: 500)'
+        )
+        parser.add_argument(
+            '--verify', action='store_true',
+            help='Apenas compara a tabela com os dados brutos e relata as divergências'
+        )
+
+    def handle(self, *args, **options):
+        tamanho_lote = options['chunk_size']
+        if tamanho_lote < 1:
+            raise CommandError('--chunk-size deve ser maior que zero.')
+
+        ids = list(Aluno.objects.order_by('pk').values_list('pk', flat=True))
+        lotes = [ids[i:i + tamanho_lote] for i in range(0, len(ids), tamanho_lote)]
+        ids_grupos = list(Grupo.objects.order_by('pk').values_list('pk', flat=True))
+        lotes_grupos = [ids_grupos[i:i + tamanho_lote] for i in range(0, len(ids_grupos), tamanho_lote)]
+
+        if options['verify']:
+            divergencias = sum(self.verificar_lote(lote) for lote in lotes)
+            divergencias_grupos = sum(self.verificar_lote_grupos(lote) for lote in lotes_grupos)
+            if divergencias or divergencias_grupos:
+                raise CommandError(
+                    f'{divergencias} aluno(s) e {divergencias_grupos} grupo(s) com pontuação divergente.'
+                )
+            self.stdout.write(self.style.SUCCESS(
+                f'Nenhuma divergência em {len(ids)} aluno(s) e {len(ids_grupos)} grupo(s).'
+            ))
+            return
+
+        for numero, lote in enumerate(lotes, 1):
+            with transaction.atomic():
+                AlunoPontuacao.objects.bulk_create(
+                    list(pontuacoes_calculadas(Aluno.objects.filter(pk__in=lote))),
+                    update_conflicts=True,
+                    unique_fields=['aluno'],
+                    update_fields=CAMPOS_PONTUACAO + ('data_atualizacao',),
+                )
+            self.stdout.write(f'Lote {numero}/{len(lotes)}: {len(lote)} aluno(s)')
+
+        # Os grupos dependem da pontuação dos alunos: só depois de todos os lotes acima
+        for lote in lotes_grupos:
+            with transaction.atomic():
+                atualizar_pontuacoes_grupos(lote)
+
+        # bulk_create não dispara os sinais que invalidam o ranking: uma vez, depois do último lote
+        invalidar_ranking()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Pontuação reconstruída para {len(ids)} aluno(s) e {len(ids_grupos)} grupo(s).'
+        ))
+
+    def verificar_lote(self, lote):
+        """Compara a pontuação armazenada com a calculada; retorna o número de divergências"""
+        armazenadas = AlunoPontuacao.objects.in_bulk(lote)
+        divergencias = 0
+
+        for calculada in pontuacoes_calculadas(Aluno.objects.filter(pk__in=lote)):
+            armazenada = armazenadas.get(calculada.aluno_id)
+            if armazenada is None:
+                self.stdout.write(self.style.WARNING(f'Aluno {calculada.aluno_id}: sem pontuação materializada'))
+                divergencias += 1
+                continue
+
+            campos = [
+                campo for campo in CAMPOS_PONTUACAO
+                if getattr(armazenada, campo) != getattr(calculada, campo)
+            ]
+            if campos:
+                detalhes = ', '.join(
+                    f'{campo}={getattr(armazenada, campo)} (esperado {getattr(calculada, campo)})'
+                    for campo in campos
+                )
+                self.stdout.write(self.style.WARNING(f'Aluno {calculada.aluno_id}: {detalhes}'))
+                divergencias += 1
+
+        return divergencias
+
+    def verificar_lote_grupos(self, lote):
+        """Compara os totais armazenados dos grupos com os calculados; retorna o número de divergências"""
+        armazenadas = GrupoPontuacao.objects.in_bulk(lote)
+        divergencias = 0
+
+        for calculada in pontuacoes_grupos_calculadas(lote):
+            armazenada = armazenadas.get(calculada.grupo_id)
+            if armazenada is None:
+                self.stdout.write(self.style.WARNING(f'Grupo {calculada.grupo_id}: sem pontuação materializada'))
+                divergencias += 1
+                continue
+
+            campos = [
+                campo for campo in CAMPOS_PONTUACAO_GRUPO
+                if getattr(armazenada, campo) != getattr(calculada, campo)
+            ]
+            if campos:
+                detalhes = ', '.join(
+                    f'{campo}={getattr(armazenada, campo)} (esperado {getattr(calculada, campo)})'
+                    for campo in campos
+                )
+                self.stdout.write(self.style.WARNING(f'Grupo {calculada.grupo_id}: {detalhes}'))
+                divergencias += 1
+
+        return divergencias
@@ -0,0 +1,97 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from gamificacao.caca_niquel import tabela_premios
+from gamificacao.caca_niquel_diario import CAMPOS_TOTAIS, variacoes_agrupadas
+from gamificacao.models import CacaNiquel, CacaNiquelDiario
+
+
+def _data(valor):
+    try:
+        return date.fromisoformat(valor)
+    except ValueError:
+        raise CommandError(f'Data inválida: {valor!r} (use AAAA-MM-DD).')
+
+
+class Command(BaseCommand):
+    help = (
+        'Reconstrói os totais diários do caça-níquel (CacaNiquelDiario) a partir das jogadas, '
+        'com os valores atuais dos prêmios'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--desde', type=_data,
+            help='Primeiro dia reconstruído (AAAA-MM-DD); por padrão, todo o histórico'
+        )
+        parser.add_argument(
+            '--ate', type=_data,
+            help='Último dia reconstruído (AAAA-MM-DD); por padrão, até hoje'
+        )
+        parser.add_argument(
+            '--verificar', action='store_true',
+            help='Apenas compara jogadas e resgates da tabela com as jogadas e relata as divergências'
+        )
+
+    def handle(self, *args, **options):
+        desde, ate = options['desde'], options['ate']
+        if desde and ate and ate < desde:
+            raise CommandError('--ate não pode ser anterior a --desde.')
+
+        jogadas = CacaNiquel.objects.all()
+        linhas = CacaNiquelDiario.objects.all()
+        if desde:
+            jogadas = jogadas.filter(data_jogada__date__gte=desde)
+            linhas = linhas.filter(dia__gte=desde)
+        if ate:
+            jogadas = jogadas.filter(data_jogada__date__lte=ate)
+            linhas = linhas.filter(dia__lte=ate)
+
+        calculados = variacoes_agrupadas(jogadas, tabela_premios())
+
+        if options['verificar']:
+            divergencias = self.verificar(linhas, calculados)
+            if divergencias:
+                raise CommandError(f'{divergencias} linha(s) divergente(s) nos totais diários.')
+            self.stdout.write(self.style.SUCCESS(
+                f'Nenhuma divergência em {len(calculados)} combinação(ões) de dia e recompensa.'
+            ))
+            return
+
+        with transaction.atomic():
+            excluidas, _ = linhas.delete()
+            CacaNiquelDiario.objects.bulk_create(
+                [
+                    CacaNiquelDiario(dia=dia, recompensa=recompensa, **dict(zip(CAMPOS_TOTAIS, totais)))
+                    for (dia, recompensa), totais in sorted(calculados.items())
+                ],
+                batch_size=500,
+            )
+
+        total_jogadas = sum(totais[0] for totais in calculados.values())
+        self.stdout.write(self.style.SUCCESS(
+            f'Totais diários reconstruídos: {len(calculados)} linha(s) ({excluidas} substituída(s)), '
+            f'{total_jogadas} jogada(s).'
+        ))
+
+    def verificar(self, linhas, calculados):
+        """Compara jogadas e resgates armazenados com os calculados; retorna o número de divergências"""
+        # O valor não entra na comparação: ele é o do prêmio quando cada jogada foi contabilizada
+        armazenados = {
+            (dia, recompensa): (jogadas, resgatados)
+            for dia, recompensa, jogadas, resgatados in linhas.values_list('dia', 'recompensa', 'jogadas', 'resgatados')
+        }
+        divergencias = 0
+        for chave in sorted(armazenados.keys() | calculados.keys()):
+            armazenado = armazenados.get(chave, (0, 0))
+            esperado = tuple(calculados.get(chave, (0, 0))[:2])
+            if armazenado != esperado:
+                dia, recompensa = chave
+                self.stdout.write(self.style.WARNING(
+                    f'{dia:%d/%m/%Y} {recompensa}: jogadas/resgatados={armazenado[0]}/{armazenado[1]} '
+                    f'(esperado {esperado[0]}/{esperado[1]})'
+                ))
+                divergencias += 1
+        return divergencias
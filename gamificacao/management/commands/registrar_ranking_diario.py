@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from gamificacao.ranking_diario import registrar_ranking
+
+
+class Command(BaseCommand):
+    help = (
+        'Grava o retrato do ranking de hoje (posição e pontuação de cada aluno), '
+        'recalculando apenas os alunos com notas ou presenças alteradas desde o retrato anterior'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--completo', action='store_true',
+            help='Lê a pontuação de todos os alunos, sem reaproveitar o retrato anterior'
+        )
+
+    def handle(self, *args, **options):
+        ranking, recalculados = registrar_ranking(completo=options['completo'])
+        self.stdout.write(self.style.SUCCESS(
+            f'{ranking}: {ranking.total_alunos} aluno(s), {recalculados} recalculado(s) '
+            f'e {ranking.total_alunos - recalculados} copiado(s) do retrato anterior.'
+        ))
@@ -0,0 +1,152 @@
+import random
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from gamificacao.caca_niquel import tabela_premios
+from gamificacao.caca_niquel_diario import acumular, variacoes_jogadas
+from gamificacao.models import (
+    Aluno, Atividade, CacaNiquel, Grupo, HistoricoNota, MembroGrupo, Nota, Presenca
+)
+from gamificacao.pontuacao import atualizar_pontuacoes
+
+
+PREFIXO_MATRICULA = 'BM'
+
+
+class Command(BaseCommand):
+    help = 'Gera dados sintéticos (determinísticos) para medir o desempenho das views'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--alunos', type=int, default=200, help='Quantidade de alunos (padrão: 200)')
+        parser.add_argument('--atividades', type=int, default=20, help='Quantidade de atividades (padrão: 20)')
+        parser.add_argument('--dias', type=int, default=100, help='Duração do período letivo em dias corridos (padrão: 100)')
+        parser.add_argument('--tamanho-grupo', type=int, default=5, help='Alunos por grupo (padrão: 5)')
+        parser.add_argument('--jogadas', type=int, default=None, help='Jogadas do caça-níquel (padrão: 2 por aluno)')
+        parser.add_argument('--seed', type=int, default=42, help='Semente do gerador aleatório (padrão: 42)')
+        parser.add_argument(
+            '--limpar', action='store_true',
+            help='Apaga TODOS os dados da gamificação antes de gerar os novos'
+        )
+
+    def handle(self, *args, **options):
+        if options['alunos'] < 1 or options['atividades'] < 1:
+            raise CommandError('--alunos e --atividades devem ser maiores que zero.')
+
+        if options['limpar']:
+            self.limpar()
+        elif Aluno.objects.filter(matricula__startswith=PREFIXO_MATRICULA).exists():
+            raise CommandError('Já existem dados de benchmark. Use --limpar para gerar novamente.')
+
+        rng = random.Random(options['seed'])
+        with transaction.atomic():
+            alunos = self.gerar_alunos(options['alunos'])
+            atividades = self.gerar_atividades(options['atividades'])
+            notas = self.gerar_notas(rng, alunos, atividades)
+            presencas = self.gerar_presencas(rng, alunos, options['dias'])
+            grupos = self.gerar_grupos(rng, alunos, options['tamanho_grupo'])
+            jogadas = self.gerar_jogadas(rng, alunos, options['jogadas'])
+
+            ids = [aluno.id for aluno in alunos]
+            for inicio in range(0, len(ids), 500):
+                atualizar_pontuacoes(ids[inicio:inicio + 500])
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Gerados {len(alunos)} alunos, {len(atividades)} atividades, {notas} notas, '
+            f'{presencas} presenças, {grupos} grupos e {jogadas} jogadas.'
+        ))
+
+    def limpar(self):
+        for modelo in (CacaNiquel, MembroGrupo, Grupo, HistoricoNota, Presenca, Nota, Atividade, Aluno):
+            modelo.objects.all().delete()
+
+    def gerar_alunos(self, quantidade):
+        Aluno.objects.bulk_create(
+            [
+                Aluno(
+                    nome=f'Aluno Benchmark {i:05d}',
+                    matricula=f'{PREFIXO_MATRICULA}{i:06d}',
+                    email=f'aluno{i:05d}@benchmark.local',
+                )
+                for i in range(quantidade)
+            ],
+            batch_size=1000,
+        )
+        return list(Aluno.objects.filter(matricula__startswith=PREFIXO_MATRICULA).order_by('matricula'))
+
+    def gerar_atividades(self, quantidade):
+        Atividade.objects.bulk_create(
+            [Atividade(nome=f'Atividade Benchmark {j:03d}', valor_maximo=Decimal('10.0')) for j in range(quantidade)]
+        )
+        return list(Atividade.objects.filter(nome__startswith='Atividade Benchmark').order_by('nome'))
+
+    def gerar_notas(self, rng, alunos, atividades):
+        notas = [
+            Nota(aluno=aluno, atividade=atividade, valor=Decimal(rng.randint(0, 100)) / 10)
+            for aluno in alunos
+            for atividade in atividades
+            if rng.random() < 0.85
+        ]
+        Nota.objects.bulk_create(notas, batch_size=1000)
+
+        # Algumas notas alteradas, para o histórico não ficar vazio
+        historico = [
+            HistoricoNota(
+                nota=nota,
+                valor_anterior=max(nota.valor - 1, Decimal('0.0')),
+                valor_novo=nota.valor,
+                motivo='Revisão (benchmark)',
+            )
+            for nota in notas
+            if rng.random() < 0.05
+        ]
+        HistoricoNota.objects.bulk_create(historico, batch_size=1000)
+        return len(notas)
+
+    def gerar_presencas(self, rng, alunos, dias):
+        hoje = date.today()
+        dias_letivos = [
+            hoje - timedelta(days=d) for d in range(dias)
+            if (hoje - timedelta(days=d)).weekday() < 5
+        ]
+        presencas = [
+            Presenca(aluno=aluno, data_presenca=dia, presente=rng.random() < 0.85)
+            for dia in dias_letivos
+            for aluno in alunos
+        ]
+        Presenca.objects.bulk_create(presencas, batch_size=1000)
+        return len(presencas)
+
+    def gerar_grupos(self, rng, alunos, tamanho_grupo):
+        quantidade = max(1, len(alunos) // max(tamanho_grupo, 1))
+        Grupo.objects.bulk_create([Grupo(nome=f'Grupo Benchmark {g:04d}') for g in range(quantidade)])
+        grupos = list(Grupo.objects.filter(nome__startswith='Grupo Benchmark').order_by('nome'))
+
+        membros = []
+        for grupo in grupos:
+            integrantes = rng.sample(alunos, min(tamanho_grupo, len(alunos)))
+            grupo.lider = integrantes[0]
+            membros.extend(MembroGrupo(grupo=grupo, aluno=aluno) for aluno in integrantes)
+        MembroGrupo.objects.bulk_create(membros, batch_size=1000)
+        Grupo.objects.bulk_update(grupos, ['lider'], batch_size=1000)
+        return len(grupos)
+
+    def gerar_jogadas(self, rng, alunos, quantidade):
+        if quantidade is None:
+            quantidade = len(alunos) * 2
+        # Mesma distribuição usada pelo caça-níquel (prêmios configurados)
+        tabela = tabela_premios()
+        sorteador = tabela.sorteador
+        jogadas = [
+            CacaNiquel(
+                aluno=rng.choice(alunos),
+                recompensa=sorteador.sortear(rng),
+                resgatado=rng.random() < 0.6,
+            )
+            for _ in range(quantidade)
+        ]
+        CacaNiquel.objects.bulk_create(jogadas, batch_size=1000)
+        acumular(variacoes_jogadas(jogadas, tabela))
+        return len(jogadas)
@@ -0,0 +1,165 @@
+"""
+Instrumentação de consultas por requisição.
+
+Conta as consultas SQL de cada requisição com ``connection.execute_wrapper``,
+detecta formatos de SQL repetidos (padrão N+1), expõe os cabeçalhos
+``X-Query-Count`` / ``X-DB-Time`` e confere o orçamento de consultas de cada
+view, declarado em ``settings.GAMIFICACAO_ORCAMENTO_CONSULTAS`` pelo nome da URL.
+
+O middleware atende WSGI e ASGI sem adaptação: cada conexão recebe um único
+wrapper permanente, que conta no ``ContadorConsultas`` da requisição em
+andamento, guardado em uma ``ContextVar``. O ``sync_to_async`` leva o contexto
+para a thread que executa o ORM, então as views assíncronas (dashboard,
+histórico do caça-níquel, prêmios pendentes, ranking ao vivo) são medidas sem
+nenhuma troca de thread a mais, inclusive as consultas em paralelo de
+``concorrencia.em_paralelo``.
+"""
+import logging
+import re
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+logger = logging.getLogger(__name__)
+
+# Listas de parâmetros (IN (%s, %s, ...)) e números literais não mudam o "formato" da consulta
+_LISTA_PARAMETROS = re.compile(r'\((?:\s*%s\s*,)*\s*%s\s*\)')
+_NUMEROS = re.compile(r'\b\d+\b')
+
+
+class OrcamentoConsultasExcedido(Exception):
+    """Levantada quando uma view excede o orçamento de consultas no modo estrito"""
+
+
+def formato_sql(sql):
+    """Normaliza o SQL para agrupar consultas que só diferem nos parâmetros"""
+    sql = _LISTA_PARAMETROS.sub('(...)', sql)
+    return _NUMEROS.sub('N', sql)
+
+
+class ContadorConsultas:
+    """Wrapper de execução que registra quantidade, tempo e formato das consultas"""
+
+    def __init__(self):
+        self.total = 0
+        self.tempo = 0.0
+        self.formatos = Counter()
+        # Consultas em paralelo (concorrencia.em_paralelo) contam de várias threads
+        self._lock = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duracao = time.perf_counter() - inicio
+            formato = formato_sql(sql)
+            with self._lock:
+                self.tempo += duracao
+                self.total += 1
+                self.formatos[formato] += 1
+
+    def repetidas(self, limite):
+        """Formatos de SQL executados pelo menos ``limite`` vezes"""
+        return [(sql, vezes) for sql, vezes in self.formatos.most_common() if vezes >= limite]
+
+
+_contador_atual = ContextVar('gamificacao_contador_consultas', default=None)
+
+
+def _contar_consulta(execute, sql, params, many, context):
+    """Wrapper permanente das conexões: conta no contador da requisição atual, se houver"""
+    contador = _contador_atual.get()
+    if contador is None:
+        return execute(sql, params, many, context)
+    return contador(execute, sql, params, many, context)
+
+
+def _instalar_wrapper(conexao):
+    if _contar_consulta not in conexao.execute_wrappers:
+        conexao.execute_wrappers.append(_contar_consulta)
+
+
+@receiver(connection_created)
+def instalar_contador(sender, connection, **kwargs):
+    """Cada conexão aberta (em qualquer thread) passa a ser medida"""
+    _instalar_wrapper(connection)
+
+
+class OrcamentoConsultasMiddleware:
+    """
+    Mede as consultas de cada requisição e aplica os orçamentos por view.
+
+    Configurações:
+        GAMIFICACAO_ORCAMENTO_CONSULTAS: {'nome_da_url': maximo_de_consultas} (GET/HEAD)
+        GAMIFICACAO_LIMITE_REPETICOES: repetições do mesmo SQL tratadas como N+1 (padrão: 5)
+        GAMIFICACAO_ORCAMENTO_ESTRITO: levanta OrcamentoConsultasExcedido em vez de
+            apenas registrar no log (use nos testes)
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        # Conexões abertas antes deste módulo ser importado
+        for conexao in connections.all(initialized_only=True):
+            _instalar_wrapper(conexao)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        contador = ContadorConsultas()
+        token = _contador_atual.set(contador)
+        try:
+            response = self.get_response(request)
+        finally:
+            _contador_atual.reset(token)
+        return self.concluir(request, response, contador)
+
+    async def __acall__(self, request):
+        contador = ContadorConsultas()
+        token = _contador_atual.set(contador)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _contador_atual.reset(token)
+        return self.concluir(request, response, contador)
+
+    def concluir(self, request, response, contador):
+        # Em respostas em streaming, as consultas feitas durante o envio não entram na conta
+        response['X-Query-Count'] = str(contador.total)
+        response['X-DB-Time'] = f'{contador.tempo * 1000:.1f}ms'
+
+        nome_url = request.resolver_match.url_name if request.resolver_match else None
+        self.verificar(request, nome_url, contador)
+        return response
+
+    def verificar(self, request, nome_url, contador):
+        estrito = getattr(settings, 'GAMIFICACAO_ORCAMENTO_ESTRITO', False)
+        limite = getattr(settings, 'GAMIFICACAO_LIMITE_REPETICOES', 5)
+        problemas = []
+
+        for sql, vezes in contador.repetidas(limite):
+            problemas.append(f'possível N+1 em {request.path} ({nome_url}): {vezes}x {sql[:200]}')
+
+        # O orçamento vale para leituras; escritas variam com o tamanho do envio
+        orcamento = getattr(settings, 'GAMIFICACAO_ORCAMENTO_CONSULTAS', {}).get(nome_url)
+        if request.method in ('GET', 'HEAD') and orcamento is not None and contador.total > orcamento:
+            problemas.append(
+                f'{request.path} ({nome_url}) executou {contador.total} consultas; orçamento: {orcamento}'
+            )
+
+        for problema in problemas:
+            logger.warning(problema)
+        if estrito and problemas:
+            raise OrcamentoConsultasExcedido('; '.join(problemas))
@@ -0,0 +1,72 @@
+# Generated by Django 5.2.18 on 2026-10-17 19:47
+
+import django.db.models.deletion
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import migrations, models
+
+
+def popular_pontuacoes(apps, schema_editor):
+    """Calcula a pontuação materializada inicial a partir das notas e presenças existentes"""
+    Aluno = apps.get_model('gamificacao', 'Aluno')
+    Nota = apps.get_model('gamificacao', 'Nota')
+    Presenca = apps.get_model('gamificacao', 'Presenca')
+    AlunoPontuacao = apps.get_model('gamificacao', 'AlunoPontuacao')
+
+    notas = defaultdict(lambda: [Decimal('0'), 0])
+    for aluno_id, valor in Nota.objects.values_list('aluno_id', 'valor').iterator():
+        notas[aluno_id][0] += valor
+        notas[aluno_id][1] += 1
+
+    presencas = defaultdict(lambda: [0, 0])
+    for aluno_id, presente in Presenca.objects.values_list('aluno_id', 'presente').iterator():
+        presencas[aluno_id][0 if presente else 1] += 1
+
+    pontuacoes = []
+    for aluno_id in Aluno.objects.values_list('id', flat=True).iterator():
+        soma_notas, qtd_notas = notas[aluno_id]
+        qtd_presencas, qtd_faltas = presencas[aluno_id]
+        nota_media = float(round(soma_notas / qtd_notas, 2)) if qtd_notas else 0.0
+        pontos_presenca = round(qtd_presencas - qtd_faltas * 0.5, 1)
+        pontuacoes.append(AlunoPontuacao(
+            aluno_id=aluno_id,
+            soma_notas=soma_notas,
+            qtd_notas=qtd_notas,
+            qtd_presencas=qtd_presencas,
+            qtd_faltas=qtd_faltas,
+            nota_media=nota_media,
+            pontos_presenca=pontos_presenca,
+            pontuacao_total=round(nota_media + pontos_presenca, 2),
+        ))
+    AlunoPontuacao.objects.bulk_create(pontuacoes, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gamificacao', '0005_grupo_lider'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AlunoPontuacao',
+            fields=[
+                ('aluno', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='pontuacao', serialize=False, to='gamificacao.aluno', verbose_name='Aluno')),
+                ('soma_notas', models.DecimalField(decimal_places=1, default=0, max_digits=10, verbose_name='Soma das Notas')),
+                ('qtd_notas', models.PositiveIntegerField(default=0, verbose_name='Quantidade de Notas')),
+                ('qtd_presencas', models.PositiveIntegerField(default=0, verbose_name='Presenças')),
+                ('qtd_faltas', models.PositiveIntegerField(default=0, verbose_name='Faltas')),
+                ('nota_media', models.FloatField(default=0, verbose_name='Nota Média')),
+                ('pontos_presenca', models.FloatField(default=0, verbose_name='Pontos de Presença')),
+                ('pontuacao_total', models.FloatField(default=0, verbose_name='Pontuação Total')),
+                ('data_atualizacao', models.DateTimeField(auto_now=True, verbose_name='Data de Atualização')),
+            ],
+            options={
+                'verbose_name': 'Pontuação do Aluno',
+                'verbose_name_plural': 'Pontuações dos Alunos',
+                'indexes': [models.Index(fields=['-pontuacao_total', '-nota_media', '-pontos_presenca'], name='pontuacao_ranking_idx')],
+            },
+        ),
+        migrations.RunPython(popular_pontuacoes, migrations.RunPython.noop),
+    ]
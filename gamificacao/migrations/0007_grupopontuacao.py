@@ -0,0 +1,63 @@
+# Generated by Django 5.2.18 on 2026-10-17 20:02
+
+import statistics
+from collections import defaultdict
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def popular_pontuacoes_grupos(apps, schema_editor):
+    """Calcula os totais iniciais de cada grupo a partir da pontuação materializada dos membros"""
+    Grupo = apps.get_model('gamificacao', 'Grupo')
+    MembroGrupo = apps.get_model('gamificacao', 'MembroGrupo')
+    GrupoPontuacao = apps.get_model('gamificacao', 'GrupoPontuacao')
+
+    pontos = defaultdict(list)
+    for grupo_id, pontuacao in MembroGrupo.objects.values_list(
+        'grupo_id', 'aluno__pontuacao__pontuacao_total'
+    ).iterator():
+        pontos[grupo_id].append(pontuacao or 0.0)
+
+    GrupoPontuacao.objects.bulk_create(
+        [
+            GrupoPontuacao(
+                grupo_id=grupo_id,
+                qtd_membros=len(pontos[grupo_id]),
+                pontuacao_total=round(sum(pontos[grupo_id]), 2),
+                pontuacao_media=(
+                    round(sum(pontos[grupo_id]) / len(pontos[grupo_id]), 2) if pontos[grupo_id] else 0.0
+                ),
+                pontuacao_mediana=round(statistics.median(pontos[grupo_id]), 2) if pontos[grupo_id] else 0.0,
+            )
+            for grupo_id in Grupo.objects.values_list('id', flat=True).iterator()
+        ],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gamificacao', '0006_alunopontuacao'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GrupoPontuacao',
+            fields=[
+                ('grupo', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='pontuacao', serialize=False, to='gamificacao.grupo', verbose_name='Grupo')),
+                ('qtd_membros', models.PositiveIntegerField(default=0, verbose_name='Membros')),
+                ('pontuacao_total', models.FloatField(default=0, verbose_name='Pontuação Total')),
+                ('pontuacao_media', models.FloatField(default=0, verbose_name='Pontuação Média')),
+                ('pontuacao_mediana', models.FloatField(default=0, verbose_name='Pontuação Mediana')),
+                ('data_atualizacao', models.DateTimeField(auto_now=True, verbose_name='Data de Atualização')),
+            ],
+            options={
+                'verbose_name': 'Pontuação do Grupo',
+                'verbose_name_plural': 'Pontuações dos Grupos',
+                'indexes': [models.Index(fields=['-pontuacao_media', '-pontuacao_total'], name='grupo_pontuacao_ranking_idx')],
+            },
+        ),
+        migrations.RunPython(popular_pontuacoes_grupos, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 5.2.18 on 2026-10-17 20:05
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gamificacao', '0007_grupopontuacao'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='aluno',
+            index=models.Index(fields=['nome'], name='aluno_nome_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='aluno',
+            index=models.Index(condition=models.Q(('ativo', True)), fields=['nome'], name='aluno_ativo_nome_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='atividade',
+            index=models.Index(fields=['-data_criacao'], name='atividade_criacao_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='atividade',
+            index=models.Index(condition=models.Q(('ativa', True)), fields=['-data_criacao'], name='atividade_ativa_criacao_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cacaniquel',
+            index=models.Index(fields=['-data_jogada'], name='cacaniquel_data_jogada_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cacaniquel',
+            index=models.Index(fields=['recompensa', 'resgatado'], name='cacaniquel_recompensa_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cacaniquel',
+            index=models.Index(condition=models.Q(('resgatado', False)), fields=['-data_jogada'], name='cacaniquel_pendentes_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cacaniquel',
+            index=models.Index(condition=models.Q(('resgatado', False)), fields=['recompensa'], name='cacaniquel_pend_recomp_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='grupo',
+            index=models.Index(condition=models.Q(('ativo', True)), fields=['nome'], name='grupo_ativo_nome_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='historiconota',
+            index=models.Index(fields=['nota', '-data_alteracao'], name='historico_nota_data_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='membrogrupo',
+            index=models.Index(fields=['grupo', 'data_adicao'], name='membro_grupo_adicao_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='presenca',
+            index=models.Index(fields=['data_presenca', 'presente'], name='presenca_data_presente_idx'),
+        ),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 5.2.18 on 2026-10-17 20:11
+
+import django.core.validators
+from decimal import Decimal
+
+from django.db import migrations, models
+
+
+# Tabela que ficava fixa no código (probabilidades da view e valores de CacaNiquel.valor_recompensa)
+PREMIOS_INICIAIS = [
+    # chave, rótulo, emoji, classe CSS, peso, valor
+    ('10_reais', 'R$ 10,00', '💰', 'premio-dourado', 2, Decimal('10.00')),
+    ('5_reais', 'R$ 5,00', '💵', 'premio-prata', 5, Decimal('5.00')),
+    ('vale_trabalho', 'Vale-trabalho', '📝', 'premio-bronze', 8, Decimal('0.00')),
+    ('doce', 'Doce', '🍭', 'premio-comum', 35, Decimal('2.00')),
+    ('salgado', 'Salgado', '🥨', 'premio-comum', 50, Decimal('3.00')),
+]
+
+
+def criar_premios_iniciais(apps, schema_editor):
+    Premio = apps.get_model('gamificacao', 'Premio')
+    Premio.objects.bulk_create([
+        Premio(chave=chave, rotulo=rotulo, emoji=emoji, classe_css=classe_css, peso=peso, valor=valor, ordem=ordem)
+        for ordem, (chave, rotulo, emoji, classe_css, peso, valor) in enumerate(PREMIOS_INICIAIS)
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gamificacao', '0008_indices_consultas'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Premio',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('chave', models.SlugField(help_text='Identificador gravado em cada jogada (ex.: 10_reais). Não altere depois de haver jogadas.', max_length=20, unique=True, verbose_name='Chave')),
+                ('rotulo', models.CharField(max_length=50, verbose_name='Rótulo')),
+                ('emoji', models.CharField(blank=True, max_length=10, verbose_name='Emoji')),
+                ('classe_css', models.CharField(default='premio-comum', help_text='premio-dourado, premio-prata, premio-bronze ou premio-comum', max_length=30, verbose_name='Classe CSS')),
+                ('peso', models.PositiveIntegerField(help_text='Chance relativa: a probabilidade é o peso dividido pela soma dos pesos dos prêmios ativos', verbose_name='Peso')),
+                ('valor', models.DecimalField(decimal_places=2, default=0, max_digits=7, validators=[django.core.validators.MinValueValidator(0)], verbose_name='Valor (R$)')),
+                ('ativo', models.BooleanField(default=True, verbose_name='Ativo')),
+                ('ordem', models.PositiveSmallIntegerField(default=0, verbose_name='Ordem')),
+                ('data_atualizacao', models.DateTimeField(auto_now=True, verbose_name='Data de Atualização')),
+            ],
+            options={
+                'verbose_name': 'Prêmio',
+                'verbose_name_plural': 'Prêmios',
+                'ordering': ['ordem', 'chave'],
+            },
+        ),
+        migrations.AlterField(
+            model_name='cacaniquel',
+            name='recompensa',
+            field=models.CharField(max_length=20, verbose_name='Recompensa'),
+        ),
+        migrations.RunPython(criar_premios_iniciais, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-17 20:14
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gamificacao', '0009_premio'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='premio',
+            name='estoque',
+            field=models.PositiveIntegerField(blank=True, help_text='Unidades restantes, descontadas a cada prêmio sorteado. Vazio = ilimitado.', null=True, verbose_name='Estoque'),
+        ),
+        migrations.CreateModel(
+            name='OrcamentoPremios',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('descricao', models.CharField(blank=True, max_length=100, verbose_name='Descrição')),
+                ('inicio', models.DateField(verbose_name='Início')),
+                ('fim', models.DateField(verbose_name='Fim')),
+                ('limite', models.DecimalField(decimal_places=2, max_digits=9, validators=[django.core.validators.MinValueValidator(0)], verbose_name='Limite (R$)')),
+                ('limite_centavos', models.PositiveIntegerField(default=0, editable=False)),
+                ('gasto_centavos', models.PositiveIntegerField(default=0, editable=False, verbose_name='Gasto (centavos)')),
+                ('data_atualizacao', models.DateTimeField(auto_now=True, verbose_name='Data de Atualização')),
+            ],
+            options={
+                'verbose_name': 'Orçamento de Prêmios',
+                'verbose_name_plural': 'Orçamentos de Prêmios',
+                'ordering': ['-inicio'],
+                'indexes': [models.Index(fields=['inicio', 'fim'], name='orcamento_periodo_idx')],
+            },
+        ),
+    ]
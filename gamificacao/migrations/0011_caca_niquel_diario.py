@@ -0,0 +1,60 @@
+# Generated by Django 5.2.18 on 2026-10-17 20:20
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+from django.db.models.functions import TruncDate
+
+
+def preencher_totais_diarios(apps, schema_editor):
+    # Mesma conta de ``manage.py reconstruir_caca_niquel_diario``, com os modelos históricos
+    CacaNiquel = apps.get_model('gamificacao', 'CacaNiquel')
+    CacaNiquelDiario = apps.get_model('gamificacao', 'CacaNiquelDiario')
+    Premio = apps.get_model('gamificacao', 'Premio')
+
+    valores = {chave: int(valor * 100) for chave, valor in Premio.objects.values_list('chave', 'valor')}
+    totais = (
+        CacaNiquel.objects
+        .annotate(dia=TruncDate('data_jogada'))
+        .order_by()
+        .values_list('dia', 'recompensa')
+        .annotate(quantidade=Count('pk'), quantidade_resgatados=Count('pk', filter=Q(resgatado=True)))
+    )
+    CacaNiquelDiario.objects.bulk_create(
+        [
+            CacaNiquelDiario(
+                dia=dia, recompensa=recompensa, jogadas=jogadas, resgatados=resgatados,
+                valor_centavos=jogadas * valores.get(recompensa, 0),
+            )
+            for dia, recompensa, jogadas, resgatados in totais
+        ],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gamificacao', '0010_estoque_orcamento_premios'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CacaNiquelDiario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dia', models.DateField(verbose_name='Dia')),
+                ('recompensa', models.CharField(max_length=20, verbose_name='Recompensa')),
+                ('jogadas', models.PositiveIntegerField(default=0, verbose_name='Jogadas')),
+                ('resgatados', models.PositiveIntegerField(default=0, verbose_name='Resgatados')),
+                ('valor_centavos', models.BigIntegerField(default=0, verbose_name='Valor (centavos)')),
+                ('data_atualizacao', models.DateTimeField(auto_now=True, verbose_name='Data de Atualização')),
+            ],
+            options={
+                'verbose_name': 'Caça-níquel por Dia',
+                'verbose_name_plural': 'Caça-níquel por Dia',
+                'ordering': ['-dia', 'recompensa'],
+                'constraints': [models.UniqueConstraint(fields=('dia', 'recompensa'), name='cacaniquel_diario_unico')],
+            },
+        ),
+        migrations.RunPython(preencher_totais_diarios, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-17 20:24
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gamificacao', '0011_caca_niquel_diario'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RankingDiario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dia', models.DateField(unique=True, verbose_name='Dia')),
+                ('calculado_em', models.DateTimeField(verbose_name='Calculado em')),
+                ('total_alunos', models.PositiveIntegerField(default=0, verbose_name='Alunos no Ranking')),
+                ('alunos_recalculados', models.PositiveIntegerField(default=0, verbose_name='Alunos Recalculados')),
+            ],
+            options={
+                'verbose_name': 'Ranking Diário',
+                'verbose_name_plural': 'Rankings Diários',
+                'ordering': ['-dia'],
+            },
+        ),
+        migrations.CreateModel(
+            name='PosicaoDiaria',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('posicao', models.PositiveIntegerField(verbose_name='Posição')),
+                ('pontuacao_total', models.FloatField(verbose_name='Pontuação Total')),
+                ('nota_media', models.FloatField(verbose_name='Nota Média')),
+                ('pontos_presenca', models.FloatField(verbose_name='Pontos de Presença')),
+                ('aluno', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='posicoes_diarias', to='gamificacao.aluno', verbose_name='Aluno')),
+                ('ranking', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='posicoes', to='gamificacao.rankingdiario', verbose_name='Ranking')),
+            ],
+            options={
+                'verbose_name': 'Posição Diária',
+                'verbose_name_plural': 'Posições Diárias',
+                'ordering': ['ranking', 'posicao'],
+                'indexes': [models.Index(fields=['aluno', 'ranking'], name='posicao_diaria_aluno_idx')],
+                'constraints': [models.UniqueConstraint(fields=('ranking', 'aluno'), name='posicao_diaria_unica')],
+            },
+        ),
+    ]
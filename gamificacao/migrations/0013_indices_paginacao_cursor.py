@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:19
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gamificacao', '0012_ranking_diario'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='atividade',
+            name='atividade_criacao_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='cacaniquel',
+            name='cacaniquel_data_jogada_idx',
+        ),
+        migrations.AddIndex(
+            model_name='atividade',
+            index=models.Index(fields=['-data_criacao', '-id'], name='atividade_criacao_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cacaniquel',
+            index=models.Index(fields=['-data_jogada', '-id'], name='cacaniquel_data_jogada_id_idx'),
+        ),
+    ]
@@ -1,3 +1,6 @@
+from decimal import Decimal
+
+from django.core.exceptions import ObjectDoesNotExist, ValidationError
 from django.db import models
 from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator, MaxValueValidator
@@ -15,6 +18,11 @@ class Aluno(models.Model):
         verbose_name = 'Aluno'
         verbose_name_plural = 'Alunos'
         ordering = ['nome']
+        indexes = [
+            models.Index(fields=['nome'], name='aluno_nome_idx'),
+            # Listas de alunos ativos em ordem alfabética (ranking, presenças, grupos)
+            models.Index(fields=['nome'], condition=models.Q(ativo=True), name='aluno_ativo_nome_idx'),
+        ]
 
     def __str__(self):
         return self.nome
@@ -66,7 +74,11 @@ class Aluno(models.Model):
     @property
     def pontuacao_total(self):
         """Retorna a pontuação total (nota + presença)"""
-        return round(self.nota_atual + self.pontos_presenca, 2)
+        # Lida da tabela materializada; use select_related('pontuacao') em listas
+        try:
+            return self.pontuacao.pontuacao_total
+        except ObjectDoesNotExist:
+            return round(float(self.nota_atual) + float(self.pontos_presenca), 2)
 
 
 class Atividade(models.Model):
@@ -87,6 +99,13 @@ class Atividade(models.Model):
         verbose_name = 'Atividade'
         verbose_name_plural = 'Atividades'
         ordering = ['-data_criacao']
+        indexes = [
+            # Também desempata pelo id: paginação por cursor ('-data_criacao', '-pk') sem ordenação temporária
+            models.Index(fields=['-data_criacao', '-id'], name='atividade_criacao_id_idx'),
+            models.Index(
+                fields=['-data_criacao'], condition=models.Q(ativa=True), name='atividade_ativa_criacao_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.nome
@@ -157,11 +176,100 @@ class HistoricoNota(models.Model):
         verbose_name = 'Histórico de Nota'
         verbose_name_plural = 'Histórico de Notas'
         ordering = ['-data_alteracao']
+        indexes = [
+            # Histórico de uma nota, do mais recente para o mais antigo
+            models.Index(fields=['nota', '-data_alteracao'], name='historico_nota_data_idx'),
+        ]
 
     def __str__(self):
         return f'{self.nota.aluno.nome} - {self.nota.atividade.nome}: {self.valor_anterior} → {self.valor_novo}'
 
 
+class AlunoPontuacao(models.Model):
+    """Pontuação materializada do aluno, mantida a cada lançamento de nota ou presença"""
+    aluno = models.OneToOneField(
+        Aluno,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='pontuacao',
+        verbose_name='Aluno'
+    )
+    soma_notas = models.DecimalField(max_digits=10, decimal_places=1, default=0, verbose_name='Soma das Notas')
+    qtd_notas = models.PositiveIntegerField(default=0, verbose_name='Quantidade de Notas')
+    qtd_presencas = models.PositiveIntegerField(default=0, verbose_name='Presenças')
+    qtd_faltas = models.PositiveIntegerField(default=0, verbose_name='Faltas')
+    nota_media = models.FloatField(default=0, verbose_name='Nota Média')
+    pontos_presenca = models.FloatField(default=0, verbose_name='Pontos de Presença')
+    pontuacao_total = models.FloatField(default=0, verbose_name='Pontuação Total')
+    data_atualizacao = models.DateTimeField(auto_now=True, verbose_name='Data de Atualização')
+
+    class Meta:
+        verbose_name = 'Pontuação do Aluno'
+        verbose_name_plural = 'Pontuações dos Alunos'
+        indexes = [
+            # Mesma ordem do ranking: total, média e pontos de presença
+            models.Index(
+                fields=['-pontuacao_total', '-nota_media', '-pontos_presenca'],
+                name='pontuacao_ranking_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.aluno.nome}: {self.pontuacao_total} pts'
+
+    @property
+    def percentual_presenca(self):
+        """Retorna o percentual de presença a partir das contagens materializadas"""
+        total = self.qtd_presencas + self.qtd_faltas
+        if total > 0:
+            return round((self.qtd_presencas / total) * 100, 1)
+        return 0.0
+
+
+class RankingDiario(models.Model):
+    """Retrato diário do ranking: quando foi calculado e quantos alunos tinham mudado"""
+    dia = models.DateField(unique=True, verbose_name='Dia')
+    calculado_em = models.DateTimeField(verbose_name='Calculado em')
+    total_alunos = models.PositiveIntegerField(default=0, verbose_name='Alunos no Ranking')
+    alunos_recalculados = models.PositiveIntegerField(default=0, verbose_name='Alunos Recalculados')
+
+    class Meta:
+        verbose_name = 'Ranking Diário'
+        verbose_name_plural = 'Rankings Diários'
+        ordering = ['-dia']
+
+    def __str__(self):
+        return f'Ranking de {self.dia:%d/%m/%Y}'
+
+
+class PosicaoDiaria(models.Model):
+    """Pontuação e posição de um aluno em um retrato diário do ranking"""
+    ranking = models.ForeignKey(
+        RankingDiario, on_delete=models.CASCADE, related_name='posicoes', verbose_name='Ranking'
+    )
+    aluno = models.ForeignKey(Aluno, on_delete=models.CASCADE, related_name='posicoes_diarias', verbose_name='Aluno')
+    posicao = models.PositiveIntegerField(verbose_name='Posição')
+    # Critérios do ranking, para que o próximo retrato possa reaproveitar a linha sem recalcular
+    pontuacao_total = models.FloatField(verbose_name='Pontuação Total')
+    nota_media = models.FloatField(verbose_name='Nota Média')
+    pontos_presenca = models.FloatField(verbose_name='Pontos de Presença')
+
+    class Meta:
+        verbose_name = 'Posição Diária'
+        verbose_name_plural = 'Posições Diárias'
+        ordering = ['ranking', 'posicao']
+        constraints = [
+            models.UniqueConstraint(fields=['ranking', 'aluno'], name='posicao_diaria_unica'),
+        ]
+        indexes = [
+            # Tendência de um aluno: suas posições nos últimos retratos
+            models.Index(fields=['aluno', 'ranking'], name='posicao_diaria_aluno_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.aluno.nome}: {self.posicao}º em {self.ranking.dia:%d/%m/%Y}'
+
+
 class Presenca(models.Model):
     """Modelo para controlar a presença dos alunos"""
     aluno = models.ForeignKey(Aluno, on_delete=models.CASCADE, verbose_name='Aluno')
@@ -183,6 +291,10 @@ class Presenca(models.Model):
         verbose_name_plural = 'Presenças'
         unique_together = ('aluno', 'data_presenca')  # Um aluno não pode ter duas presenças para o mesmo dia
         ordering = ['-data_presenca', 'aluno__nome']
+        indexes = [
+            # Filtros por período e contagens de presenças/faltas no período
+            models.Index(fields=['data_presenca', 'presente'], name='presenca_data_presente_idx'),
+        ]
 
     def __str__(self):
         status = 'Presente' if self.presente else 'Faltou'
@@ -220,6 +332,9 @@ class Grupo(models.Model):
         verbose_name = 'Grupo'
         verbose_name_plural = 'Grupos'
         ordering = ['nome']
+        indexes = [
+            models.Index(fields=['nome'], condition=models.Q(ativo=True), name='grupo_ativo_nome_idx'),
+        ]
 
     def __str__(self):
         return self.nome
@@ -235,21 +350,22 @@ class Grupo(models.Model):
         from django.db import models
         return models.QuerySet(model=Aluno).filter(grupos__grupo=self)
 
+    def _carregar_ranking(self):
+        """Calcula ranking e média deste grupo, se ainda não vieram de um cálculo em lote"""
+        if not hasattr(self, 'ranking_membros'):
+            from .grupos import carregar_rankings
+            carregar_rankings([self])
+
     @property
     def media_grupo(self):
         """Retorna a média de pontos do grupo"""
-        alunos_grupo = [membro.aluno for membro in self.membros.all()]
-        if alunos_grupo:
-            total_pontos = sum(float(aluno.pontuacao_total) for aluno in alunos_grupo)
-            return round(total_pontos / len(alunos_grupo), 2)
-        return 0.0
+        self._carregar_ranking()
+        return self.media_calculada
 
     def get_ranking_grupo(self):
         """Retorna os alunos do grupo ordenados por pontuação"""
-        membros = self.membros.select_related('aluno').all()
-        alunos_com_pontos = [(membro.aluno, float(membro.aluno.pontuacao_total)) for membro in membros]
-        alunos_ordenados = sorted(alunos_com_pontos, key=lambda x: (-x[1], x[0].nome))
-        return [aluno for aluno, _ in alunos_ordenados]
+        self._carregar_ranking()
+        return [item.aluno for item in self.ranking_membros]
 
 
 class MembroGrupo(models.Model):
@@ -270,23 +386,155 @@ class MembroGrupo(models.Model):
         verbose_name_plural = 'Membros do Grupo'
         unique_together = ('grupo', 'aluno')  # Um aluno não pode estar no mesmo grupo duas vezes
         ordering = ['data_adicao']
+        indexes = [
+            models.Index(fields=['grupo', 'data_adicao'], name='membro_grupo_adicao_idx'),
+        ]
 
     def __str__(self):
         return f'{self.aluno.nome} - {self.grupo.nome}'
 
 
+class GrupoPontuacao(models.Model):
+    """Totais materializados do grupo, mantidos a cada mudança de membros ou de pontuação"""
+    grupo = models.OneToOneField(
+        Grupo,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='pontuacao',
+        verbose_name='Grupo'
+    )
+    qtd_membros = models.PositiveIntegerField(default=0, verbose_name='Membros')
+    pontuacao_total = models.FloatField(default=0, verbose_name='Pontuação Total')
+    pontuacao_media = models.FloatField(default=0, verbose_name='Pontuação Média')
+    pontuacao_mediana = models.FloatField(default=0, verbose_name='Pontuação Mediana')
+    data_atualizacao = models.DateTimeField(auto_now=True, verbose_name='Data de Atualização')
+
+    class Meta:
+        verbose_name = 'Pontuação do Grupo'
+        verbose_name_plural = 'Pontuações dos Grupos'
+        indexes = [
+            # Mesma ordem do ranking entre grupos: média e depois total
+            models.Index(fields=['-pontuacao_media', '-pontuacao_total'], name='grupo_pontuacao_ranking_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.grupo.nome}: {self.pontuacao_media} pts (média)'
+
+
+class Premio(models.Model):
+    """Configuração de uma recompensa do caça-níquel: chance, exibição e valor"""
+    chave = models.SlugField(
+        max_length=20, unique=True, verbose_name='Chave',
+        help_text='Identificador gravado em cada jogada (ex.: 10_reais). Não altere depois de haver jogadas.'
+    )
+    rotulo = models.CharField(max_length=50, verbose_name='Rótulo')
+    emoji = models.CharField(max_length=10, blank=True, verbose_name='Emoji')
+    classe_css = models.CharField(
+        max_length=30, default='premio-comum', verbose_name='Classe CSS',
+        help_text='premio-dourado, premio-prata, premio-bronze ou premio-comum'
+    )
+    peso = models.PositiveIntegerField(
+        verbose_name='Peso',
+        help_text='Chance relativa: a probabilidade é o peso dividido pela soma dos pesos dos prêmios ativos'
+    )
+    valor = models.DecimalField(
+        max_digits=7, decimal_places=2, default=0,
+        validators=[MinValueValidator(0)],
+        verbose_name='Valor (R$)'
+    )
+    estoque = models.PositiveIntegerField(
+        null=True, blank=True, verbose_name='Estoque',
+        help_text='Unidades restantes, descontadas a cada prêmio sorteado. Vazio = ilimitado.'
+    )
+    ativo = models.BooleanField(default=True, verbose_name='Ativo')
+    ordem = models.PositiveSmallIntegerField(default=0, verbose_name='Ordem')
+    data_atualizacao = models.DateTimeField(auto_now=True, verbose_name='Data de Atualização')
+
+    class Meta:
+        verbose_name = 'Prêmio'
+        verbose_name_plural = 'Prêmios'
+        ordering = ['ordem', 'chave']
+
+    def __str__(self):
+        return f'{self.emoji} {self.rotulo}'.strip()
+
+    def clean(self):
+        if self.ativo and not self.peso:
+            raise ValidationError({'peso': 'Um prêmio ativo precisa ter peso maior que zero.'})
+        if not self.ativo:
+            outros_ativos = Premio.objects.exclude(pk=self.pk).filter(ativo=True, peso__gt=0)
+            if not outros_ativos.exists():
+                raise ValidationError('O caça-níquel precisa de pelo menos um prêmio ativo.')
+
+    def save(self, *args, **kwargs):
+        # Pesos inválidos quebrariam o sorteio: valida também fora dos formulários
+        self.full_clean()
+        super().save(*args, **kwargs)
+
+
+class OrcamentoPremios(models.Model):
+    """Orçamento em dinheiro para os prêmios do caça-níquel em um período"""
+    descricao = models.CharField(max_length=100, blank=True, verbose_name='Descrição')
+    inicio = models.DateField(verbose_name='Início')
+    fim = models.DateField(verbose_name='Fim')
+    limite = models.DecimalField(
+        max_digits=9, decimal_places=2, validators=[MinValueValidator(0)], verbose_name='Limite (R$)'
+    )
+    # Contadores em centavos: a comparação do UPDATE condicional fica exata no SQLite
+    limite_centavos = models.PositiveIntegerField(default=0, editable=False)
+    gasto_centavos = models.PositiveIntegerField(default=0, editable=False, verbose_name='Gasto (centavos)')
+    data_atualizacao = models.DateTimeField(auto_now=True, verbose_name='Data de Atualização')
+
+    class Meta:
+        verbose_name = 'Orçamento de Prêmios'
+        verbose_name_plural = 'Orçamentos de Prêmios'
+        ordering = ['-inicio']
+        indexes = [
+            models.Index(fields=['inicio', 'fim'], name='orcamento_periodo_idx'),
+        ]
+
+    def __str__(self):
+        periodo = f'{self.inicio:%d/%m/%Y} a {self.fim:%d/%m/%Y}'
+        return f'{self.descricao} ({periodo})' if self.descricao else periodo
+
+    @property
+    def gasto(self):
+        return Decimal(self.gasto_centavos) / 100
+
+    @property
+    def saldo(self):
+        return self.limite - self.gasto
+
+    def clean(self):
+        if self.inicio and self.fim:
+            if self.fim < self.inicio:
+                raise ValidationError({'fim': 'O fim do período não pode ser anterior ao início.'})
+            sobrepostos = (
+                OrcamentoPremios.objects
+                .exclude(pk=self.pk)
+                .filter(inicio__lte=self.fim, fim__gte=self.inicio)
+            )
+            if sobrepostos.exists():
+                raise ValidationError('Já existe um orçamento para parte deste período.')
+
+    def save(self, *args, **kwargs):
+        self.full_clean()
+        self.limite_centavos = int(self.limite * 100)
+        if self.pk is not None and kwargs.get('update_fields') is None and not self._state.adding:
+            # O gasto só muda pelo UPDATE condicional das jogadas; salvar o formulário
+            # não pode sobrescrevê-lo com o valor lido antes
+            kwargs['update_fields'] = [
+                campo.name for campo in self._meta.concrete_fields
+                if not campo.primary_key and campo.name != 'gasto_centavos'
+            ]
+        super().save(*args, **kwargs)
+
+
 class CacaNiquel(models.Model):
     """Modelo para registrar as jogadas no caça-níquel"""
-    RECOMPENSAS_CHOICES = [
-        ('10_reais', '💰 R$ 10,00'),
-        ('5_reais', '💵 R$ 5,00'), 
-        ('vale_trabalho', '📝 Vale-trabalho'),
-        ('doce', '🍭 Doce'),
-        ('salgado', '🥨 Salgado'),
-    ]
-    
     aluno = models.ForeignKey(Aluno, on_delete=models.CASCADE, verbose_name='Aluno')
-    recompensa = models.CharField(max_length=20, choices=RECOMPENSAS_CHOICES, verbose_name='Recompensa')
+    # Chave de um Premio (as opções ficam configuradas no banco, não no código)
+    recompensa = models.CharField(max_length=20, verbose_name='Recompensa')
     data_jogada = models.DateTimeField(auto_now_add=True, verbose_name='Data da Jogada')
     resgatado = models.BooleanField(default=False, verbose_name='Resgatado')
     data_resgate = models.DateTimeField(null=True, blank=True, verbose_name='Data do Resgate')
@@ -302,19 +550,64 @@ class CacaNiquel(models.Model):
         verbose_name = 'Caça-níquel'
         verbose_name_plural = 'Caça-níquel'
         ordering = ['-data_jogada']
+        indexes = [
+            # Ordem do histórico por cursor ('-data_jogada', '-pk'), com o desempate no próprio índice
+            models.Index(fields=['-data_jogada', '-id'], name='cacaniquel_data_jogada_id_idx'),
+            models.Index(fields=['recompensa', 'resgatado'], name='cacaniquel_recompensa_idx'),
+            # Prêmios pendentes: lista por data e totais por recompensa
+            models.Index(
+                fields=['-data_jogada'], condition=models.Q(resgatado=False), name='cacaniquel_pendentes_idx'
+            ),
+            models.Index(
+                fields=['recompensa'], condition=models.Q(resgatado=False), name='cacaniquel_pend_recomp_idx'
+            ),
+        ]
 
     def __str__(self):
         status = '✅ Resgatado' if self.resgatado else '⏳ Pendente'
         return f'{self.aluno.nome} - {self.get_recompensa_display()} ({status})'
 
+    @property
+    def config_premio(self):
+        """Configuração do prêmio sorteado, lida da tabela compilada em memória"""
+        from .caca_niquel import tabela_premios
+        return tabela_premios().premio(self.recompensa)
+
+    def get_recompensa_display(self):
+        return str(self.config_premio)
+    get_recompensa_display.short_description = 'Recompensa'
+
     @property
     def valor_recompensa(self):
         """Retorna o valor monetário da recompensa"""
-        valores = {
-            '10_reais': 10.00,
-            '5_reais': 5.00,
-            'vale_trabalho': 0.00,
-            'doce': 2.00,  # Valor estimado
-            'salgado': 3.00,  # Valor estimado
-        }
-        return valores.get(self.recompensa, 0.00)
+        return float(self.config_premio.valor)
+
+
+class CacaNiquelDiario(models.Model):
+    """Totais diários do caça-níquel por recompensa, mantidos a cada jogada, resgate ou exclusão"""
+    dia = models.DateField(verbose_name='Dia')
+    recompensa = models.CharField(max_length=20, verbose_name='Recompensa')
+    jogadas = models.PositiveIntegerField(default=0, verbose_name='Jogadas')
+    resgatados = models.PositiveIntegerField(default=0, verbose_name='Resgatados')
+    # Com sinal: o valor de um prêmio pode mudar entre a jogada e a sua exclusão
+    valor_centavos = models.BigIntegerField(default=0, verbose_name='Valor (centavos)')
+    data_atualizacao = models.DateTimeField(auto_now=True, verbose_name='Data de Atualização')
+
+    class Meta:
+        verbose_name = 'Caça-níquel por Dia'
+        verbose_name_plural = 'Caça-níquel por Dia'
+        ordering = ['-dia', 'recompensa']
+        constraints = [
+            models.UniqueConstraint(fields=['dia', 'recompensa'], name='cacaniquel_diario_unico'),
+        ]
+
+    def __str__(self):
+        return f'{self.dia:%d/%m/%Y} - {self.recompensa}: {self.jogadas} jogada(s)'
+
+    @property
+    def pendentes(self):
+        return self.jogadas - self.resgatados
+
+    @property
+    def valor(self):
+        return Decimal(self.valor_centavos) / 100
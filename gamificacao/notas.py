@@ -0,0 +1,194 @@
+"""
+Gravação de notas em lote.
+
+Recebe várias notas de uma vez (grade de lançamento, importação de CSV),
+separa em memória o que é novo, o que mudou e o que ficou igual, e grava com
+``bulk_create`` / ``bulk_update``. Os valores alterados geram o histórico em
+um único insert, e a pontuação materializada é atualizada no fim.
+
+A importação de CSV lê o arquivo linha a linha e grava em lotes de tamanho
+fixo, de modo que a memória usada não cresce com o tamanho do arquivo.
+"""
+import csv
+from decimal import Decimal, InvalidOperation
+from typing import NamedTuple
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .banco import executar_com_repeticao
+from .models import Aluno, Atividade, HistoricoNota, Nota
+from .pontuacao import atualizar_pontuacoes
+
+
+COLUNAS_CSV = ('matricula', 'atividade', 'nota')
+NOTA_MAXIMA = Decimal('10.0')  # limite de Nota.valor
+TAMANHO_LOTE_IMPORTACAO = 1000
+LIMITE_ERROS = 200  # erros guardados para exibição; os demais só são contados
+
+
+class ErroImportacao(Exception):
+    """Arquivo de importação inválido como um todo (ex.: cabeçalho sem as colunas esperadas)"""
+
+
+class ResumoNotas(NamedTuple):
+    """Quantidade de notas inseridas, atualizadas e mantidas por uma gravação em lote"""
+    inseridas: int
+    atualizadas: int
+    inalteradas: int
+
+
+def gravar_notas(valores, usuario=None, motivo='Alteração em lote'):
+    """
+    Grava as notas de ``valores``, um dict ``{(aluno_id, atividade_id): Decimal}``.
+
+    Os valores já devem estar validados. Notas existentes com valor diferente
+    são atualizadas e registradas em ``HistoricoNota`` com o ``motivo`` dado.
+    """
+    if not valores:
+        return ResumoNotas(0, 0, 0)
+
+    # Uma única consulta para todas as notas já existentes dos pares informados
+    filtro = Q()
+    for atividade_id in {atividade_id for _, atividade_id in valores}:
+        alunos_ids = [aluno_id for aluno_id, atividade in valores if atividade == atividade_id]
+        filtro |= Q(atividade_id=atividade_id, aluno_id__in=alunos_ids)
+
+    with transaction.atomic():
+        existentes = {
+            (nota.aluno_id, nota.atividade_id): nota
+            for nota in Nota.objects.filter(filtro).only('id', 'aluno_id', 'atividade_id', 'valor')
+        }
+
+        agora = timezone.now()
+        novas, alteradas, historico = [], [], []
+        for (aluno_id, atividade_id), valor in valores.items():
+            nota = existentes.get((aluno_id, atividade_id))
+            if nota is None:
+                novas.append(Nota(aluno_id=aluno_id, atividade_id=atividade_id, valor=valor, lancada_por=usuario))
+            elif nota.valor != valor:
+                historico.append(HistoricoNota(
+                    nota=nota,
+                    valor_anterior=nota.valor,
+                    valor_novo=valor,
+                    motivo=motivo,
+                    usuario=usuario,
+                ))
+                nota.valor = valor
+                nota.data_atualizacao = agora
+                alteradas.append(nota)
+
+        Nota.objects.bulk_create(novas, batch_size=500)
+        Nota.objects.bulk_update(alteradas, ['valor', 'data_atualizacao'], batch_size=500)
+        HistoricoNota.objects.bulk_create(historico, batch_size=500)
+
+        # Operações em lote não disparam sinais: atualizar a pontuação explicitamente
+        atualizar_pontuacoes(nota.aluno_id for nota in novas + alteradas)
+
+    return ResumoNotas(len(novas), len(alteradas), len(valores) - len(novas) - len(alteradas))
+
+
+class ResumoImportacao(NamedTuple):
+    """Resultado de uma importação de CSV"""
+    linhas: int
+    inseridas: int
+    atualizadas: int
+    inalteradas: int
+    total_erros: int
+    erros: list  # [(número da linha, mensagem)], no máximo LIMITE_ERROS
+
+
+def _validar_valor(texto, valor_maximo):
+    """Converte e valida o valor da nota com as mesmas regras do NotaForm"""
+    try:
+        valor = Decimal(texto.strip().replace(',', '.'))
+    except InvalidOperation:
+        raise ValueError(f'nota "{texto}" não é um número')
+    if not valor.is_finite():
+        raise ValueError(f'nota "{texto}" não é um número')
+    # Limites antes do arredondamento: quantize levanta InvalidOperation para expoentes grandes (ex.: 1e30)
+    if valor < 0:
+        raise ValueError('a nota não pode ser negativa')
+    if valor > valor_maximo:
+        raise ValueError(f'nota {valor} acima do valor máximo da atividade ({valor_maximo})')
+    if valor != valor.quantize(Decimal('0.1')):
+        raise ValueError(f'nota {texto} tem mais de uma casa decimal')
+    return valor.quantize(Decimal('0.1'))
+
+
+def importar_notas_csv(linhas, usuario=None, motivo='Importação de CSV',
+                       tamanho_lote=TAMANHO_LOTE_IMPORTACAO, delimitador=','):
+    """
+    Importa notas de um CSV com as colunas ``matricula``, ``atividade`` e ``nota``.
+
+    ``linhas`` é qualquer iterável de linhas de texto (arquivo aberto, upload
+    decodificado). Alunos e atividades são resolvidos por dicionários
+    carregados uma única vez; cada lote de ``tamanho_lote`` linhas válidas é
+    gravado em sua própria transação por ``gravar_notas`` (repetida se o banco
+    estiver bloqueado, ver ``banco.executar_com_repeticao``). Linhas inválidas
+    são relatadas e ignoradas, sem interromper a importação.
+    """
+    leitor = csv.DictReader(linhas, delimiter=delimitador)
+    colunas = {(coluna or '').strip().lower() for coluna in leitor.fieldnames or ()}
+    faltando = [coluna for coluna in COLUNAS_CSV if coluna not in colunas]
+    if faltando:
+        raise ErroImportacao(f'Colunas obrigatórias ausentes no cabeçalho: {", ".join(faltando)}.')
+    leitor.fieldnames = [(coluna or '').strip().lower() for coluna in leitor.fieldnames]
+
+    alunos = dict(Aluno.objects.values_list('matricula', 'id'))
+    # O nome da atividade não é único: guarda todas as de cada nome para recusar os ambíguos
+    atividades = {}
+    for nome, atividade_id, valor_maximo in Atividade.objects.values_list('nome', 'id', 'valor_maximo'):
+        atividades.setdefault(nome, []).append((atividade_id, min(valor_maximo, NOTA_MAXIMA)))
+
+    totais = {'linhas': 0, 'inseridas': 0, 'atualizadas': 0, 'inalteradas': 0, 'total_erros': 0}
+    erros = []
+    lote = {}
+
+    def registrar_erro(numero_linha, mensagem):
+        totais['total_erros'] += 1
+        if len(erros) < LIMITE_ERROS:
+            erros.append((numero_linha, mensagem))
+
+    def gravar_lote():
+        resumo = executar_com_repeticao(gravar_notas, lote, usuario=usuario, motivo=motivo)
+        totais['inseridas'] += resumo.inseridas
+        totais['atualizadas'] += resumo.atualizadas
+        lote.clear()
+
+    for registro in leitor:
+        totais['linhas'] += 1
+        numero_linha = leitor.line_num
+        matricula = (registro.get('matricula') or '').strip()
+        nome_atividade = (registro.get('atividade') or '').strip()
+
+        aluno_id = alunos.get(matricula)
+        if aluno_id is None:
+            registrar_erro(numero_linha, f'aluno com matrícula "{matricula}" não encontrado')
+            continue
+        if nome_atividade not in atividades:
+            registrar_erro(numero_linha, f'atividade "{nome_atividade}" não encontrada')
+            continue
+        if len(atividades[nome_atividade]) > 1:
+            registrar_erro(numero_linha, f'atividade "{nome_atividade}" ambígua')
+            continue
+        [(atividade_id, valor_maximo)] = atividades[nome_atividade]
+
+        try:
+            valor = _validar_valor(registro.get('nota') or '', valor_maximo)
+        except ValueError as erro:
+            registrar_erro(numero_linha, str(erro))
+            continue
+
+        # Linha repetida no mesmo lote: vale a última, como aconteceria entre lotes
+        lote[(aluno_id, atividade_id)] = valor
+        if len(lote) >= tamanho_lote:
+            gravar_lote()
+
+    if lote:
+        gravar_lote()
+
+    # Linhas repetidas dentro de um mesmo lote contam como inalteradas
+    totais['inalteradas'] = totais['linhas'] - totais['total_erros'] - totais['inseridas'] - totais['atualizadas']
+    return ResumoImportacao(erros=erros, **totais)
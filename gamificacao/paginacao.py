@@ -0,0 +1,190 @@
+"""
+Paginação por cursor (keyset) para listas grandes.
+
+``Paginator`` conta todas as linhas (``COUNT(*)``) e pula as anteriores com
+``OFFSET``: quanto mais funda a página, mais linhas o banco lê e descarta, e o
+histórico do caça-níquel só cresce. Aqui cada página começa logo depois da
+última linha da anterior, por uma condição sobre as chaves de ordenação
+indexadas, como ``('nome', 'pk')`` para alunos ou ``('-data_jogada', '-pk')``
+para jogadas: qualquer página custa uma busca no índice mais a leitura das
+suas próprias linhas.
+
+A posição vai na URL como um cursor opaco (``?cursor=``), assinado com
+``django.core.signing``; cursores inválidos ou adulterados voltam à primeira
+página. Não há números de página. O total é opcional: um número ou uma função
+passada ao paginador, como os totais diários do caça-níquel ou
+``total_aproximado`` (estatísticas do ANALYZE, sem contar as linhas).
+
+As chaves de ordenação devem identificar as linhas de forma única (termine
+com ``pk``) e não podem ser nulas.
+"""
+import datetime
+import operator
+from decimal import Decimal
+from functools import reduce
+from uuid import UUID
+
+from django.core import signing
+from django.core.exceptions import ValidationError
+from django.db import DatabaseError, connections, router
+from django.db.models import Q
+
+
+PARAMETRO = 'cursor'
+SALT = 'gamificacao.paginacao'
+
+# Cursor da última página (lida de trás para frente, a partir do fim)
+ULTIMA = 'fim'
+
+
+def _para_json(valor):
+    """Valor de uma chave de ordenação em JSON, sem perder precisão (microssegundos, decimais)"""
+    if isinstance(valor, (datetime.date, datetime.time)):
+        return valor.isoformat()
+    if isinstance(valor, (Decimal, UUID)):
+        return str(valor)
+    return valor
+
+
+class PaginaCursor:
+    """Uma página da lista, com os cursores das páginas vizinhas"""
+
+    def __init__(self, object_list, cursor_anterior, cursor_proximo, total=None, total_aproximado=False):
+        self.object_list = object_list
+        self.cursor_anterior = cursor_anterior  # None na primeira página
+        self.cursor_proximo = cursor_proximo  # None na última página
+        self.cursor_ultima = ULTIMA
+        self.total = total
+        self.total_aproximado = total_aproximado
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __repr__(self):
+        return f'<PaginaCursor: {len(self)} item(ns)>'
+
+    # Mesmos nomes de django.core.paginator.Page, usados pelos templates
+    def has_previous(self):
+        return self.cursor_anterior is not None
+
+    def has_next(self):
+        return self.cursor_proximo is not None
+
+    def has_other_pages(self):
+        return self.has_previous() or self.has_next()
+
+
+class PaginadorCursor:
+    """
+    Pagina ``queryset`` pela ordem de ``ordenacao`` (nomes de campos, ``-`` para decrescente).
+
+    ``total`` é opcional: um número ou uma função chamada ao montar a página
+    (``aproximado=True`` indica que é uma estimativa).
+    """
+
+    def __init__(self, queryset, ordenacao, por_pagina, total=None, aproximado=False):
+        self.queryset = queryset
+        self.ordenacao = tuple(ordenacao)
+        self.por_pagina = por_pagina
+        self.total = total
+        self.aproximado = aproximado
+        self._chaves = [(campo.lstrip('-'), campo.startswith('-')) for campo in self.ordenacao]
+        self._campos = [
+            queryset.model._meta.pk if nome == 'pk' else queryset.model._meta.get_field(nome)
+            for nome, _ in self._chaves
+        ]
+
+    def pagina(self, cursor=None):
+        """Página indicada pelo cursor (a primeira, se ausente ou inválido)"""
+        valores, para_tras = self._decodificar(cursor)
+
+        queryset = self.queryset
+        if valores is not None:
+            queryset = queryset.filter(self._depois_de(valores, para_tras))
+        ordem = self._ordem_inversa() if para_tras else self.ordenacao
+        itens = list(queryset.order_by(*ordem)[:self.por_pagina + 1])
+        # Uma linha a mais diz se há outra página nesse sentido, sem contar nada
+        mais = len(itens) > self.por_pagina
+        itens = itens[:self.por_pagina]
+
+        if not itens and valores is not None:
+            # Linhas do cursor excluídas e nada além delas: volta a uma ponta da lista
+            return self.pagina(None if para_tras else ULTIMA)
+
+        if para_tras:
+            itens.reverse()
+            tem_anterior, tem_proximo = mais, valores is not None
+        else:
+            tem_anterior, tem_proximo = valores is not None, mais
+
+        total = self.total() if callable(self.total) else self.total
+        return PaginaCursor(
+            itens,
+            cursor_anterior=self._codificar(itens[0], para_tras=True) if tem_anterior and itens else None,
+            cursor_proximo=self._codificar(itens[-1], para_tras=False) if tem_proximo and itens else None,
+            total=total,
+            total_aproximado=self.aproximado,
+        )
+
+    def _ordem_inversa(self):
+        return tuple(campo[1:] if campo.startswith('-') else f'-{campo}' for campo in self.ordenacao)
+
+    def _depois_de(self, valores, para_tras):
+        """Condição das linhas depois (ou antes, ``para_tras``) da posição, na ordem da lista"""
+        # (a > x) OR (a = x AND b > y) OR ..., com o sentido de cada chave
+        alternativas, iguais = [], Q()
+        for (nome, decrescente), valor in zip(self._chaves, valores):
+            comparacao = 'gt' if decrescente == para_tras else 'lt'
+            alternativas.append(iguais & Q(**{f'{nome}__{comparacao}': valor}))
+            iguais &= Q(**{nome: valor})
+        # A mesma condição, inclusiva, só na primeira chave: permite a busca por intervalo no índice
+        nome, decrescente = self._chaves[0]
+        limite = Q(**{f'{nome}__{"gte" if decrescente == para_tras else "lte"}': valores[0]})
+        return limite & reduce(operator.or_, alternativas)
+
+    def _codificar(self, item, para_tras):
+        valores = [_para_json(getattr(item, campo.attname)) for campo in self._campos]
+        return signing.dumps({'v': valores, 't': para_tras}, salt=SALT)
+
+    def _decodificar(self, cursor):
+        """``(valores, para_tras)`` do cursor; ``(None, False)`` é a primeira página"""
+        if not cursor:
+            return None, False
+        if cursor == ULTIMA:
+            return None, True
+        try:
+            dados = signing.loads(cursor, salt=SALT)
+            valores = [campo.to_python(valor) for campo, valor in zip(self._campos, dados['v'], strict=True)]
+            return valores, bool(dados['t'])
+        except (signing.BadSignature, ValidationError, KeyError, TypeError, ValueError):
+            return None, False
+
+
+def total_aproximado(modelo):
+    """
+    Número de linhas da tabela segundo as estatísticas do banco, sem contá-las.
+
+    No SQLite vem de ``sqlite_stat1`` (gravada pelo ANALYZE de
+    ``manage.py manutencao_banco``); no PostgreSQL, de ``pg_class.reltuples``.
+    Sem estatísticas, faz a contagem exata.
+    """
+    conexao = connections[router.db_for_read(modelo)]
+    tabela = modelo._meta.db_table
+    estimativa = None
+    try:
+        with conexao.cursor() as cursor:
+            if conexao.vendor == 'sqlite':
+                cursor.execute('SELECT stat FROM sqlite_stat1 WHERE tbl = %s', [tabela])
+                # Primeiro número de cada linha: linhas da tabela ou do índice (o maior é o da tabela)
+                estimativa = max((int(stat.split()[0]) for stat, in cursor.fetchall()), default=None)
+            elif conexao.vendor == 'postgresql':
+                cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass', [tabela])
+                linha = cursor.fetchone()
+                estimativa = linha[0] if linha and linha[0] >= 0 else None
+    except DatabaseError:
+        # sqlite_stat1 só existe depois do primeiro ANALYZE
+        estimativa = None
+    return estimativa if estimativa is not None else modelo._default_manager.count()
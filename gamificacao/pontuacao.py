@@ -0,0 +1,229 @@
+"""
+Motor de pontuação do ranking.
+
+Calcula média, atividades, pontos de presença, percentual de presença e
+pontuação total de todos os alunos em uma única consulta agregada, em vez de
+chamar as propriedades de ``Aluno`` uma a uma (8+ consultas por aluno).
+
+Os totais ficam materializados em ``AlunoPontuacao``; ``atualizar_pontuacoes``
+recalcula apenas os alunos afetados por um lançamento e o ranking é lido da
+tabela materializada com um único ``ORDER BY`` indexado. As leituras usadas
+pelas páginas passam pelo cache versionado de ``cache_ranking``. Os totais dos
+grupos desses alunos (``GrupoPontuacao``) são recalculados em seguida.
+"""
+from decimal import Decimal
+from typing import NamedTuple, Optional
+
+from django.db.models import Count, DecimalField, IntegerField, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+from . import cache_ranking
+from .concorrencia import em_serie
+from .grupos import atualizar_grupos_dos_alunos
+from .models import Aluno, AlunoPontuacao, Atividade, Nota, Presenca
+
+
+PONTOS_POR_PRESENCA = 1
+PONTOS_POR_FALTA = -0.5
+
+CAMPOS_TOTAIS = ('soma_notas', 'qtd_notas', 'qtd_presencas', 'qtd_faltas')
+CAMPOS_PONTUACAO = CAMPOS_TOTAIS + ('nota_media', 'pontos_presenca', 'pontuacao_total')
+ORDEM_RANKING = ('-pontuacao_total', '-nota_media', '-pontos_presenca', 'aluno__nome')
+
+
+class LinhaRanking(NamedTuple):
+    """Linha compacta do ranking (não carrega a instância do modelo)"""
+    aluno_id: int
+    nome: str
+    matricula: str
+    nota_media: float
+    total_atividades: int
+    pontos_presenca: float
+    percentual_presenca: float
+    pontuacao_total: float
+    posicao: int = 0
+    # Com empates dividindo a posição (RANK/DENSE_RANK); só nas consultas de classificacao.py
+    classificacao: Optional[int] = None
+
+
+def calcular_linha(aluno_id, nome, matricula, soma_notas, qtd_notas, qtd_presencas, qtd_faltas):
+    """Monta uma linha do ranking a partir das somas e contagens brutas"""
+    # Mesmo arredondamento de Aluno.nota_atual (Decimal, meio-para-par)
+    nota_media = float(round(Decimal(soma_notas) / qtd_notas, 2)) if qtd_notas else 0.0
+    pontos_presenca = round(qtd_presencas * PONTOS_POR_PRESENCA + qtd_faltas * PONTOS_POR_FALTA, 1)
+    total_registros = qtd_presencas + qtd_faltas
+    percentual_presenca = round((qtd_presencas / total_registros) * 100, 1) if total_registros else 0.0
+
+    return LinhaRanking(
+        aluno_id=aluno_id,
+        nome=nome,
+        matricula=matricula,
+        nota_media=nota_media,
+        total_atividades=qtd_notas,
+        pontos_presenca=pontos_presenca,
+        percentual_presenca=percentual_presenca,
+        pontuacao_total=round(nota_media + pontos_presenca, 2),
+    )
+
+
+def _subconsulta(queryset, agregado, output_field):
+    """Agregado correlacionado por aluno, usado como coluna da consulta principal"""
+    subconsulta = (
+        queryset
+        .filter(aluno=OuterRef('pk'))
+        .order_by()
+        .values('aluno')
+        .annotate(resultado=agregado)
+        .values('resultado')
+    )
+    return Coalesce(Subquery(subconsulta, output_field=output_field), 0, output_field=output_field)
+
+
+def alunos_com_totais(queryset=None):
+    """Anota soma/quantidade de notas, presenças e faltas em cada aluno"""
+    if queryset is None:
+        queryset = Aluno.objects.filter(ativo=True).order_by('nome')
+
+    return queryset.annotate(
+        soma_notas=_subconsulta(
+            Nota.objects.all(), Sum('valor'),
+            DecimalField(max_digits=12, decimal_places=1)
+        ),
+        qtd_notas=_subconsulta(Nota.objects.all(), Count('id'), IntegerField()),
+        qtd_presencas=_subconsulta(
+            Presenca.objects.all(), Count('id', filter=Q(presente=True)), IntegerField()
+        ),
+        qtd_faltas=_subconsulta(
+            Presenca.objects.all(), Count('id', filter=Q(presente=False)), IntegerField()
+        ),
+    )
+
+
+def ordenar_ranking(linhas):
+    """Ordena por pontuação total, média e pontos de presença e numera as posições"""
+    linhas = sorted(
+        linhas,
+        key=lambda linha: (linha.pontuacao_total, linha.nota_media, linha.pontos_presenca),
+        reverse=True,
+    )
+    return [linha._replace(posicao=posicao) for posicao, linha in enumerate(linhas, 1)]
+
+
+def calcular_ranking_bruto(queryset=None):
+    """Calcula o ranking diretamente das notas e presenças (sem a tabela materializada)"""
+    valores = alunos_com_totais(queryset).values_list('id', 'nome', 'matricula', *CAMPOS_TOTAIS)
+    return ordenar_ranking(calcular_linha(*valores_aluno) for valores_aluno in valores)
+
+
+def calcular_ranking():
+    """Retorna o ranking dos alunos ativos lido da pontuação materializada"""
+    valores = (
+        AlunoPontuacao.objects
+        .filter(aluno__ativo=True)
+        .order_by(*ORDEM_RANKING)
+        .values_list('aluno_id', 'aluno__nome', 'aluno__matricula', *CAMPOS_TOTAIS)
+    )
+    return [
+        calcular_linha(*valores_aluno)._replace(posicao=posicao)
+        for posicao, valores_aluno in enumerate(valores, 1)
+    ]
+
+
+def pontuacoes_calculadas(queryset):
+    """Gera instâncias (não salvas) de AlunoPontuacao calculadas a partir dos dados brutos"""
+    valores = alunos_com_totais(queryset).order_by().values_list('id', 'nome', 'matricula', *CAMPOS_TOTAIS)
+    for aluno_id, nome, matricula, soma_notas, qtd_notas, qtd_presencas, qtd_faltas in valores:
+        linha = calcular_linha(aluno_id, nome, matricula, soma_notas, qtd_notas, qtd_presencas, qtd_faltas)
+        yield AlunoPontuacao(
+            aluno_id=aluno_id,
+            soma_notas=soma_notas,
+            qtd_notas=qtd_notas,
+            qtd_presencas=qtd_presencas,
+            qtd_faltas=qtd_faltas,
+            nota_media=linha.nota_media,
+            pontos_presenca=linha.pontos_presenca,
+            pontuacao_total=linha.pontuacao_total,
+        )
+
+
+def atualizar_pontuacoes(aluno_ids):
+    """
+    Recalcula a pontuação materializada dos alunos informados.
+
+    Deve ser chamada dentro da mesma transação do lançamento (os sinais já
+    fazem isso); operações em lote chamam diretamente com todos os ids
+    afetados, custando duas consultas independentemente da quantidade (mais
+    as dos grupos desses alunos, se houver).
+    """
+    aluno_ids = {aluno_id for aluno_id in aluno_ids if aluno_id is not None}
+    if not aluno_ids:
+        return 0
+
+    pontuacoes = list(pontuacoes_calculadas(Aluno.objects.filter(pk__in=aluno_ids)))
+    AlunoPontuacao.objects.bulk_create(
+        pontuacoes,
+        update_conflicts=True,
+        unique_fields=['aluno'],
+        update_fields=CAMPOS_PONTUACAO + ('data_atualizacao',),
+    )
+    atualizar_grupos_dos_alunos(aluno_ids)
+    cache_ranking.invalidar_ranking()
+    return len(pontuacoes)
+
+
+def estatisticas_gerais(ranking, total_atividades, total_presencas):
+    """Estatísticas do cabeçalho do dashboard (sem consultas: as contagens vêm prontas)"""
+    total_alunos = len(ranking)
+    media_geral = sum(linha.pontuacao_total for linha in ranking) / total_alunos if total_alunos else 0
+    media_presenca = sum(linha.pontos_presenca for linha in ranking) / total_alunos if total_alunos else 0
+
+    return {
+        'total_alunos': total_alunos,
+        'total_atividades': total_atividades,
+        'total_presencas': total_presencas,
+        'media_geral': round(media_geral, 2),
+        'media_presenca': round(media_presenca, 1),
+    }
+
+
+def pontuacoes_por_aluno():
+    """Mapa aluno_id -> linha com a pontuação de todos os alunos (ativos ou não), em ordem de nome"""
+    valores = (
+        AlunoPontuacao.objects
+        .order_by('aluno__nome')
+        .values_list('aluno_id', 'aluno__nome', 'aluno__matricula', *CAMPOS_TOTAIS)
+    )
+    return {valores_aluno[0]: calcular_linha(*valores_aluno) for valores_aluno in valores}
+
+
+def consultas_dashboard():
+    """
+    Leituras independentes do dashboard, cada uma no cache versionado.
+
+    Sem dependência entre si, podem ser executadas em série (``dados_dashboard``)
+    ou ao mesmo tempo pela view assíncrona (concorrencia.py).
+    """
+    return {
+        'ranking': lambda: cache_ranking.obter('ranking', calcular_ranking),
+        'total_atividades': lambda: cache_ranking.obter(
+            'total_atividades', Atividade.objects.filter(ativa=True).count
+        ),
+        'total_presencas': lambda: cache_ranking.obter(
+            'total_presencas', Presenca.objects.filter(presente=True).count
+        ),
+    }
+
+
+def montar_dados_dashboard(ranking, total_atividades, total_presencas):
+    """Ranking e estatísticas do dashboard a partir dos resultados de ``consultas_dashboard``"""
+    return {'ranking': ranking, **estatisticas_gerais(ranking, total_atividades, total_presencas)}
+
+
+def dados_dashboard():
+    """Ranking e estatísticas do dashboard, servidos pelo cache versionado"""
+    return montar_dados_dashboard(**em_serie(**consultas_dashboard()))
+
+
+def pontuacoes_em_cache():
+    """Versão em cache de ``pontuacoes_por_aluno``"""
+    return cache_ranking.obter('pontuacoes', pontuacoes_por_aluno)
@@ -0,0 +1,76 @@
+"""
+Lançamento de presenças em lote.
+
+A chamada da turma é gravada com um número constante de consultas: os
+registros existentes da data são lidos de uma vez, as diferenças são
+calculadas em memória e tudo é gravado com um único upsert na chave única
+``(aluno, data_presenca)``.
+"""
+from typing import NamedTuple
+
+from django.db import transaction
+
+from .models import Aluno, Presenca
+from .pontuacao import atualizar_pontuacoes
+
+
+class ResumoPresencas(NamedTuple):
+    """Quantidade de registros inseridos, atualizados e mantidos por um lançamento em lote"""
+    inseridas: int
+    atualizadas: int
+    inalteradas: int
+
+
+def lancar_presencas_turma(data_presenca, presentes_ids, usuario=None, turma_completa=True):
+    """
+    Registra a presença de vários alunos ativos em uma data.
+
+    Com ``turma_completa``, todos os alunos ativos recebem um registro: os
+    selecionados ficam presentes e os demais recebem falta, sobrescrevendo o
+    que já existia. Sem ela, apenas os selecionados sem registro na data são
+    marcados como presentes.
+    """
+    presentes_ids = {int(aluno_id) for aluno_id in presentes_ids}
+
+    with transaction.atomic():
+        alunos_ativos = Aluno.objects.filter(ativo=True)
+        if not turma_completa:
+            alunos_ativos = alunos_ativos.filter(id__in=presentes_ids)
+        alunos_ids = set(alunos_ativos.values_list('id', flat=True))
+
+        existentes = dict(
+            Presenca.objects
+            .filter(data_presenca=data_presenca, aluno_id__in=alunos_ids)
+            .values_list('aluno_id', 'presente')
+        )
+
+        gravar = []
+        inseridas = atualizadas = inalteradas = 0
+        for aluno_id in sorted(alunos_ids):
+            presente = aluno_id in presentes_ids
+            if aluno_id not in existentes:
+                inseridas += 1
+            elif turma_completa and existentes[aluno_id] != presente:
+                atualizadas += 1
+            else:
+                inalteradas += 1
+                continue
+            gravar.append(Presenca(
+                aluno_id=aluno_id,
+                data_presenca=data_presenca,
+                presente=presente,
+                lancada_por=usuario,
+            ))
+
+        if gravar:
+            Presenca.objects.bulk_create(
+                gravar,
+                batch_size=500,
+                update_conflicts=True,
+                unique_fields=['aluno', 'data_presenca'],
+                update_fields=['presente', 'lancada_por', 'data_atualizacao'],
+            )
+            # bulk_create não dispara sinais: atualizar a pontuação dos alunos afetados
+            atualizar_pontuacoes(presenca.aluno_id for presenca in gravar)
+
+    return ResumoPresencas(inseridas, atualizadas, inalteradas)
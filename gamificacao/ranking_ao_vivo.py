@@ -0,0 +1,216 @@
+"""
+Ranking ao vivo por Server-Sent Events (SSE).
+
+Um único ``Transmissor`` por processo recebe os avisos de mudança no ranking
+(sinal ``cache_ranking.ranking_invalidado``, enviado após o commit de
+qualquer lançamento de nota ou presença), recalcula o ranking uma vez,
+compara com o último estado transmitido e distribui só as linhas que
+mudaram (valores ou posição) para todas as telas conectadas. Com N telas
+abertas há um recálculo por mudança, e não N consultas periódicas.
+
+O transmissor também confere a versão do ranking no cache a cada
+``INTERVALO_VERIFICACAO`` segundos, para perceber mudanças feitas por outros
+processos pelo cache compartilhado (em arquivos por padrão, ou Redis,
+Memcached). Nada além do próprio processo e do cache é necessário.
+
+Protocolo (``text/event-stream``):
+
+- ``event: ranking``: estado completo (na conexão, ou quando o cliente não
+  pode retomar de onde parou);
+- ``event: delta``: linhas alteradas (com a nova posição) e ids de alunos
+  que saíram do ranking;
+- comentários ``: heartbeat`` a cada ``INTERVALO_HEARTBEAT`` segundos para
+  manter a conexão aberta em proxies.
+
+Cada evento tem um ``id``; ao reconectar, o navegador envia
+``Last-Event-ID`` e recebe só os eventos perdidos, se ainda estiverem entre
+os ``EVENTOS_GUARDADOS`` mais recentes deste processo (senão, o estado
+completo). Cada conexão tem uma fila de ``TAMANHO_FILA`` eventos: um cliente
+lento que a enche perde os eventos pendentes e recebe o estado completo
+quando voltar a consumir, sem atrasar os demais.
+
+Precisa de um servidor ASGI (``uvicorn gamificacao_escolar.asgi:application``);
+sob WSGI a view responde 503 e o dashboard continua no polling condicional.
+"""
+import asyncio
+import contextvars
+import itertools
+import json
+import time
+from collections import deque
+
+from asgiref.sync import sync_to_async
+
+from . import cache_ranking
+from .pontuacao import dados_dashboard
+
+
+INTERVALO_HEARTBEAT = 15  # segundos
+INTERVALO_VERIFICACAO = 2  # segundos entre as conferências da versão no cache
+INTERVALO_RECONEXAO = 5000  # milissegundos (campo ``retry`` do SSE)
+EVENTOS_GUARDADOS = 256
+TAMANHO_FILA = 32
+
+# Marcador colocado na fila de um cliente que ficou para trás
+RESSINCRONIZAR = object()
+
+
+def formatar_evento(tipo, dados, id_evento=None):
+    """Serializa um evento no formato ``text/event-stream``"""
+    linhas = [f'id: {id_evento}'] if id_evento is not None else []
+    linhas += [f'event: {tipo}', f'data: {json.dumps(dados, separators=(",", ":"))}']
+    return '\n'.join(linhas) + '\n\n'
+
+
+class Transmissor:
+    """Distribui as mudanças do ranking para as conexões SSE deste processo"""
+
+    def __init__(self):
+        # Prefixo dos ids: ids de outro processo (ou de antes de um reinício) não são retomados
+        self.epoca = f'{int(time.time() * 1000):x}'
+        self._sequencia = itertools.count(1)
+        self._ultimo = 0
+        self._eventos = deque(maxlen=EVENTOS_GUARDADOS)
+        self._linhas = {}
+        self._versao = None
+        self._loop = None
+        self._alterado = None
+        self._lock = None
+        self._tarefa = None
+        self._filas = set()
+        self.recalculos = 0
+
+    # Chamado de qualquer thread (após o commit de uma escrita)
+    def notificar(self):
+        """Avisa que o ranking mudou; o recálculo acontece uma vez, no laço de eventos"""
+        loop = self._loop
+        if loop is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(self._alterado.set)
+
+    def _preparar(self):
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            # Primeiro uso (ou novo laço de eventos): filas e tarefa antigas não valem mais
+            self._loop = loop
+            self._alterado = asyncio.Event()
+            self._lock = asyncio.Lock()
+            self._tarefa = None
+            self._filas = set()
+        if self._tarefa is None or self._tarefa.done():
+            # Contexto vazio: a tarefa sobrevive à requisição que a criou (e ao contador de consultas dela)
+            self._tarefa = contextvars.Context().run(loop.create_task, self._acompanhar())
+
+    async def _acompanhar(self):
+        """Recalcula a cada aviso ou conferência periódica, enquanto houver conexões"""
+        while self._filas:
+            try:
+                await asyncio.wait_for(self._alterado.wait(), INTERVALO_VERIFICACAO)
+            except asyncio.TimeoutError:
+                pass
+            self._alterado.clear()
+            await self.atualizar()
+
+    async def atualizar(self):
+        """Recalcula o ranking se a versão mudou e publica as linhas alteradas"""
+        async with self._lock:
+            versao = await sync_to_async(cache_ranking.versao_atual)()
+            if versao == self._versao:
+                return
+            dados = await sync_to_async(dados_dashboard)()
+            self.recalculos += 1
+            linhas = {linha.aluno_id: linha._asdict() for linha in dados['ranking']}
+
+            primeira_vez = self._versao is None
+            alteradas = [linha for aluno_id, linha in linhas.items() if self._linhas.get(aluno_id) != linha]
+            removidas = [aluno_id for aluno_id in self._linhas if aluno_id not in linhas]
+            self._versao, self._linhas = versao, linhas
+            if primeira_vez or not (alteradas or removidas):
+                return
+
+            self._ultimo = next(self._sequencia)
+            evento = (self._ultimo, formatar_evento(
+                'delta',
+                {'alteradas': alteradas, 'removidas': removidas, 'total_alunos': len(linhas)},
+                self.id_evento(self._ultimo),
+            ))
+            self._eventos.append(evento)
+            for fila in self._filas:
+                self._publicar(fila, evento)
+
+    @staticmethod
+    def _publicar(fila, evento):
+        try:
+            fila.put_nowait(evento)
+        except asyncio.QueueFull:
+            # Cliente lento: descarta o que estava pendente e manda o estado completo depois
+            while not fila.empty():
+                fila.get_nowait()
+            fila.put_nowait(RESSINCRONIZAR)
+
+    def id_evento(self, sequencia):
+        return f'{self.epoca}-{sequencia}'
+
+    def estado_completo(self):
+        """Evento com todas as linhas atuais, identificado pelo último evento publicado"""
+        return formatar_evento(
+            'ranking',
+            {'linhas': list(self._linhas.values()), 'total_alunos': len(self._linhas)},
+            self.id_evento(self._ultimo),
+        )
+
+    def _perdidos(self, ultimo_id):
+        """Eventos publicados depois de ``ultimo_id``, ou None se não é possível retomar"""
+        epoca, _, sequencia = (ultimo_id or '').partition('-')
+        if epoca != self.epoca or not sequencia.isdigit():
+            return None
+        sequencia = int(sequencia)
+        if sequencia > self._ultimo:
+            return None
+        # Continua se nada se perdeu entre o último recebido e o mais antigo guardado
+        if self._eventos and sequencia < self._eventos[0][0] - 1:
+            return None
+        return [texto for numero, texto in self._eventos if numero > sequencia]
+
+    async def eventos(self, ultimo_id=None):
+        """Gerador assíncrono do fluxo SSE de uma conexão"""
+        self._preparar()
+        fila = asyncio.Queue(TAMANHO_FILA)
+        self._filas.add(fila)
+        try:
+            await self.atualizar()
+            yield f'retry: {INTERVALO_RECONEXAO}\n\n'
+
+            perdidos = self._perdidos(ultimo_id)
+            if perdidos is None:
+                yield self.estado_completo()
+            else:
+                for texto in perdidos:
+                    yield texto
+            enviado = self._ultimo
+
+            while True:
+                try:
+                    evento = await asyncio.wait_for(fila.get(), INTERVALO_HEARTBEAT)
+                except asyncio.TimeoutError:
+                    yield ': heartbeat\n\n'
+                    continue
+                if evento is RESSINCRONIZAR:
+                    yield self.estado_completo()
+                    enviado = self._ultimo
+                    continue
+                numero, texto = evento
+                if numero > enviado:
+                    yield texto
+                    enviado = numero
+        finally:
+            self._filas.discard(fila)
+
+    def estatisticas(self):
+        return {
+            'conexoes': len(self._filas),
+            'recalculos': self.recalculos,
+            'ultimo_evento': self.id_evento(self._ultimo),
+        }
+
+
+transmissor = Transmissor()
@@ -0,0 +1,168 @@
+"""
+Retratos diários do ranking e tendência de cada aluno.
+
+``registrar_ranking`` grava a posição e a pontuação de cada aluno ativo no
+dia (``RankingDiario``/``PosicaoDiaria``). O cálculo é incremental: só os
+alunos cuja pontuação materializada mudou desde o último retrato (qualquer
+nota ou presença lançada, editada ou excluída atualiza ``AlunoPontuacao``)
+são lidos de novo; os demais são copiados do retrato anterior. As posições
+são renumeradas para todos, na mesma ordem de ``pontuacao.ORDEM_RANKING``.
+
+O dashboard mostra, a partir dessas tabelas, quantas posições cada aluno
+subiu ou desceu desde o último retrato anterior a hoje e uma linha com a
+sua posição nos últimos ``DIAS_TENDENCIA`` retratos, sem recalcular
+pontuações antigas.
+
+Rode ``manage.py registrar_ranking_diario`` uma vez por dia (ou mais: o
+retrato do dia é atualizado a cada execução).
+"""
+from collections import defaultdict
+from datetime import timedelta
+from typing import NamedTuple
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from . import cache_ranking
+from .models import Aluno, AlunoPontuacao, PosicaoDiaria, RankingDiario
+
+
+CRITERIOS = ('pontuacao_total', 'nota_media', 'pontos_presenca')
+
+# Alterações gravadas até este tempo antes do último retrato são lidas de novo:
+# uma transação que começou antes do retrato pode ter sido confirmada depois dele
+MARGEM_ALTERACOES = timedelta(minutes=5)
+
+# Retratos exibidos na linha de tendência do dashboard
+DIAS_TENDENCIA = 14
+LARGURA_TENDENCIA = 80
+ALTURA_TENDENCIA = 24
+
+
+class Tendencia(NamedTuple):
+    """Movimento de um aluno no ranking"""
+    variacao: object  # posições ganhas (+) ou perdidas (-) desde o último retrato anterior a hoje; None se não há
+    pontos: str  # pontos da linha de tendência (``<polyline points>``), vazio com menos de dois retratos
+
+    @property
+    def subiu(self):
+        return bool(self.variacao and self.variacao > 0)
+
+    @property
+    def desceu(self):
+        return bool(self.variacao and self.variacao < 0)
+
+    @property
+    def variacao_absoluta(self):
+        return abs(self.variacao or 0)
+
+
+def registrar_ranking(dia=None, completo=False):
+    """
+    Grava (ou atualiza) o retrato do ranking do dia.
+
+    Com ``completo=True`` lê a pontuação de todos os alunos, ignorando o
+    retrato anterior. Retorna ``(ranking_diario, alunos_recalculados)``.
+    """
+    dia = dia or timezone.localdate()
+    inicio = timezone.now()
+    ativos = dict(Aluno.objects.filter(ativo=True).values_list('pk', 'nome'))
+
+    anterior = None if completo else RankingDiario.objects.filter(dia__lte=dia).order_by('-dia').first()
+    criterios = {}
+    alterados = AlunoPontuacao.objects.filter(aluno__ativo=True)
+    if anterior is not None:
+        criterios = {
+            aluno_id: tuple(valores)
+            for aluno_id, *valores in anterior.posicoes.values_list('aluno_id', *CRITERIOS)
+            if aluno_id in ativos
+        }
+        # Mudaram desde o retrato anterior ou não estavam nele (novos ou reativados)
+        alterados = alterados.filter(
+            Q(data_atualizacao__gte=anterior.calculado_em - MARGEM_ALTERACOES)
+            | ~Q(aluno__in=anterior.posicoes.values('aluno'))
+        )
+
+    recalculados = 0
+    for aluno_id, *valores in alterados.values_list('aluno_id', *CRITERIOS):
+        criterios[aluno_id] = tuple(valores)
+        recalculados += 1
+
+    ordem = sorted(
+        criterios,
+        key=lambda aluno_id: (*(-valor for valor in criterios[aluno_id]), ativos[aluno_id]),
+    )
+
+    with transaction.atomic():
+        ranking, criado = RankingDiario.objects.update_or_create(
+            dia=dia,
+            defaults={'calculado_em': inicio, 'total_alunos': len(ordem), 'alunos_recalculados': recalculados},
+        )
+        PosicaoDiaria.objects.bulk_create(
+            [
+                PosicaoDiaria(
+                    ranking=ranking, aluno_id=aluno_id, posicao=posicao,
+                    **dict(zip(CRITERIOS, criterios[aluno_id])),
+                )
+                for posicao, aluno_id in enumerate(ordem, 1)
+            ],
+            update_conflicts=True,
+            unique_fields=['ranking', 'aluno'],
+            update_fields=('posicao',) + CRITERIOS,
+            batch_size=500,
+        )
+        if not criado:
+            # Retrato do dia refeito: sai quem deixou de ser ativo desde a última execução
+            ranking.posicoes.filter(aluno__ativo=False).delete()
+        cache_ranking.invalidar_ranking()
+
+    return ranking, recalculados
+
+
+def tendencias(ranking, dias=DIAS_TENDENCIA, hoje=None):
+    """
+    Tendência de cada aluno do ``ranking`` atual: ``{aluno_id: Tendencia}`` (duas consultas).
+
+    A variação compara a posição atual com a do último retrato anterior a
+    hoje; a linha mostra a posição nos últimos ``dias`` retratos (para cima é
+    melhor).
+    """
+    hoje = hoje or timezone.localdate()
+    retratos = list(
+        RankingDiario.objects.filter(dia__lte=hoje).order_by('-dia').values_list('pk', 'dia', 'total_alunos')[:dias]
+    )
+    if not retratos:
+        return {}
+    retratos.reverse()
+
+    indices = {ranking_id: indice for indice, (ranking_id, _, _) in enumerate(retratos)}
+    referencia = max((indice for indice, (_, dia, _) in enumerate(retratos) if dia < hoje), default=None)
+    series = defaultdict(dict)
+    for ranking_id, aluno_id, posicao in (
+        PosicaoDiaria.objects.filter(ranking_id__in=indices).values_list('ranking_id', 'aluno_id', 'posicao')
+    ):
+        series[aluno_id][indices[ranking_id]] = posicao
+
+    maior_posicao = max(max(total for _, _, total in retratos), max((linha.posicao for linha in ranking), default=1))
+    passo = LARGURA_TENDENCIA / max(len(retratos) - 1, 1)
+    escala = (ALTURA_TENDENCIA - 2) / max(maior_posicao - 1, 1)
+
+    resultado = {}
+    for linha in ranking:
+        serie = series.get(linha.aluno_id, {})
+        anterior = serie.get(referencia) if referencia is not None else None
+        pontos = ' '.join(
+            f'{indice * passo:.1f},{1 + (posicao - 1) * escala:.1f}' for indice, posicao in sorted(serie.items())
+        ) if len(serie) > 1 else ''
+        resultado[linha.aluno_id] = Tendencia(
+            variacao=anterior - linha.posicao if anterior is not None else None,
+            pontos=pontos,
+        )
+    return resultado
+
+
+def tendencias_em_cache(ranking):
+    """Versão em cache de ``tendencias``; registrar um retrato também invalida o cache"""
+    hoje = timezone.localdate()
+    return cache_ranking.obter(f'tendencias:{hoje.isoformat()}', lambda: tendencias(ranking, hoje=hoje))
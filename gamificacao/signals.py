@@ -0,0 +1,186 @@
+"""
+Sinais que mantêm a pontuação materializada (AlunoPontuacao) em dia.
+
+Os recálculos acontecem dentro da transação do próprio lançamento, então
+views, admin e exclusões em cascata nunca deixam a tabela desatualizada.
+Operações em lote (bulk_create/update) não disparam sinais e devem chamar
+``pontuacao.atualizar_pontuacoes`` explicitamente.
+
+Entradas e saídas de membros mantêm também os totais dos grupos (GrupoPontuacao).
+Alterações em alunos, atividades e grupos também invalidam o ranking em cache,
+e alterações em prêmios e orçamentos invalidam a tabela de prêmios compilada
+em cada processo. Jogadas do caça-níquel criadas, editadas ou excluídas uma a
+uma mantêm os totais diários (CacaNiquelDiario). Cada invalidação do ranking
+acorda o transmissor do ranking ao vivo.
+"""
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from . import cache_ranking
+from .caca_niquel import invalidar_premios, tabela_premios
+from .caca_niquel_diario import acumular, variacoes_agrupadas, variacoes_jogadas
+from .grupos import atualizar_pontuacoes_grupos
+from .models import (
+    Aluno, AlunoPontuacao, Atividade, CacaNiquel, Grupo, GrupoPontuacao, MembroGrupo, Nota, OrcamentoPremios,
+    Premio, Presenca
+)
+from .pontuacao import atualizar_pontuacoes
+from .ranking_ao_vivo import transmissor
+
+
+def _exclusao_originada_por(origin, *modelos):
+    """Indica se a exclusão em cascata partiu de um dos modelos informados"""
+    if isinstance(origin, QuerySet):
+        return issubclass(origin.model, modelos)
+    return isinstance(origin, modelos)
+
+
+@receiver(post_save, sender=Aluno)
+def criar_pontuacao_aluno(sender, instance, created, raw=False, **kwargs):
+    """Todo aluno novo começa com a pontuação zerada"""
+    if created and not raw:
+        AlunoPontuacao.objects.get_or_create(aluno=instance)
+
+
+@receiver(pre_save, sender=Nota)
+@receiver(pre_save, sender=Presenca)
+def guardar_aluno_anterior(sender, instance, raw=False, **kwargs):
+    """Guarda o aluno original, caso a edição troque o lançamento de aluno"""
+    if raw or instance.pk is None:
+        return
+    instance._aluno_id_anterior = (
+        sender.objects.filter(pk=instance.pk).values_list('aluno_id', flat=True).first()
+    )
+
+
+@receiver(post_save, sender=Nota)
+@receiver(post_save, sender=Presenca)
+def atualizar_pontuacao_lancamento(sender, instance, raw=False, **kwargs):
+    """Recalcula a pontuação do aluno após criar ou editar uma nota/presença"""
+    if raw:
+        return
+    atualizar_pontuacoes([instance.aluno_id, getattr(instance, '_aluno_id_anterior', None)])
+
+
+@receiver(post_delete, sender=Nota)
+@receiver(post_delete, sender=Presenca)
+def atualizar_pontuacao_exclusao(sender, instance, origin=None, **kwargs):
+    """Recalcula a pontuação do aluno após excluir uma nota/presença"""
+    # Aluno excluído: a pontuação vai junto na cascata.
+    # Atividade excluída: os alunos afetados são recalculados de uma vez abaixo.
+    if _exclusao_originada_por(origin, Aluno, Atividade):
+        return
+    atualizar_pontuacoes([instance.aluno_id])
+
+
+@receiver(pre_delete, sender=Atividade)
+def guardar_alunos_da_atividade(sender, instance, **kwargs):
+    """Guarda os alunos com nota na atividade antes que a cascata as apague"""
+    instance._alunos_afetados = list(
+        Nota.objects.filter(atividade=instance).values_list('aluno_id', flat=True)
+    )
+
+
+@receiver(post_delete, sender=Atividade)
+def atualizar_pontuacao_atividade(sender, instance, **kwargs):
+    """Recalcula, em lote, a pontuação dos alunos que tinham nota na atividade"""
+    atualizar_pontuacoes(getattr(instance, '_alunos_afetados', []))
+
+
+@receiver(post_save, sender=Grupo)
+def criar_pontuacao_grupo(sender, instance, created, raw=False, **kwargs):
+    """Todo grupo novo começa com os totais zerados"""
+    if created and not raw:
+        GrupoPontuacao.objects.get_or_create(grupo=instance)
+
+
+@receiver(post_save, sender=MembroGrupo)
+def atualizar_pontuacao_grupo_membro(sender, instance, created, raw=False, **kwargs):
+    """Recalcula os totais do grupo quando um membro entra (ou é trocado)"""
+    if raw:
+        return
+    atualizar_pontuacoes_grupos([instance.grupo_id])
+
+
+@receiver(post_delete, sender=MembroGrupo)
+def atualizar_pontuacao_grupo_exclusao(sender, instance, origin=None, **kwargs):
+    """Recalcula os totais do grupo quando um membro sai"""
+    # Grupo excluído: os totais vão junto na cascata
+    if _exclusao_originada_por(origin, Grupo):
+        return
+    atualizar_pontuacoes_grupos([instance.grupo_id])
+
+
+@receiver(post_save, sender=Aluno)
+@receiver(post_delete, sender=Aluno)
+@receiver(post_save, sender=Atividade)
+@receiver(post_delete, sender=Atividade)
+@receiver(post_save, sender=Grupo)
+@receiver(post_delete, sender=Grupo)
+@receiver(post_save, sender=MembroGrupo)
+@receiver(post_delete, sender=MembroGrupo)
+def invalidar_cache_ranking(sender, raw=False, **kwargs):
+    """Qualquer mudança que apareça no ranking invalida o cache (após o commit)"""
+    if not raw:
+        cache_ranking.invalidar_ranking()
+
+
+@receiver(cache_ranking.ranking_invalidado)
+def notificar_ranking_ao_vivo(sender, **kwargs):
+    """Nova versão do ranking: as telas conectadas recebem as linhas alteradas"""
+    transmissor.notificar()
+
+
+@receiver(post_save, sender=Premio)
+@receiver(post_delete, sender=Premio)
+@receiver(post_save, sender=OrcamentoPremios)
+@receiver(post_delete, sender=OrcamentoPremios)
+def invalidar_tabela_premios(sender, **kwargs):
+    """Os processos recompilam a tabela de prêmios na próxima jogada (após o commit)"""
+    invalidar_premios()
+
+
+@receiver(pre_save, sender=CacaNiquel)
+def guardar_jogada_anterior(sender, instance, raw=False, **kwargs):
+    """Guarda dia, recompensa e resgate originais, para descontá-los dos totais diários"""
+    if raw or instance.pk is None:
+        return
+    anterior = sender.objects.filter(pk=instance.pk).values('data_jogada', 'recompensa', 'resgatado').first()
+    instance._jogada_anterior = CacaNiquel(**anterior) if anterior else None
+
+
+@receiver(post_save, sender=CacaNiquel)
+def atualizar_diario_jogada(sender, instance, raw=False, **kwargs):
+    """Contabiliza nos totais diários a jogada criada ou editada (admin)"""
+    if raw:
+        return
+    tabela = tabela_premios()
+    variacoes = variacoes_jogadas([instance], tabela)
+    anterior = getattr(instance, '_jogada_anterior', None)
+    if anterior is not None:
+        variacoes_jogadas([anterior], tabela, sinal=-1, variacoes=variacoes)
+    acumular(variacoes)
+
+
+@receiver(post_delete, sender=CacaNiquel)
+def atualizar_diario_exclusao(sender, instance, origin=None, **kwargs):
+    """Desconta dos totais diários a jogada excluída"""
+    # Aluno excluído: as jogadas dele são descontadas de uma vez abaixo
+    if _exclusao_originada_por(origin, Aluno):
+        return
+    acumular(variacoes_jogadas([instance], tabela_premios(), sinal=-1))
+
+
+@receiver(pre_delete, sender=Aluno)
+def guardar_jogadas_do_aluno(sender, instance, **kwargs):
+    """Agrupa as jogadas do aluno antes que a cascata as apague"""
+    instance._variacoes_caca_niquel = variacoes_agrupadas(
+        CacaNiquel.objects.filter(aluno=instance), tabela_premios(), sinal=-1
+    )
+
+
+@receiver(post_delete, sender=Aluno)
+def atualizar_diario_aluno(sender, instance, **kwargs):
+    """Desconta dos totais diários, em lote, as jogadas do aluno excluído"""
+    acumular(getattr(instance, '_variacoes_caca_niquel', {}))
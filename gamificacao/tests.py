@@ -1,3 +1,605 @@
-from django.test import TestCase
+import logging
+import random
+import threading
+from collections import Counter
+from datetime import date, timedelta
+from decimal import Decimal
+from io import StringIO
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core import signing
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from . import cache_ranking
+from .banco import executar_com_repeticao
+from .caca_niquel import PREMIOS_POR_PAGINA, PremiosEsgotados, SorteadorAlias, compilar_tabela, jogar, reservar
+from .classificacao import ao_redor, posicao_aluno, top, vizinhos
+from .grupos import incluir_membros
+from .middleware import OrcamentoConsultasExcedido
+from .models import (
+    Aluno, AlunoPontuacao, Atividade, CacaNiquel, Grupo, GrupoPontuacao, HistoricoNota, MembroGrupo, Nota,
+    OrcamentoPremios, PosicaoDiaria, Premio, Presenca
+)
+from .notas import gravar_notas, importar_notas_csv
+from .paginacao import SALT, ULTIMA, PaginadorCursor
+from .pontuacao import calcular_ranking, dados_dashboard, pontuacoes_calculadas
+from .presencas import ResumoPresencas, lancar_presencas_turma
+
+
+# Os testes limpam e escrevem no cache: nunca no diretório compartilhado pelos workers
+CACHE_TESTES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+@override_settings(CACHES=CACHE_TESTES)
+class LimitesPremiosConcorrenciaTest(TransactionTestCase):
+    """Estoque e orçamento não podem ser ultrapassados por jogadas simultâneas"""
+
+    JOGADORES = 12
+    JOGADAS_POR_JOGADOR = 15
+
+    def setUp(self):
+        # Só prêmios caros, para que estoque e orçamento se esgotem durante o teste
+        Premio.objects.all().delete()
+        Premio.objects.create(chave='10_reais', rotulo='R$ 10,00', peso=60, valor=Decimal('10.00'), estoque=7)
+        Premio.objects.create(chave='5_reais', rotulo='R$ 5,00', peso=35, valor=Decimal('5.00'))
+        self.vale = Premio.objects.create(chave='vale_trabalho', rotulo='Vale-trabalho', peso=5)
+        hoje = timezone.localdate()
+        self.orcamento = OrcamentoPremios.objects.create(
+            inicio=hoje - timedelta(days=1), fim=hoje + timedelta(days=1), limite=Decimal('150.00')
+        )
+        self.alunos = [
+            Aluno.objects.create(nome=f'Aluno {i}', matricula=f'T{i:03d}') for i in range(self.JOGADORES)
+        ]
+
+    def jogar_em_paralelo(self):
+        # As repetições por banco bloqueado são esperadas aqui
+        logger = logging.getLogger('gamificacao.banco')
+        nivel = logger.level
+        logger.setLevel(logging.ERROR)
+        self.addCleanup(logger.setLevel, nivel)
+
+        erros = []
+        largada = threading.Barrier(self.JOGADORES)
+
+        def jogador(aluno):
+            try:
+                largada.wait()
+                for _ in range(self.JOGADAS_POR_JOGADOR):
+                    executar_com_repeticao(jogar, [aluno], tentativas=50)
+            except Exception as erro:  # noqa: BLE001 - relatado pelo teste
+                erros.append(erro)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=jogador, args=(aluno,)) for aluno in self.alunos]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return erros
+
+    def test_estoque_e_orcamento_nunca_ultrapassados(self):
+        erros = self.jogar_em_paralelo()
+        self.assertEqual(erros, [])
+
+        jogadas = CacaNiquel.objects.count()
+        self.assertEqual(jogadas, self.JOGADORES * self.JOGADAS_POR_JOGADOR)
+
+        dez_reais = CacaNiquel.objects.filter(recompensa='10_reais').count()
+        cinco_reais = CacaNiquel.objects.filter(recompensa='5_reais').count()
+        gasto = dez_reais * 10 + cinco_reais * 5
+        self.orcamento.refresh_from_db()
+
+        # 180 jogadas com 60% de chance: o estoque de 7 sempre é disputado até o fim
+        self.assertEqual(dez_reais, 7)
+        self.assertEqual(Premio.objects.get(chave='10_reais').estoque, 7 - dez_reais)
+        self.assertLessEqual(gasto, 150)
+        self.assertEqual(self.orcamento.gasto_centavos, gasto * 100)
+        # Esgotados os prêmios em dinheiro, as jogadas caem para o vale-trabalho
+        self.assertGreater(CacaNiquel.objects.filter(recompensa='vale_trabalho').count(), 0)
+
+    def test_sem_premio_disponivel(self):
+        self.vale.ativo = False
+        self.vale.save()
+        Premio.objects.filter(chave='10_reais').update(estoque=0)
+        self.orcamento.limite = Decimal('4.00')
+        self.orcamento.save()
+
+        with self.assertRaises(PremiosEsgotados):
+            jogar([self.alunos[0]])
+        self.assertFalse(CacaNiquel.objects.exists())
+
+
+class PercentualPresencaTest(SimpleTestCase):
+    """Percentual de presença calculado a partir das contagens materializadas"""
+
+    def test_percentual_da_pontuacao_materializada(self):
+        self.assertEqual(AlunoPontuacao(qtd_presencas=3, qtd_faltas=1).percentual_presenca, 75.0)
+        self.assertEqual(AlunoPontuacao(qtd_presencas=0, qtd_faltas=0).percentual_presenca, 0.0)
+
+    def test_posicao_diaria_nao_tem_percentual(self):
+        self.assertFalse(hasattr(PosicaoDiaria, 'percentual_presenca'))
+
+
+@override_settings(CACHES=CACHE_TESTES)
+class ImportacaoNotasTest(TestCase):
+    """Linhas inválidas do CSV viram erros da linha, sem interromper a importação"""
+
+    def setUp(self):
+        self.aluno = Aluno.objects.create(nome='Ana', matricula='A001')
+        self.atividade = Atividade.objects.create(nome='Prova 1', valor_maximo=Decimal('10.0'))
+
+    def test_erros_por_linha(self):
+        linhas = [
+            'matricula,atividade,nota',
+            'A001,Prova 1,"8,5"',
+            'X999,Prova 1,7',
+            'A001,Prova 2,7',
+            'A001,Prova 1,abc',
+            'A001,Prova 1,1e30',
+            'A001,Prova 1,-1',
+            'A001,Prova 1,7.25',
+            'A001,Prova 1,NaN',
+        ]
+        resumo = importar_notas_csv(linhas)
+
+        self.assertEqual((resumo.linhas, resumo.inseridas, resumo.total_erros), (8, 1, 7))
+        self.assertEqual([numero for numero, _ in resumo.erros], [3, 4, 5, 6, 7, 8, 9])
+        self.assertIn('acima do valor máximo', resumo.erros[3][1])
+        self.assertEqual(Nota.objects.get(aluno=self.aluno, atividade=self.atividade).valor, Decimal('8.5'))
+
+    def test_atividade_ambigua(self):
+        # Dois "Trabalho": a nota não pode ir para um deles por acaso
+        Atividade.objects.create(nome='Trabalho', valor_maximo=Decimal('10.0'))
+        Atividade.objects.create(nome='Trabalho', valor_maximo=Decimal('5.0'))
+
+        resumo = importar_notas_csv(['matricula,atividade,nota', 'A001,Trabalho,4', 'A001,Prova 1,6'])
+
+        self.assertEqual((resumo.inseridas, resumo.erros), (1, [(2, 'atividade "Trabalho" ambígua')]))
+        self.assertFalse(Nota.objects.filter(atividade__nome='Trabalho').exists())
+
+
+@override_settings(CACHES=CACHE_TESTES)
+class RebuildScoresTest(TestCase):
+    """rebuild_scores corrige a pontuação materializada e invalida o ranking em cache"""
+
+    def setUp(self):
+        cache.clear()
+        self.aluno = Aluno.objects.create(nome='Ana', matricula='A001')
+        atividade = Atividade.objects.create(nome='Prova 1', valor_maximo=Decimal('10.0'))
+        self.nota = Nota.objects.create(aluno=self.aluno, atividade=atividade, valor=Decimal('8.0'))
+
+    def nota_media_no_ranking(self):
+        return {linha.aluno_id: linha.nota_media for linha in dados_dashboard()['ranking']}[self.aluno.pk]
+
+    def test_rebuild_invalida_o_ranking(self):
+        self.assertEqual(self.nota_media_no_ranking(), 8.0)
+
+        # update() não dispara sinais: pontuação materializada e cache ficam desatualizados
+        Nota.objects.filter(pk=self.nota.pk).update(valor=Decimal('4.0'))
+        self.assertEqual(self.nota_media_no_ranking(), 8.0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('rebuild_scores', stdout=StringIO())
+        self.assertEqual(AlunoPontuacao.objects.get(pk=self.aluno.pk).nota_media, 4.0)
+        self.assertEqual(self.nota_media_no_ranking(), 4.0)
+
+
+@override_settings(GAMIFICACAO_ORCAMENTO_ESTRITO=True, CACHES=CACHE_TESTES)
+class OrcamentoConsultasTest(TestCase):
+    """Cada view com orçamento fica dentro dele; no modo estrito, o estouro levanta exceção"""
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'senha'))
+        self.alunos = [Aluno.objects.create(nome=f'Aluno {i}', matricula=f'O{i:03d}') for i in range(6)]
+        self.atividade = Atividade.objects.create(nome='Prova 1', valor_maximo=Decimal('10.0'))
+        hoje = timezone.localdate()
+        for aluno in self.alunos:
+            Nota.objects.create(aluno=aluno, atividade=self.atividade, valor=Decimal('7.0'))
+            Presenca.objects.create(aluno=aluno, data_presenca=hoje)
+        self.grupo = Grupo.objects.create(nome='Grupo 1', lider=self.alunos[0])
+        MembroGrupo.objects.create(grupo=self.grupo, aluno=self.alunos[0])
+        for _ in range(3):
+            jogar(self.alunos)
+
+    def urls_com_orcamento(self):
+        argumentos = {
+            'posicao_aluno_ranking': {'aluno_id': self.alunos[0].pk},
+            'gerenciar_notas_atividade': {'atividade_id': self.atividade.pk},
+            'lancar_notas_grade': {'atividade_id': self.atividade.pk},
+            'editar_grupo': {'grupo_id': self.grupo.pk},
+            'adicionar_membros': {'grupo_id': self.grupo.pk},
+        }
+        for nome in settings.GAMIFICACAO_ORCAMENTO_CONSULTAS:
+            yield nome, reverse(nome, kwargs=argumentos.get(nome))
+
+    def test_views_dentro_do_orcamento(self):
+        for nome, url in self.urls_com_orcamento():
+            with self.subTest(view=nome):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                consultas = int(response['X-Query-Count'])
+                self.assertLessEqual(consultas, settings.GAMIFICACAO_ORCAMENTO_CONSULTAS[nome])
+
+    def test_pagina_alem_da_ultima_redireciona(self):
+        url = reverse('premios_pendentes')
+        ultima = -(-CacaNiquel.objects.filter(resgatado=False).count() // PREMIOS_POR_PAGINA)
+
+        response = self.client.get(url, {'page': 99})
+        self.assertRedirects(response, f'{url}?page={ultima}')
+        orcamento = settings.GAMIFICACAO_ORCAMENTO_CONSULTAS['premios_pendentes']
+        self.assertLessEqual(int(response['X-Query-Count']), orcamento)
+
+    def test_estouro_levanta_excecao(self):
+        orcamentos = {**settings.GAMIFICACAO_ORCAMENTO_CONSULTAS, 'dashboard': 1}
+        with override_settings(GAMIFICACAO_ORCAMENTO_CONSULTAS=orcamentos):
+            with self.assertLogs('gamificacao', 'WARNING'), self.assertRaises(OrcamentoConsultasExcedido):
+                self.client.get(reverse('dashboard'))
+
+
+@override_settings(CACHES=CACHE_TESTES)
+class PontuacaoMaterializadaTest(TestCase):
+    """A pontuação materializada acompanha cada forma de escrita (sinais e operações em lote)"""
+
+    def setUp(self):
+        self.alunos = [Aluno.objects.create(nome=f'Aluno {i}', matricula=f'P{i:03d}') for i in range(4)]
+        self.atividades = [
+            Atividade.objects.create(nome=f'Prova {i}', valor_maximo=Decimal('10.0')) for i in range(2)
+        ]
+
+    def assertSemDivergencia(self):
+        armazenadas = {p.aluno_id: p for p in AlunoPontuacao.objects.all()}
+        for calculada in pontuacoes_calculadas(Aluno.objects.all()):
+            armazenada = armazenadas[calculada.aluno_id]
+            for campo in ('soma_notas', 'qtd_notas', 'qtd_presencas', 'qtd_faltas', 'pontuacao_total'):
+                self.assertEqual(getattr(armazenada, campo), getattr(calculada, campo), (calculada.aluno_id, campo))
+        call_command('rebuild_scores', '--verify', stdout=StringIO())
+
+    def test_sem_divergencia_apos_escritas(self):
+        a, b, c, d = self.alunos
+        prova1, prova2 = self.atividades
+
+        nota = Nota.objects.create(aluno=a, atividade=prova1, valor=Decimal('8.0'))
+        Nota.objects.create(aluno=b, atividade=prova1, valor=Decimal('6.5'))
+        Presenca.objects.create(aluno=a, data_presenca=date(2024, 3, 1))
+        falta = Presenca.objects.create(aluno=c, data_presenca=date(2024, 3, 1), presente=False)
+        self.assertSemDivergencia()
+
+        # Edição que troca o aluno: os dois alunos são recalculados
+        nota.aluno = d
+        nota.valor = Decimal('9.0')
+        nota.save()
+        falta.delete()
+        self.assertSemDivergencia()
+
+        gravar_notas({(a.pk, prova2.pk): Decimal('7.0'), (b.pk, prova1.pk): Decimal('5.0')})
+        lancar_presencas_turma(date(2024, 3, 2), [a.pk, b.pk])
+        self.assertSemDivergencia()
+
+        prova1.delete()
+        self.assertSemDivergencia()
+
+
+@override_settings(CACHES=CACHE_TESTES)
+class CacheRankingTest(TestCase):
+    """A versão do ranking muda só depois do commit, e o valor é recalculado uma vez por versão"""
+
+    def setUp(self):
+        cache.clear()
+        self.aluno = Aluno.objects.create(nome='Ana', matricula='C001')
+        self.atividade = Atividade.objects.create(nome='Prova 1', valor_maximo=Decimal('10.0'))
+
+    def test_versao_muda_apos_o_commit(self):
+        versao = cache_ranking.versao_atual()
+        sinais = []
+
+        def receptor(sender, **kwargs):
+            sinais.append(sender)
+
+        cache_ranking.ranking_invalidado.connect(receptor)
+        self.addCleanup(cache_ranking.ranking_invalidado.disconnect, receptor)
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            Nota.objects.create(aluno=self.aluno, atividade=self.atividade, valor=Decimal('8.0'))
+        # Ainda sem commit: a versão antiga continua valendo
+        self.assertEqual(cache_ranking.versao_atual(), versao)
+
+        for callback in callbacks:
+            callback()
+        self.assertGreater(cache_ranking.versao_atual(), versao)
+        self.assertTrue(sinais)
+
+    def test_recalcula_uma_vez_por_versao(self):
+        chamadas = []
+        recalculos = cache_ranking.estatisticas_cache()['recalculos']
+
+        def calcular():
+            chamadas.append(1)
+            return len(chamadas)
+
+        self.assertEqual(cache_ranking.obter('teste', calcular), 1)
+        self.assertEqual(cache_ranking.obter('teste', calcular), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            cache_ranking.invalidar_ranking()
+        self.assertEqual(cache_ranking.obter('teste', calcular), 2)
+        self.assertEqual(cache_ranking.estatisticas_cache()['recalculos'] - recalculos, 2)
+
+
+@override_settings(CACHES=CACHE_TESTES)
+class LancamentoPresencasTurmaTest(TestCase):
+    """Upsert da chamada da turma: contagens, regras de turma completa e número constante de consultas"""
+
+    def setUp(self):
+        self.alunos = [Aluno.objects.create(nome=f'Aluno {i}', matricula=f'L{i:03d}') for i in range(3)]
+        self.inativo = Aluno.objects.create(nome='Inativo', matricula='L999', ativo=False)
+
+    def test_presencas_da_turma(self):
+        a, b, c = self.alunos
+        dia = date(2024, 3, 1)
+
+        self.assertEqual(lancar_presencas_turma(dia, [a.pk]), ResumoPresencas(3, 0, 0))
+        self.assertEqual(lancar_presencas_turma(dia, [a.pk, b.pk]), ResumoPresencas(0, 1, 2))
+        # Sem turma completa, um registro existente não é sobrescrito
+        self.assertEqual(lancar_presencas_turma(dia, [c.pk], turma_completa=False), ResumoPresencas(0, 0, 1))
+        self.assertEqual(
+            dict(Presenca.objects.filter(data_presenca=dia).values_list('aluno_id', 'presente')),
+            {a.pk: True, b.pk: True, c.pk: False},
+        )
+
+        self.assertEqual(
+            lancar_presencas_turma(date(2024, 3, 2), [c.pk], turma_completa=False), ResumoPresencas(1, 0, 0)
+        )
+        self.assertFalse(Presenca.objects.filter(aluno=self.inativo).exists())
+        pontuacao = AlunoPontuacao.objects.get(pk=c.pk)
+        self.assertEqual((pontuacao.qtd_presencas, pontuacao.qtd_faltas), (1, 1))
+
+    def test_consultas_nao_crescem_com_a_turma(self):
+        def consultas(dia, presentes):
+            with CaptureQueriesContext(connection) as contexto:
+                lancar_presencas_turma(dia, [aluno.pk for aluno in presentes])
+            return len(contexto)
+
+        # Inserções e depois atualizações, com 3 e com 15 alunos ativos
+        turma_pequena = (consultas(date(2024, 3, 1), self.alunos[:1]), consultas(date(2024, 3, 1), self.alunos[1:]))
+        extras = [Aluno.objects.create(nome=f'Extra {i}', matricula=f'E{i:03d}') for i in range(12)]
+        turma_grande = (consultas(date(2024, 3, 2), extras[:5]), consultas(date(2024, 3, 2), extras[5:]))
+        self.assertEqual(turma_pequena, turma_grande)
+
+
+@override_settings(CACHES=CACHE_TESTES)
+class GravacaoNotasTest(TestCase):
+    """Gravação em lote da grade de notas: contagens, histórico e número constante de consultas"""
+
+    def setUp(self):
+        self.alunos = [Aluno.objects.create(nome=f'Aluno {i}', matricula=f'N{i:03d}') for i in range(3)]
+        self.atividade = Atividade.objects.create(nome='Prova 1', valor_maximo=Decimal('10.0'))
+
+    def test_notas_com_historico(self):
+        a, b, c = self.alunos
+        atividade = self.atividade.pk
+
+        self.assertEqual(
+            tuple(gravar_notas({(a.pk, atividade): Decimal('8.0'), (b.pk, atividade): Decimal('6.0')})),
+            (2, 0, 0),
+        )
+        valores = {
+            (a.pk, atividade): Decimal('8.0'), (b.pk, atividade): Decimal('7.0'), (c.pk, atividade): Decimal('5.0')
+        }
+        self.assertEqual(tuple(gravar_notas(valores, motivo='Revisão')), (1, 1, 1))
+
+        historico = HistoricoNota.objects.get()
+        self.assertEqual(historico.nota.aluno_id, b.pk)
+        self.assertEqual((historico.valor_anterior, historico.valor_novo, historico.motivo), (6, 7, 'Revisão'))
+        self.assertEqual(AlunoPontuacao.objects.get(pk=b.pk).nota_media, 7.0)
+
+    def test_consultas_nao_crescem_com_o_lote(self):
+        mais_alunos = [Aluno.objects.create(nome=f'Extra {i}', matricula=f'E{i:03d}') for i in range(12)]
+
+        def consultas(alunos, valor):
+            with CaptureQueriesContext(connection) as contexto:
+                gravar_notas({(aluno.pk, self.atividade.pk): valor for aluno in alunos})
+            return len(contexto)
+
+        # Inserções e depois atualizações (com histórico), com 3 e com 12 alunos
+        self.assertEqual(consultas(self.alunos, Decimal('5.0')), consultas(mais_alunos, Decimal('5.0')))
+        self.assertEqual(consultas(self.alunos, Decimal('6.0')), consultas(mais_alunos, Decimal('6.0')))
+
+
+class SorteadorAliasTest(SimpleTestCase):
+    """A tabela de alias reproduz exatamente as proporções dos pesos"""
+
+    PESOS = [('nada', 50), ('vale', 0), ('doce', 30), ('5_reais', 15), ('10_reais', 5)]
+
+    def test_distribuicao_exata(self):
+        sorteador = SorteadorAlias(self.PESOS)
+        colunas = len(sorteador.chaves)
+        probabilidades = Counter()
+        for coluna, chave in enumerate(sorteador.chaves):
+            probabilidades[chave] += sorteador.probabilidades[coluna] / colunas
+            alias = sorteador.chaves[sorteador.alias[coluna]]
+            probabilidades[alias] += (1 - sorteador.probabilidades[coluna]) / colunas
+
+        self.assertNotIn('vale', sorteador.chaves)
+        for chave, peso in self.PESOS:
+            self.assertAlmostEqual(probabilidades[chave], peso / 100)
+
+    def test_distribuicao_amostrada(self):
+        sorteador = SorteadorAlias(self.PESOS)
+        rng = random.Random(1234)
+        sorteios = 100_000
+        frequencias = Counter(sorteador.sortear(rng) for _ in range(sorteios))
+        for chave, peso in self.PESOS:
+            self.assertAlmostEqual(frequencias[chave] / sorteios, peso / 100, delta=0.005)
+
+    def test_sem_pesos_positivos(self):
+        with self.assertRaises(ValueError):
+            SorteadorAlias([('nada', 0)])
+
+
+@override_settings(CACHES=CACHE_TESTES)
+class ReservaPremiosTest(TestCase):
+    """Estoque e orçamento descontados por UPDATEs condicionais, com devolução quando falta saldo"""
+
+    def setUp(self):
+        Premio.objects.all().delete()
+        Premio.objects.create(chave='10_reais', rotulo='R$ 10,00', peso=1, valor=Decimal('10.00'), estoque=3)
+        Premio.objects.create(chave='doce', rotulo='Doce', peso=1)
+        hoje = timezone.localdate()
+        self.orcamento = OrcamentoPremios.objects.create(inicio=hoje, fim=hoje, limite=Decimal('25.00'))
+        self.tabela = compilar_tabela()
+
+    def estado(self):
+        self.orcamento.refresh_from_db()
+        return Premio.objects.get(chave='10_reais').estoque, self.orcamento.gasto_centavos
+
+    def test_desconta_estoque_e_orcamento(self):
+        dez_reais = self.tabela.premio('10_reais')
+
+        self.assertTrue(reservar(dez_reais, self.orcamento.pk, 2))
+        self.assertEqual(self.estado(), (1, 2000))
+        # Há estoque, mas não saldo: a unidade reservada volta ao estoque
+        self.assertFalse(reservar(dez_reais, self.orcamento.pk))
+        self.assertEqual(self.estado(), (1, 2000))
+        # Sem orçamento vigente, só o estoque limita
+        self.assertTrue(reservar(dez_reais, None))
+        self.assertFalse(reservar(dez_reais, None))
+        self.assertEqual(self.estado(), (0, 2000))
+
+    def test_premio_sem_valor_nem_estoque_nao_consulta(self):
+        with self.assertNumQueries(0):
+            self.assertTrue(reservar(self.tabela.premio('doce'), self.orcamento.pk, 10))
+
+
+@override_settings(CACHES=CACHE_TESTES)
+class ClassificacaoEmpatesTest(TestCase):
+    """Posição do ranking completo e classificação com empates (RANK/DENSE_RANK) nos três modos"""
+
+    def setUp(self):
+        atividade = Atividade.objects.create(nome='Prova 1', valor_maximo=Decimal('10.0'))
+        self.alunos = {}
+        # Bruno e Ana empatam nos três critérios; o nome só ordena a exibição
+        for nome, valor in (('Bruno', '9.0'), ('Ana', '9.0'), ('Carla', '7.0'), ('Davi', '5.0')):
+            aluno = Aluno.objects.create(nome=nome, matricula=nome.upper())
+            Nota.objects.create(aluno=aluno, atividade=atividade, valor=Decimal(valor))
+            self.alunos[nome] = aluno.pk
+        inativo = Aluno.objects.create(nome='Elisa', matricula='ELISA', ativo=False)
+        Nota.objects.create(aluno=inativo, atividade=atividade, valor=Decimal('10.0'))
+        self.alunos['Elisa'] = inativo.pk
+
+    def classificacoes(self, linhas):
+        return [(linha.nome, linha.classificacao) for linha in linhas]
+
+    def test_top(self):
+        # A posição é a mesma do ranking completo (e do ranking ao vivo); só a classificação repete nos empates
+        self.assertEqual([linha.posicao for linha in top(4)], [linha.posicao for linha in calcular_ranking()])
+        self.assertEqual(self.classificacoes(top(3)), [('Ana', 1), ('Bruno', 1), ('Carla', 3)])
+        self.assertEqual(
+            self.classificacoes(top(4, densa=True)), [('Ana', 1), ('Bruno', 1), ('Carla', 2), ('Davi', 3)]
+        )
+
+    def test_posicao_aluno(self):
+        self.assertEqual(posicao_aluno(self.alunos['Bruno'])[-2:], (2, 1))
+        self.assertEqual(posicao_aluno(self.alunos['Davi'])[-2:], (4, 4))
+        self.assertEqual(posicao_aluno(self.alunos['Davi'], densa=True)[-2:], (4, 3))
+        self.assertEqual(posicao_aluno(self.alunos['Carla']), calcular_ranking()[2]._replace(classificacao=3))
+        self.assertIsNone(posicao_aluno(self.alunos['Elisa']))
+
+    def test_vizinhos_e_ao_redor(self):
+        self.assertEqual(self.classificacoes(vizinhos(3, k=1)), [('Carla', 3), ('Davi', 4)])
+        self.assertEqual(self.classificacoes(ao_redor(self.alunos['Carla'], k=1)), [('Carla', 3), ('Davi', 4)])
+        self.assertEqual(
+            self.classificacoes(ao_redor(self.alunos['Carla'], k=1, densa=True)),
+            [('Ana', 1), ('Bruno', 1), ('Carla', 2), ('Davi', 3)],
+        )
+        self.assertEqual(ao_redor(self.alunos['Elisa']), [])
+
+
+@override_settings(CACHES=CACHE_TESTES)
+class PaginadorCursorTest(TestCase):
+    """Idas e voltas pelos cursores cobrem a lista inteira; cursores inválidos voltam ao início"""
+
+    def setUp(self):
+        # Nomes repetidos: a ordem depende do desempate por pk
+        for i in range(8):
+            Aluno.objects.create(nome=f'Aluno {i // 2}', matricula=f'G{i:03d}')
+        self.ordenados = list(Aluno.objects.order_by('nome', 'pk'))
+        self.paginador = PaginadorCursor(Aluno.objects.all(), ('nome', 'pk'), por_pagina=3)
+
+    def test_ida_e_volta(self):
+        paginas = [self.paginador.pagina()]
+        while paginas[-1].has_next():
+            paginas.append(self.paginador.pagina(paginas[-1].cursor_proximo))
+        self.assertEqual([item for pagina in paginas for item in pagina], self.ordenados)
+        self.assertEqual([len(pagina) for pagina in paginas], [3, 3, 2])
+        self.assertFalse(paginas[0].has_previous())
+
+        volta = self.paginador.pagina(paginas[-1].cursor_anterior)
+        self.assertEqual(list(volta), list(paginas[1]))
+        self.assertEqual(list(self.paginador.pagina(volta.cursor_proximo)), list(paginas[2]))
+
+    def test_de_tras_para_frente(self):
+        paginas = [self.paginador.pagina(ULTIMA)]
+        while paginas[-1].has_previous():
+            paginas.append(self.paginador.pagina(paginas[-1].cursor_anterior))
+        self.assertEqual([item for pagina in reversed(paginas) for item in pagina], self.ordenados)
+        self.assertFalse(paginas[0].has_next())
+
+    def test_cursores_invalidos_voltam_ao_inicio(self):
+        primeira = list(self.paginador.pagina())
+        cursor = self.paginador.pagina().cursor_proximo
+        invalidos = [
+            cursor[:-1] + ('A' if cursor[-1] != 'A' else 'B'),
+            'abc',
+            signing.dumps({'v': ['Aluno 1'], 't': False}, salt=SALT),
+            signing.dumps({'v': ['Aluno 1', 'x'], 't': False}, salt=SALT),
+            signing.dumps({'v': ['Aluno 1', self.ordenados[2].pk], 't': False}, salt='outro'),
+        ]
+        for invalido in invalidos:
+            with self.subTest(cursor=invalido):
+                self.assertEqual(list(self.paginador.pagina(invalido)), primeira)
+
+    def test_linhas_do_cursor_excluidas(self):
+        pagina = self.paginador.pagina()
+        Aluno.objects.filter(pk__in=[aluno.pk for aluno in self.ordenados[2:]]).delete()
+        # Nada depois da posição: volta para a última página existente
+        self.assertEqual(list(self.paginador.pagina(pagina.cursor_proximo)), self.ordenados[:2])
+
+
+@override_settings(CACHES=CACHE_TESTES)
+class IncluirMembrosTest(TestCase):
+    """Membros incluídos em lote: um INSERT e um recálculo do grupo, qualquer que seja a quantidade"""
+
+    def setUp(self):
+        atividade = Atividade.objects.create(nome='Prova 1', valor_maximo=Decimal('10.0'))
+        self.alunos = []
+        for i in range(10):
+            aluno = Aluno.objects.create(nome=f'Aluno {i}', matricula=f'M{i:03d}')
+            Nota.objects.create(aluno=aluno, atividade=atividade, valor=Decimal(i))
+            self.alunos.append(aluno)
+        self.grupos = [Grupo.objects.create(nome=f'Grupo {i}') for i in range(2)]
+
+    def test_totais_do_grupo(self):
+        grupo = self.grupos[0]
+        MembroGrupo.objects.create(grupo=grupo, aluno=self.alunos[0])
+
+        self.assertEqual(incluir_membros(grupo, self.alunos[:4]), 3)
+        self.assertEqual(incluir_membros(grupo, self.alunos[:4]), 0)
+        pontuacao = GrupoPontuacao.objects.get(grupo=grupo)
+        self.assertEqual((pontuacao.qtd_membros, pontuacao.pontuacao_total), (4, 6.0))
+
+    def test_consultas_nao_crescem_com_os_membros(self):
+        def consultas(grupo, alunos):
+            with CaptureQueriesContext(connection) as contexto:
+                incluir_membros(grupo, alunos)
+            return len(contexto)
+
+        self.assertEqual(consultas(self.grupos[0], self.alunos[:2]), consultas(self.grupos[1], self.alunos))
@@ -9,9 +9,19 @@ urlpatterns = [
     
     # Dashboard principal
     path('dashboard/', views.dashboard, name='dashboard'),
+    path('ranking/', views.ranking_json, name='ranking_json'),
+    path('ranking/ao-vivo/', views.ranking_ao_vivo, name='ranking_ao_vivo'),
+    path('ranking/cache/', views.estatisticas_cache_ranking, name='estatisticas_cache_ranking'),
+    path('ranking/aluno/<int:aluno_id>/', views.posicao_aluno_ranking, name='posicao_aluno_ranking'),
+    
+    # Exportações (CSV ou NDJSON via ?formato=)
+    path('exportar/ranking/', views.exportar_dados, {'tipo': 'ranking'}, name='exportar_ranking'),
+    path('exportar/notas/', views.exportar_dados, {'tipo': 'notas'}, name='exportar_notas'),
+    path('exportar/presencas/', views.exportar_dados, {'tipo': 'presencas'}, name='exportar_presencas'),
     
     # Histórico de notas
     path('historico/', views.historico_notas, name='historico_notas'),
+    path('historico/atividades/', views.historico_notas_fragmento, name='historico_notas_fragmento'),
     
     # Gerenciamento de alunos
     path('alunos/', views.gerenciar_alunos, name='gerenciar_alunos'),
@@ -29,6 +39,8 @@ urlpatterns = [
     path('notas/', views.gerenciar_notas, name='gerenciar_notas'),
     path('notas/atividade/<int:atividade_id>/', views.gerenciar_notas_atividade, name='gerenciar_notas_atividade'),
     path('notas/atividade/<int:atividade_id>/lancar/', views.lancar_nota, name='lancar_nota'),
+    path('notas/atividade/<int:atividade_id>/grade/', views.lancar_notas_grade, name='lancar_notas_grade'),
+    path('notas/importar/', views.importar_notas, name='importar_notas'),
     path('notas/atividade/<int:atividade_id>/aluno/<int:aluno_id>/lancar/', views.lancar_nota_aluno, name='lancar_nota_aluno'),
     path('notas/atividade/<int:atividade_id>/aluno/<int:aluno_id>/editar/', views.editar_nota, name='editar_nota'),
     path('notas/delete/<int:nota_id>/', views.deletar_nota, name='deletar_nota'),
@@ -42,6 +54,7 @@ urlpatterns = [
     
     # Gerenciamento de grupos
     path('grupos/', views.gerenciar_grupos, name='gerenciar_grupos'),
+    path('grupos/ranking/', views.ranking_grupos, name='ranking_grupos'),
     path('grupos/criar/', views.criar_grupo, name='criar_grupo'),
     path('grupos/<int:grupo_id>/editar/', views.editar_grupo, name='editar_grupo'),
     path('grupos/<int:grupo_id>/deletar/', views.deletar_grupo, name='deletar_grupo'),
@@ -51,8 +64,10 @@ urlpatterns = [
     # Caça-níquel
     path('caca-niquel/', views.caca_niquel_interface, name='caca_niquel'),
     path('caca-niquel/jogar/', views.jogar_caca_niquel, name='jogar_caca_niquel'),
+    path('caca-niquel/jogar-lote/', views.jogar_caca_niquel_lote, name='jogar_caca_niquel_lote'),
     path('caca-niquel/historico/', views.historico_caca_niquel, name='historico_caca_niquel'),
     path('caca-niquel/premios-pendentes/', views.premios_pendentes, name='premios_pendentes'),
     path('caca-niquel/marcar-resgatado/<int:jogada_id>/', views.marcar_resgatado, name='marcar_resgatado'),
+    path('caca-niquel/resgatar/', views.resgatar_premios, name='resgatar_premios'),
     path('caca-niquel/excluir-premio/<int:jogada_id>/', views.excluir_premio, name='excluir_premio'),
 ]
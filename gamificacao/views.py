@@ -1,20 +1,52 @@
+import codecs
+
+from asgiref.sync import sync_to_async
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
-from django.contrib.auth import authenticate, login, logout
+from django.contrib.auth import SESSION_KEY, authenticate, login, logout
 from django.contrib import messages
-from django.http import JsonResponse
-from django.db.models import Avg, Count
-from django.core.paginator import Paginator
-from django.views.decorators.http import require_http_methods
+from django.http import Http404, HttpResponse, HttpResponseBadRequest, JsonResponse, StreamingHttpResponse
+from django.core.handlers.asgi import ASGIRequest
+from django.db import transaction
+from django.db.models import Avg, Count, Prefetch, Q, Sum
+from django.db.models.functions import Coalesce
+from django.core.paginator import InvalidPage, Paginator
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition, require_http_methods
 from django.views.decorators.csrf import csrf_exempt
 from django.utils import timezone
+from django.utils.http import quote_etag
 from .models import Aluno, Atividade, Nota, HistoricoNota, Presenca, Grupo, MembroGrupo, CacaNiquel
-from .forms import AlunoForm, AtividadeForm, NotaForm, PresencaForm, GrupoForm, AdicionarMembrosForm
+from .forms import (
+    AlunoForm, AtividadeForm, NotaForm, NotasGradeForm, ImportarNotasForm, PresencaForm, GrupoForm,
+    AdicionarMembrosForm
+)
+from .banco import banco_bloqueado, repetir_se_bloqueado
+from .caca_niquel import (
+    LIMITE_JOGADAS_LOTE, PREMIOS_POR_PAGINA, SemPremiosAtivos, consultas_historico,
+    consultas_pendentes, jogar, resgatar, tabela_premios
+)
+from .concorrencia import consultas_independentes, montar_pagina, numero_pagina, ultima_pagina
+from .classificacao import LIMITE_TOP, LIMITE_VIZINHOS, TOP_PADRAO, VIZINHOS_PADRAO, posicao_aluno, top, vizinhos
+from .cache_ranking import estatisticas_cache, obter as obter_do_cache, ultima_alteracao, versao_atual
+from .exportacao import FORMATOS, exportar, exportar_assincrono
+from .grupos import carregar_rankings, incluir_membros, ranking_grupos as ranking_grupos_materializado
+from .notas import ErroImportacao, gravar_notas, importar_notas_csv
+from .paginacao import PARAMETRO as PARAMETRO_CURSOR, PaginadorCursor, total_aproximado
+from .pontuacao import consultas_dashboard, dados_dashboard, montar_dados_dashboard, pontuacoes_em_cache
+from .presencas import lancar_presencas_turma
+from .ranking_ao_vivo import transmissor
+from .ranking_diario import ALTURA_TENDENCIA, LARGURA_TENDENCIA, tendencias_em_cache
 import json
-import random
+from collections import Counter
+from datetime import date, datetime, time
 from decimal import Decimal
 
 
+# Atividades renderizadas por vez no histórico de notas
+ATIVIDADES_POR_PAGINA_HISTORICO = 5
+
+
 def login_view(request):
     """View para login do usuário"""
     if request.user.is_authenticated:
@@ -42,77 +74,264 @@ def logout_view(request):
     return redirect('login')
 
 
+def _inteiro_limitado(valor, padrao, maximo):
+    """Parâmetro inteiro da querystring entre 0 e ``maximo`` (ou o padrão, se inválido)"""
+    try:
+        return min(max(int(valor), 0), maximo)
+    except (TypeError, ValueError):
+        return padrao
+
+
+async def _usuario_carregado(request):
+    """
+    Usuário já carregado por ``login_required`` (``request.auser()``).
+    
+    Nas views assíncronas, ``request.user`` e ``request.auser()`` têm caches
+    separados; sem isso o template consultaria o usuário de novo.
+    """
+    return await request.auser()
+
+
+def _etag_ranking(request, *args, **kwargs):
+    """Validador do ranking: versão dos dados em cache e o dia (as tendências mudam à meia-noite)"""
+    return f'ranking-{versao_atual()}-{timezone.localdate():%Y%m%d}'
+
+
+def _etag_dashboard(request, *args, **kwargs):
+    """Validador da página: o do ranking mais o usuário (a página traz o nome dele)"""
+    # Com mensagens pendentes a página precisa ser renderizada para exibi-las
+    if len(messages.get_messages(request)):
+        return None
+    # Id do usuário lido da sessão, já carregada por login_required: na view
+    # assíncrona, request.user consultaria o banco fora de uma thread síncrona
+    return f'{_etag_ranking(request)}-{request.session.get(SESSION_KEY)}'
+
+
+def _ultima_alteracao_ranking(request, *args, **kwargs):
+    """Última mudança nos dados do ranking, ou a meia-noite de hoje se for posterior"""
+    alteracao = ultima_alteracao()
+    if alteracao is None:
+        # Momento perdido (cache reiniciado): sem Last-Modified, vale só o ETag
+        return None
+    meia_noite = timezone.make_aware(datetime.combine(timezone.localdate(), time.min))
+    return max(alteracao, meia_noite)
+
+
+def _ranking_do_modo(request, dados):
+    """Ranking completo ou, com ?modo=top, só as primeiras posições (classificadas no banco)"""
+    if request.GET.get('modo') != 'top':
+        return 'completo', dados['ranking']
+    quantidade = _inteiro_limitado(request.GET.get('n'), TOP_PADRAO, LIMITE_TOP) or TOP_PADRAO
+    return 'top', obter_do_cache(f'top:{quantidade}', lambda: top(quantidade))
+
+
 @login_required
-def dashboard(request):
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_etag_dashboard, last_modified_func=_ultima_alteracao_ranking)
+async def dashboard(request):
     """View principal - Dashboard com ranking"""
-    # Buscar todos os alunos ativos
-    alunos = Aluno.objects.filter(ativo=True).order_by('nome')
-    
-    # Calcular ranking baseado na média das notas
-    ranking_data = []
-    for aluno in alunos:
-        ranking_data.append({
-            'aluno': aluno,
-            'nota_media': aluno.nota_atual,
-            'total_atividades': aluno.total_atividades,
-            'pontos_presenca': aluno.pontos_presenca,
-            'pontuacao_total': aluno.pontuacao_total,
-            'percentual_presenca': aluno.percentual_presenca
-        })
-    
-    # Ordenar por pontuação total (nota + presença) decrescente
-    ranking_data.sort(key=lambda x: (x['pontuacao_total'], x['nota_media'], x['pontos_presenca']), reverse=True)
-    
-    # Adicionar posição no ranking
-    for i, item in enumerate(ranking_data, 1):
-        item['posicao'] = i
-    
-    # Estatísticas gerais
-    total_alunos = len(ranking_data)
-    total_atividades = Atividade.objects.filter(ativa=True).count()
-    total_presencas = Presenca.objects.filter(presente=True).count()
-    media_geral = sum(float(item['pontuacao_total']) for item in ranking_data) / total_alunos if total_alunos > 0 else 0
-    media_presenca = sum(item['pontos_presenca'] for item in ranking_data) / total_alunos if total_alunos > 0 else 0
+    request.user = await _usuario_carregado(request)
+    # GET condicional: sem mudanças desde a última visita, responde 304 antes de montar o ranking
+    # Ranking e contagens são leituras independentes (concorrencia.py), cada uma
+    # do cache versionado ou da pontuação materializada (ver pontuacao.py)
+    consultas = consultas_dashboard()
+    quantidade = None
+    if request.GET.get('modo') == 'top':
+        # ?modo=top: só as primeiras posições (mesma numeração do ranking completo; empates em ``classificacao``)
+        quantidade = _inteiro_limitado(request.GET.get('n'), TOP_PADRAO, LIMITE_TOP) or TOP_PADRAO
+        consultas['top'] = lambda: obter_do_cache(f'top:{quantidade}', lambda: top(quantidade))
+    resultados = await consultas_independentes(request, **consultas)
+    
+    ranking_top = resultados.pop('top', None)
+    context = montar_dados_dashboard(**resultados)
+    # Subidas/descidas e linha de tendência vêm dos retratos diários (ranking_diario.py)
+    tendencias = await sync_to_async(tendencias_em_cache)(context['ranking'])
+    ranking = context['ranking'] if quantidade is None else ranking_top
     
     context = {
-        'ranking': ranking_data,
-        'total_alunos': total_alunos,
-        'total_atividades': total_atividades,
-        'total_presencas': total_presencas,
-        'media_geral': round(media_geral, 2),
-        'media_presenca': round(media_presenca, 1),
+        **context,
+        'modo': 'completo' if quantidade is None else 'top',
+        'top_padrao': TOP_PADRAO,
+        'linhas_ranking': [(item, tendencias.get(item.aluno_id)) for item in ranking],
+        'largura_tendencia': LARGURA_TENDENCIA,
+        'altura_tendencia': ALTURA_TENDENCIA,
+        # Validador do JSON consultado pelo polling (static/js/main.js)
+        'etag_ranking': quote_etag(_etag_ranking(request)),
     }
     
-    return render(request, 'gamificacao/dashboard.html', context)
+    return await sync_to_async(render)(request, 'gamificacao/dashboard.html', context)
+
+
+@login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_etag_ranking, last_modified_func=_ultima_alteracao_ranking)
+def ranking_json(request):
+    """
+    Ranking em JSON para telas que fazem polling (projetor, celulares).
+    
+    Aceita o mesmo ``?modo=top&n=`` do dashboard. Com ``If-None-Match`` igual
+    à versão atual, responde 304 sem consultar o banco além da sessão.
+    """
+    dados = dados_dashboard()
+    tendencias = tendencias_em_cache(dados['ranking'])
+    modo, ranking = _ranking_do_modo(request, dados)
+    
+    linhas = []
+    for linha in ranking:
+        tendencia = tendencias.get(linha.aluno_id)
+        linhas.append({**linha._asdict(), 'variacao': tendencia.variacao if tendencia else None})
+    
+    return JsonResponse({
+        'modo': modo,
+        'total_alunos': dados['total_alunos'],
+        'total_atividades': dados['total_atividades'],
+        'media_geral': dados['media_geral'],
+        'ranking': linhas,
+    })
+
+
+@login_required
+async def ranking_ao_vivo(request):
+    """
+    Fluxo SSE com as mudanças do ranking (ranking_ao_vivo.py).
+    
+    Só funciona sob ASGI: sob WSGI a resposta infinita prenderia o worker,
+    então responde 503 e o dashboard usa o polling condicional.
+    """
+    if not isinstance(request, ASGIRequest):
+        return HttpResponse('Ranking ao vivo requer um servidor ASGI.', status=503, content_type='text/plain')
+    
+    response = StreamingHttpResponse(
+        transmissor.eventos(request.headers.get('Last-Event-ID')),
+        content_type='text/event-stream',
+    )
+    response['Cache-Control'] = 'no-cache'
+    # Proxies como o nginx não devem acumular o fluxo
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@login_required
+def posicao_aluno_ranking(request, aluno_id):
+    """
+    Posição de um aluno no ranking (JSON), calculada no banco sem carregar a turma.
+    
+    ``posicao`` é a do ranking completo; ``classificacao`` usa RANK, ou
+    DENSE_RANK com ``?densa=1``. ``?vizinhos=K`` inclui as linhas com
+    classificação até K acima e abaixo da do aluno.
+    """
+    densa = request.GET.get('densa') in ('1', 'true')
+    linha = posicao_aluno(aluno_id, densa=densa)
+    if linha is None:
+        return JsonResponse({'erro': 'Aluno não encontrado ou inativo'}, status=404)
+    
+    dados = {'criterio': 'dense_rank' if densa else 'rank', 'aluno': linha._asdict()}
+    if 'vizinhos' in request.GET:
+        k = _inteiro_limitado(request.GET['vizinhos'], VIZINHOS_PADRAO, LIMITE_VIZINHOS)
+        dados['vizinhos'] = [vizinho._asdict() for vizinho in vizinhos(linha.classificacao, k, densa=densa)]
+    return JsonResponse(dados)
+
+
+@login_required
+def estatisticas_cache_ranking(request):
+    """Contadores do cache do ranking (acertos, faltas, tempo de recálculo) para monitoramento"""
+    return JsonResponse({**estatisticas_cache(), 'ao_vivo': transmissor.estatisticas()})
+
+
+@login_required
+def exportar_dados(request, tipo):
+    """View para exportar ranking, notas ou presenças em CSV ou NDJSON, em streaming"""
+    formato = request.GET.get('formato', 'csv')
+    if formato not in FORMATOS:
+        return HttpResponseBadRequest('Formato inválido. Use csv ou ndjson.')
+    
+    # Período (opcional) das presenças, nos mesmos parâmetros da tela de presenças
+    filtros = {}
+    if tipo == 'presencas':
+        try:
+            for campo in ('data_inicio', 'data_fim'):
+                if request.GET.get(campo):
+                    filtros[campo] = date.fromisoformat(request.GET[campo])
+        except ValueError:
+            return HttpResponseBadRequest('Data inválida. Use o formato AAAA-MM-DD.')
+    
+    content_type, extensao = FORMATOS[formato]
+    # Sob ASGI um iterador síncrono seria lido inteiro em memória antes do envio
+    gerar = exportar_assincrono if isinstance(request, ASGIRequest) else exportar
+    response = StreamingHttpResponse(gerar(tipo, formato, **filtros), content_type=content_type)
+    response['Content-Disposition'] = (
+        f'attachment; filename="{tipo}_{timezone.localdate():%Y%m%d}.{extensao}"'
+    )
+    return response
+
+
+def _paginador_historico():
+    """Paginador das atividades do histórico, com média, total e notas carregadas em lote"""
+    atividades = (
+        Atividade.objects
+        .filter(ativa=True)
+        .annotate(media=Avg('nota__valor'), total_alunos=Count('nota'))
+        .prefetch_related(Prefetch(
+            'nota_set',
+            queryset=Nota.objects.select_related('aluno', 'lancada_por').order_by('-valor', 'aluno__nome'),
+            to_attr='notas_ordenadas',
+        ))
+        .order_by('-data_criacao', '-pk')
+    )
+    return Paginator(atividades, ATIVIDADES_POR_PAGINA_HISTORICO)
 
 
 @login_required
 def historico_notas(request):
     """View para mostrar histórico de notas por atividade"""
-    atividades = Atividade.objects.filter(ativa=True).order_by('-data_criacao')
+    # Apenas a primeira página é renderizada; as demais chegam pelo fragmento
+    page_obj = _paginador_historico().get_page(request.GET.get('page'))
+    
+    # Estatísticas gerais em uma única consulta, independentemente da paginação
+    estatisticas = (
+        Atividade.objects
+        .filter(ativa=True)
+        .annotate(media=Avg('nota__valor'), total_alunos=Count('nota'))
+        .aggregate(
+            total_atividades=Count('id'),
+            total_notas=Coalesce(Sum('total_alunos'), 0),
+            atividades_acima_7=Count('id', filter=Q(media__gte=7)),
+        )
+    )
     
-    historico_data = []
-    for atividade in atividades:
-        notas = Nota.objects.filter(atividade=atividade).select_related('aluno').order_by('-valor', 'aluno__nome')
-        historico_data.append({
-            'atividade': atividade,
-            'notas': notas,
-            'media': atividade.media_turma,
-            'total_alunos': notas.count()
-        })
+    context = {
+        'page_obj': page_obj,
+        'historico_data': page_obj.object_list,
+        **estatisticas,
+    }
     
-    return render(request, 'gamificacao/historico.html', {'historico_data': historico_data})
+    return render(request, 'gamificacao/historico.html', context)
+
+
+@login_required
+def historico_notas_fragmento(request):
+    """View que devolve (em HTML) uma página de atividades do histórico, carregada sob demanda"""
+    try:
+        page_obj = _paginador_historico().page(request.GET.get('page', 1))
+    except InvalidPage:
+        raise Http404('Página do histórico inexistente.')
+    
+    context = {
+        'page_obj': page_obj,
+        'historico_data': page_obj.object_list,
+    }
+    
+    return render(request, 'gamificacao/historico_atividades.html', context)
 
 
 @login_required
 def gerenciar_alunos(request):
     """View para gerenciar alunos"""
-    alunos = Aluno.objects.all().order_by('nome')
-    
-    # Paginação
-    paginator = Paginator(alunos, 20)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # Paginação por cursor: sem OFFSET nem COUNT (total estimado pelas estatísticas do banco)
+    paginador = PaginadorCursor(
+        Aluno.objects.all(), ('nome', 'pk'), 20, total=lambda: total_aproximado(Aluno), aproximado=True
+    )
+    page_obj = paginador.pagina(request.GET.get(PARAMETRO_CURSOR))
     
     context = {
         'page_obj': page_obj,
@@ -122,6 +341,7 @@ def gerenciar_alunos(request):
 
 
 @login_required
+@repetir_se_bloqueado
 def criar_aluno(request):
     """View para criar novo aluno"""
     if request.method == 'POST':
@@ -137,6 +357,7 @@ def criar_aluno(request):
 
 
 @login_required
+@repetir_se_bloqueado
 def editar_aluno(request, pk):
     """View para editar aluno"""
     aluno = get_object_or_404(Aluno, pk=pk)
@@ -154,6 +375,7 @@ def editar_aluno(request, pk):
 
 
 @login_required
+@repetir_se_bloqueado
 def deletar_aluno(request, pk):
     """View para deletar aluno"""
     aluno = get_object_or_404(Aluno, pk=pk)
@@ -169,17 +391,18 @@ def deletar_aluno(request, pk):
 @login_required
 def gerenciar_atividades(request):
     """View para gerenciar atividades"""
-    atividades = Atividade.objects.all().order_by('-data_criacao')
-    
-    # Paginação
-    paginator = Paginator(atividades, 20)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # Paginação por cursor: sem OFFSET nem COUNT (total estimado pelas estatísticas do banco)
+    paginador = PaginadorCursor(
+        Atividade.objects.all(), ('-data_criacao', '-pk'), 20,
+        total=lambda: total_aproximado(Atividade), aproximado=True,
+    )
+    page_obj = paginador.pagina(request.GET.get(PARAMETRO_CURSOR))
     
     return render(request, 'gamificacao/gerenciar_atividades.html', {'page_obj': page_obj})
 
 
 @login_required
+@repetir_se_bloqueado
 def criar_atividade(request):
     """View para criar nova atividade"""
     if request.method == 'POST':
@@ -195,6 +418,7 @@ def criar_atividade(request):
 
 
 @login_required
+@repetir_se_bloqueado
 def editar_atividade(request, pk):
     """View para editar atividade"""
     atividade = get_object_or_404(Atividade, pk=pk)
@@ -212,6 +436,7 @@ def editar_atividade(request, pk):
 
 
 @login_required
+@repetir_se_bloqueado
 def deletar_atividade(request, pk):
     """View para deletar atividade"""
     atividade = get_object_or_404(Atividade, pk=pk)
@@ -261,11 +486,17 @@ def gerenciar_notas(request, atividade_id=None):
         }
         return render(request, 'gamificacao/gerenciar_notas.html', context)
     else:
-        atividades = Atividade.objects.filter(ativa=True).order_by('-data_criacao')
+        # Média e quantidade de notas calculadas no banco, em vez de uma consulta por atividade
+        atividades = (
+            Atividade.objects.filter(ativa=True)
+            .annotate(media_notas=Avg('nota__valor'), qtd_notas=Count('nota'))
+            .order_by('-data_criacao')
+        )
         return render(request, 'gamificacao/selecionar_atividade.html', {'atividades': atividades})
 
 
 @login_required
+@repetir_se_bloqueado
 def lancar_nota(request, atividade_id, aluno_id=None):
     """View para lançar nova nota"""
     atividade = get_object_or_404(Atividade, pk=atividade_id)
@@ -285,7 +516,8 @@ def lancar_nota(request, atividade_id, aluno_id=None):
             nota = form.save(commit=False)
             nota.atividade = atividade
             nota.lancada_por = request.user
-            nota.save()
+            with transaction.atomic():
+                nota.save()
             
             messages.success(request, f'Nota lançada com sucesso para {nota.aluno.nome}!')
             return redirect('gerenciar_notas_atividade', atividade_id=atividade.id)
@@ -317,6 +549,7 @@ def lancar_nota_aluno(request, atividade_id, aluno_id):
 
 
 @login_required
+@repetir_se_bloqueado
 def editar_nota(request, atividade_id, aluno_id):
     """View para editar nota existente"""
     atividade = get_object_or_404(Atividade, pk=atividade_id)
@@ -329,17 +562,18 @@ def editar_nota(request, atividade_id, aluno_id):
         if form.is_valid():
             nova_nota = form.save(commit=False)
             
-            # Se o valor mudou, salvar histórico
-            if nova_nota.valor != valor_anterior:
-                HistoricoNota.objects.create(
-                    nota=nota,
-                    valor_anterior=valor_anterior,
-                    valor_novo=nova_nota.valor,
-                    motivo=request.POST.get('motivo_alteracao', 'Alteração via sistema'),
-                    usuario=request.user
-                )
-            
-            nova_nota.save()
+            with transaction.atomic():
+                # Se o valor mudou, salvar histórico
+                if nova_nota.valor != valor_anterior:
+                    HistoricoNota.objects.create(
+                        nota=nota,
+                        valor_anterior=valor_anterior,
+                        valor_novo=nova_nota.valor,
+                        motivo=request.POST.get('motivo_alteracao', 'Alteração via sistema'),
+                        usuario=request.user
+                    )
+                
+                nova_nota.save()
             messages.success(request, f'Nota de {aluno.nome} atualizada com sucesso!')
             return redirect('gerenciar_notas_atividade', atividade_id=atividade.id)
     else:
@@ -359,6 +593,83 @@ def editar_nota(request, atividade_id, aluno_id):
 
 
 @login_required
+@repetir_se_bloqueado
+def lancar_notas_grade(request, atividade_id):
+    """View para lançar as notas de todos os alunos ativos em uma atividade de uma só vez"""
+    atividade = get_object_or_404(Atividade, pk=atividade_id)
+    alunos = list(Aluno.objects.filter(ativo=True).only('id', 'nome', 'matricula').order_by('nome'))
+    notas_existentes = dict(
+        Nota.objects.filter(atividade=atividade).order_by().values_list('aluno_id', 'valor')
+    )
+    
+    if request.method == 'POST':
+        form = NotasGradeForm(
+            request.POST, atividade=atividade, alunos=alunos, notas_existentes=notas_existentes
+        )
+        if form.is_valid():
+            resumo = gravar_notas(
+                form.valores(),
+                usuario=request.user,
+                motivo=form.cleaned_data['motivo_alteracao'] or 'Alteração via grade de notas'
+            )
+            messages.success(
+                request,
+                f'Notas salvas: {resumo.inseridas} nova(s), {resumo.atualizadas} alterada(s) '
+                f'e {resumo.inalteradas} sem alteração.'
+            )
+            return redirect('gerenciar_notas_atividade', atividade_id=atividade.id)
+        messages.error(request, 'Corrija as notas destacadas; nenhuma nota foi salva.')
+    else:
+        form = NotasGradeForm(atividade=atividade, alunos=alunos, notas_existentes=notas_existentes)
+    
+    context = {
+        'form': form,
+        'atividade': atividade,
+    }
+    
+    return render(request, 'gamificacao/lancar_notas_grade.html', context)
+
+
+@login_required
+def importar_notas(request):
+    """View para importar notas de um arquivo CSV enviado pelo usuário"""
+    resumo = None
+    
+    if request.method == 'POST':
+        form = ImportarNotasForm(request.POST, request.FILES)
+        if form.is_valid():
+            # O upload é lido linha a linha, sem carregar o arquivo inteiro em memória
+            linhas = codecs.iterdecode(form.cleaned_data['arquivo'], 'utf-8-sig')
+            try:
+                resumo = importar_notas_csv(
+                    linhas,
+                    usuario=request.user,
+                    motivo=form.cleaned_data['motivo_alteracao'] or 'Importação de CSV',
+                    delimitador=form.cleaned_data['delimitador']
+                )
+            except ErroImportacao as erro:
+                messages.error(request, str(erro))
+            except UnicodeDecodeError:
+                messages.error(request, 'O arquivo não está codificado em UTF-8.')
+            else:
+                messages.success(
+                    request,
+                    f'Importação concluída: {resumo.inseridas} nova(s), {resumo.atualizadas} alterada(s), '
+                    f'{resumo.inalteradas} sem alteração e {resumo.total_erros} linha(s) com erro.'
+                )
+    else:
+        form = ImportarNotasForm()
+    
+    context = {
+        'form': form,
+        'resumo': resumo,
+    }
+    
+    return render(request, 'gamificacao/importar_notas.html', context)
+
+
+@login_required
+@repetir_se_bloqueado
 def deletar_nota(request, nota_id):
     """View para deletar nota"""
     nota = get_object_or_404(Nota, pk=nota_id)
@@ -375,7 +686,8 @@ def deletar_nota(request, nota_id):
         # )
         
         aluno_nome = nota.aluno.nome
-        nota.delete()
+        with transaction.atomic():
+            nota.delete()
         messages.success(request, f'Nota de {aluno_nome} excluída com sucesso!')
         return redirect('gerenciar_notas_atividade', atividade_id=atividade_id)
     
@@ -391,7 +703,7 @@ def deletar_nota(request, nota_id):
 def gerenciar_notas_atividade(request, atividade_id):
     """View para gerenciar notas de uma atividade específica"""
     atividade = get_object_or_404(Atividade, pk=atividade_id)
-    notas = Nota.objects.filter(atividade=atividade).select_related('aluno').order_by('-valor', 'aluno__nome')
+    notas = Nota.objects.filter(atividade=atividade).select_related('aluno', 'lancada_por').order_by('-valor', 'aluno__nome')
     
     # Buscar alunos que ainda não têm nota nesta atividade
     alunos_com_nota = notas.values_list('aluno_id', flat=True)
@@ -455,6 +767,7 @@ def gerenciar_presencas(request):
 
 
 @login_required
+@repetir_se_bloqueado
 def lancar_presenca(request):
     """View para lançar nova presença"""
     if request.method == 'POST':
@@ -462,7 +775,8 @@ def lancar_presenca(request):
         if form.is_valid():
             presenca = form.save(commit=False)
             presenca.lancada_por = request.user
-            presenca.save()
+            with transaction.atomic():
+                presenca.save()
             
             status = 'presente' if presenca.presente else 'faltou'
             messages.success(request, f'Presença de {presenca.aluno.nome} lançada com sucesso ({status})!')
@@ -480,6 +794,7 @@ def lancar_presenca(request):
 
 
 @login_required
+@repetir_se_bloqueado
 def editar_presenca(request, pk):
     """View para editar presença existente"""
     presenca = get_object_or_404(Presenca, pk=pk)
@@ -488,7 +803,8 @@ def editar_presenca(request, pk):
         form = PresencaForm(request.POST, instance=presenca)
         if form.is_valid():
             presenca = form.save(commit=False)
-            presenca.save()
+            with transaction.atomic():
+                presenca.save()
             
             status = 'presente' if presenca.presente else 'faltou'
             messages.success(request, f'Presença de {presenca.aluno.nome} atualizada com sucesso ({status})!')
@@ -507,6 +823,7 @@ def editar_presenca(request, pk):
 
 
 @login_required
+@repetir_se_bloqueado
 def deletar_presenca(request, pk):
     """View para deletar presença"""
     presenca = get_object_or_404(Presenca, pk=pk)
@@ -514,7 +831,8 @@ def deletar_presenca(request, pk):
     if request.method == 'POST':
         aluno_nome = presenca.aluno.nome
         data_presenca = presenca.data_presenca.strftime('%d/%m/%Y')
-        presenca.delete()
+        with transaction.atomic():
+            presenca.delete()
         messages.success(request, f'Presença de {aluno_nome} do dia {data_presenca} excluída com sucesso!')
         return redirect('gerenciar_presencas')
     
@@ -527,19 +845,22 @@ def deletar_presenca(request, pk):
 
 
 @login_required
+@repetir_se_bloqueado
 def lancar_presenca_multipla(request):
     """View para lançar presença de vários alunos de uma vez"""
-    from datetime import date
+    from datetime import date, datetime, time
     
     if request.method == 'POST':
         data_presenca = request.POST.get('data_presenca')
         alunos_selecionados = request.POST.getlist('alunos')
+        turma_completa = bool(request.POST.get('turma_completa'))
         
         if not data_presenca:
             messages.error(request, 'Data da presença é obrigatória!')
             return redirect('lancar_presenca_multipla')
             
-        if not alunos_selecionados:
+        # Na chamada da turma completa, nenhum selecionado significa que todos faltaram
+        if not alunos_selecionados and not turma_completa:
             messages.error(request, 'Selecione pelo menos um aluno!')
             return redirect('lancar_presenca_multipla')
         
@@ -549,32 +870,23 @@ def lancar_presenca_multipla(request):
             messages.error(request, 'Data inválida!')
             return redirect('lancar_presenca_multipla')
         
-        # Lançar presenças
-        count = 0
-        for aluno_id in alunos_selecionados:
-            try:
-                aluno = Aluno.objects.get(id=aluno_id, ativo=True)
-                # Verificar se já existe presença para este aluno nesta data
-                if not Presenca.objects.filter(aluno=aluno, data_presenca=data_obj).exists():
-                    Presenca.objects.create(
-                        aluno=aluno,
-                        data_presenca=data_obj,
-                        presente=True,
-                        lancada_por=request.user
-                    )
-                    count += 1
-            except Aluno.DoesNotExist:
-                continue
+        # Lançar presenças (um único upsert para todos os alunos)
+        alunos_ids = [aluno_id for aluno_id in alunos_selecionados if aluno_id.isdigit()]
+        resumo = lancar_presencas_turma(data_obj, alunos_ids, request.user, turma_completa=turma_completa)
         
-        if count > 0:
-            messages.success(request, f'Presença lançada para {count} aluno(s) com sucesso!')
+        if resumo.inseridas or resumo.atualizadas:
+            messages.success(
+                request,
+                f'Presenças registradas: {resumo.inseridas} nova(s), {resumo.atualizadas} atualizada(s) '
+                f'e {resumo.inalteradas} sem alteração.'
+            )
         else:
             messages.warning(request, 'Nenhuma presença foi lançada (já existiam registros para a data selecionada).')
             
         return redirect('gerenciar_presencas')
     
     # GET - mostrar formulário
-    alunos = Aluno.objects.filter(ativo=True).order_by('nome')
+    alunos = Aluno.objects.filter(ativo=True).select_related('pontuacao').order_by('nome')
     data_hoje = date.today().strftime('%Y-%m-%d')
     
     context = {
@@ -587,47 +899,44 @@ def lancar_presenca_multipla(request):
 
 # ==================== VIEWS DE GRUPOS ====================
 
-@login_required
-def gerenciar_grupos(request):
-    """View para listar todos os grupos"""
-    grupos = Grupo.objects.filter(ativo=True).order_by('nome')
+def _montar_grupos_info():
+    """Monta o ranking interno de cada grupo ativo (resultado guardado no cache do ranking)"""
+    grupos = Grupo.objects.filter(ativo=True).select_related('lider').order_by('nome')
     
-    # Adicionar informações extras para cada grupo
-    grupos_info = []
-    for grupo in grupos:
-        membros = grupo.membros.select_related('aluno').all()
-        ranking = []
-        
-        for i, membro in enumerate(membros):
-            aluno = membro.aluno
-            ranking.append({
-                'posicao': i + 1,
-                'aluno': aluno,
-                'pontuacao': float(aluno.pontuacao_total)
-            })
-        
-        # Ordenar por pontuação
-        ranking.sort(key=lambda x: (-x['pontuacao'], x['aluno'].nome))
-        
-        # Reajustar posições após ordenação
-        for i, item in enumerate(ranking):
-            item['posicao'] = i + 1
-        
-        grupos_info.append({
+    # Membros, pontuações e médias de todos os grupos em um único cálculo em lote
+    return [
+        {
             'grupo': grupo,
-            'ranking': ranking,
-            'total_membros': len(ranking),
+            'ranking': grupo.ranking_membros,
+            'total_membros': len(grupo.ranking_membros),
             'media_grupo': grupo.media_grupo
-        })
-    
+        }
+        for grupo in carregar_rankings(grupos)
+    ]
+
+
+@login_required
+def gerenciar_grupos(request):
+    """View para listar todos os grupos"""
     context = {
-        'grupos_info': grupos_info,
+        'grupos_info': obter_do_cache('grupos', _montar_grupos_info),
     }
     
     return render(request, 'gamificacao/gerenciar_grupos.html', context)
 
 
 @login_required
+def ranking_grupos(request):
+    """View para a competição entre grupos (lida dos totais materializados)"""
+    context = {
+        'ranking': ranking_grupos_materializado(),
+    }
+    
+    return render(request, 'gamificacao/ranking_grupos.html', context)
+
+
+@login_required
+@repetir_se_bloqueado
 def criar_grupo(request):
     """View para criar um novo grupo"""
     if request.method == 'POST':
@@ -650,6 +959,7 @@ def criar_grupo(request):
 
 
 @login_required
+@repetir_se_bloqueado
 def editar_grupo(request, grupo_id):
     """View para editar um grupo"""
     grupo = get_object_or_404(Grupo, id=grupo_id)
@@ -673,6 +983,7 @@ def editar_grupo(request, grupo_id):
 
 
 @login_required
+@repetir_se_bloqueado
 def deletar_grupo(request, grupo_id):
     """View para deletar um grupo"""
     grupo = get_object_or_404(Grupo, id=grupo_id)
@@ -694,9 +1005,10 @@ def deletar_grupo(request, grupo_id):
 
 
 @login_required
+@repetir_se_bloqueado
 def adicionar_membros(request, grupo_id):
     """View para adicionar alunos ao grupo"""
-    grupo = get_object_or_404(Grupo, id=grupo_id)
+    grupo = get_object_or_404(Grupo.objects.select_related('lider'), id=grupo_id)
     
     if request.method == 'POST':
         form = AdicionarMembrosForm(request.POST, grupo=grupo)
@@ -706,16 +1018,8 @@ def adicionar_membros(request, grupo_id):
         if form.is_valid():
             alunos_selecionados = form.cleaned_data['alunos']
             lider_escolhido = form.cleaned_data.get('lider')
-            adicionados = 0
-            
-            for aluno in alunos_selecionados:
-                membro, created = MembroGrupo.objects.get_or_create(
-                    grupo=grupo,
-                    aluno=aluno,
-                    defaults={'adicionado_por': request.user}
-                )
-                if created:
-                    adicionados += 1
+            # Um INSERT para todos e um único recálculo dos totais do grupo
+            adicionados = incluir_membros(grupo, alunos_selecionados, usuario=request.user)
             
             # Definir líder se foi escolhido
             if lider_escolhido:
@@ -737,6 +1041,7 @@ def adicionar_membros(request, grupo_id):
     context = {
         'form': form,
         'grupo': grupo,
+        'membros': grupo.membros.select_related('aluno__pontuacao'),
         'titulo': f'Adicionar Membros ao Grupo: {grupo.nome}'
     }
     
@@ -744,6 +1049,7 @@ def adicionar_membros(request, grupo_id):
 
 
 @login_required
+@repetir_se_bloqueado(metodos=None)
 def remover_membro(request, grupo_id, aluno_id):
     """View para remover um aluno do grupo"""
     grupo = get_object_or_404(Grupo, id=grupo_id)
@@ -766,7 +1072,7 @@ def remover_membro(request, grupo_id, aluno_id):
 def caca_niquel_interface(request):
     """Interface principal do caça-níquel"""
     context = {
-        'alunos': Aluno.objects.all(),
+        'alunos': pontuacoes_em_cache().values(),
         'recompensas_recentes': CacaNiquel.objects.select_related('aluno')[:10],
     }
     return render(request, 'gamificacao/caca_niquel.html', context)
@@ -775,6 +1081,7 @@ def caca_niquel_interface(request):
 @login_required 
 @require_http_methods(["POST"])
 @csrf_exempt
+@repetir_se_bloqueado(resposta_json=True)
 def jogar_caca_niquel(request):
     """Processa uma jogada do caça-níquel"""
     # Verificar se está autenticado
@@ -791,59 +1098,18 @@ def jogar_caca_niquel(request):
         except Aluno.DoesNotExist:
             return JsonResponse({'erro': 'Aluno não encontrado'}, status=404)
         
-        # Sistema de probabilidades
-        recompensas_probabilidade = [
-            ('salgado', 50),      # 50% chance
-            ('doce', 35),         # 35% chance  
-            ('vale_trabalho', 8), # 8% chance
-            ('5_reais', 5),       # 5% chance
-            ('10_reais', 2),      # 2% chance
-        ]
-        
-        # Gerar número aleatório de 1-100
-        numero_sorteado = random.randint(1, 100)
-        
-        # Determinar recompensa baseada na probabilidade
-        acumulado = 0
-        recompensa_ganha = 'salgado'  # fallback
-        
-        for recompensa, chance in recompensas_probabilidade:
-            acumulado += chance
-            if numero_sorteado <= acumulado:
-                recompensa_ganha = recompensa
-                break
-        
-        # Salvar no banco de dados
-        jogada = CacaNiquel.objects.create(
-            aluno=aluno,
-            recompensa=recompensa_ganha
-        )
-        
-        # Retornar resultado
-        recompensas_display = {
-            '10_reais': {'emoji': '💰', 'texto': 'R$ 10,00', 'classe': 'premio-dourado'},
-            '5_reais': {'emoji': '💵', 'texto': 'R$ 5,00', 'classe': 'premio-prata'},
-            'vale_trabalho': {'emoji': '📝', 'texto': 'Vale-trabalho', 'classe': 'premio-bronze'},
-            'doce': {'emoji': '🍭', 'texto': 'Doce', 'classe': 'premio-comum'},
-            'salgado': {'emoji': '🥨', 'texto': 'Salgado', 'classe': 'premio-comum'},
-        }
-        
-        resultado = recompensas_display.get(recompensa_ganha, recompensas_display['salgado'])
+        # Sorteio pela tabela de prêmios compilada em memória
+        try:
+            resultado, = jogar([aluno])
+        except SemPremiosAtivos as erro:
+            return JsonResponse({'erro': str(erro)}, status=503)
         
-        return JsonResponse({
-            'sucesso': True,
-            'aluno': aluno.nome,
-            'recompensa': {
-                'tipo': recompensa_ganha,
-                'emoji': resultado['emoji'],
-                'texto': resultado['texto'],
-                'classe': resultado['classe']
-            },
-            'numero_sorteado': numero_sorteado,
-            'jogada_id': jogada.id
-        })
+        return JsonResponse({'sucesso': True, **resultado})
         
     except Exception as e:
+        if banco_bloqueado(e):
+            # Tratado (com nova tentativa) por repetir_se_bloqueado
+            raise
         # Log do erro para debug
         import logging
         logger = logging.getLogger(__name__)
@@ -855,60 +1121,126 @@ def jogar_caca_niquel(request):
 
 
 @login_required
-def historico_caca_niquel(request):
-    """Página com histórico de jogadas do caça-níquel"""
-    jogadas = CacaNiquel.objects.select_related('aluno').order_by('-data_jogada')
+@require_http_methods(["POST"])
+@repetir_se_bloqueado(resposta_json=True)
+def jogar_caca_niquel_lote(request):
+    """Processa várias jogadas do caça-níquel (ex.: a turma inteira) em uma requisição"""
+    if request.content_type == 'application/json':
+        try:
+            aluno_ids = json.loads(request.body).get('aluno_ids', [])
+        except (ValueError, AttributeError):
+            return JsonResponse({'erro': 'JSON inválido'}, status=400)
+    else:
+        aluno_ids = request.POST.getlist('aluno_ids')
     
-    # Paginação
-    paginator = Paginator(jogadas, 20)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    try:
+        aluno_ids = [int(aluno_id) for aluno_id in aluno_ids]
+    except (TypeError, ValueError):
+        return JsonResponse({'erro': 'Identificadores de aluno inválidos'}, status=400)
+    
+    if not aluno_ids:
+        return JsonResponse({'erro': 'Nenhum aluno selecionado'}, status=400)
+    if len(aluno_ids) > LIMITE_JOGADAS_LOTE:
+        return JsonResponse(
+            {'erro': f'No máximo {LIMITE_JOGADAS_LOTE} jogadas por lote'}, status=400
+        )
     
-    # Estatísticas
-    total_jogadas = CacaNiquel.objects.count()
-    premios_resgatados = CacaNiquel.objects.filter(resgatado=True).count()
-    premios_pendentes = CacaNiquel.objects.filter(resgatado=False).count()
-    
-    # Estatísticas por tipo de recompensa
-    from django.db.models import Count
-    stats_recompensas = (
-        CacaNiquel.objects
-        .values('recompensa')
-        .annotate(quantidade=Count('recompensa'))
-        .order_by('-quantidade')
-    )
+    alunos = Aluno.objects.only('id', 'nome').in_bulk(set(aluno_ids))
+    nao_encontrados = sorted(set(aluno_ids) - alunos.keys())
+    if nao_encontrados:
+        return JsonResponse(
+            {'erro': 'Aluno(s) não encontrado(s)', 'aluno_ids': nao_encontrados}, status=404
+        )
+    
+    try:
+        jogadas = jogar([alunos[aluno_id] for aluno_id in aluno_ids])
+    except SemPremiosAtivos as erro:
+        return JsonResponse({'erro': str(erro)}, status=503)
+    
+    return JsonResponse({
+        'sucesso': True,
+        'total': len(jogadas),
+        'resumo': Counter(jogada['recompensa']['tipo'] for jogada in jogadas),
+        'jogadas': jogadas,
+    })
+
+
+@login_required
+async def historico_caca_niquel(request):
+    """Página com histórico de jogadas do caça-níquel"""
+    request.user = await _usuario_carregado(request)
+    
+    # Estatísticas lidas dos totais diários (uma linha por dia e recompensa, não por
+    # jogada); a página de jogadas (por cursor) não depende do total (concorrencia.py)
+    consultas = consultas_historico(request.GET.get(PARAMETRO_CURSOR))
+    resultados = await consultas_independentes(request, **consultas)
+    tabela, por_recompensa, serie = resultados['tabela'], resultados['por_recompensa'], resultados['serie']
+    total_jogadas = sum(totais.jogadas for totais in por_recompensa)
+    premios_resgatados = sum(totais.resgatados for totais in por_recompensa)
+    stats_recompensas = [
+        {
+            'recompensa': totais.chave,
+            'quantidade': totais.jogadas,
+            'valor': totais.valor,
+            'premio': tabela.premio(totais.chave),
+        }
+        for totais in por_recompensa
+    ]
+    
+    # O total da paginação já veio dos totais diários: sem COUNT sobre as jogadas
+    page_obj = resultados['pagina']
+    page_obj.total = total_jogadas
     
     context = {
         'page_obj': page_obj,
         'total_jogadas': total_jogadas,
         'premios_resgatados': premios_resgatados,
-        'premios_pendentes': premios_pendentes,
+        'premios_pendentes': total_jogadas - premios_resgatados,
+        'valor_total': sum((totais.valor for totais in por_recompensa), Decimal('0')),
         'stats_recompensas': stats_recompensas,
+        'serie_diaria': serie,
+        'maximo_diario': max(totais.jogadas for totais in serie) or 1,
     }
     
-    return render(request, 'gamificacao/historico_caca_niquel.html', context)
+    return await sync_to_async(render)(request, 'gamificacao/historico_caca_niquel.html', context)
 
 
 @login_required
 @require_http_methods(["POST"])
+@repetir_se_bloqueado(resposta_json=True)
 def marcar_resgatado(request, jogada_id):
     """Marca uma recompensa como resgatada"""
+    # UPDATE condicional: um prêmio já resgatado não é alterado de novo
+    if not resgatar(request.user, jogada_ids=[jogada_id]):
+        return JsonResponse({'erro': 'Jogada não encontrada ou já resgatada'}, status=404)
+    
+    messages.success(request, 'Recompensa marcada como resgatada!')
+    return JsonResponse({'sucesso': True})
+
+
+@login_required
+@require_http_methods(["POST"])
+@repetir_se_bloqueado(resposta_json=True)
+def resgatar_premios(request):
+    """Marca como resgatados os prêmios selecionados ou todos os pendentes de um aluno"""
     try:
-        jogada = CacaNiquel.objects.get(id=jogada_id)
-        jogada.resgatado = True
-        jogada.data_resgate = timezone.now()
-        jogada.resgatado_por = request.user
-        jogada.save()
-        
-        messages.success(request, f'Recompensa de {jogada.aluno.nome} marcada como resgatada!')
-        return JsonResponse({'sucesso': True})
-        
-    except CacaNiquel.DoesNotExist:
-        return JsonResponse({'erro': 'Jogada não encontrada'}, status=404)
+        jogada_ids = [int(jogada_id) for jogada_id in request.POST.getlist('jogada_ids')] or None
+        aluno_id = int(request.POST['aluno_id']) if request.POST.get('aluno_id') else None
+    except ValueError:
+        return JsonResponse({'erro': 'Identificadores inválidos'}, status=400)
+    
+    if jogada_ids is None and aluno_id is None:
+        return JsonResponse({'erro': 'Nenhum prêmio selecionado'}, status=400)
+    
+    resgatados = resgatar(request.user, jogada_ids=jogada_ids, aluno_id=aluno_id)
+    if resgatados:
+        messages.success(request, f'{resgatados} prêmio(s) marcado(s) como resgatado(s)!')
+    return JsonResponse({'sucesso': True, 'resgatados': resgatados})
 
 
 @login_required  
 @require_http_methods(["POST"])
+@repetir_se_bloqueado(resposta_json=True)
 def excluir_premio(request, jogada_id):
     """Exclui um prêmio permanentemente"""
     try:
@@ -936,26 +1268,33 @@ def excluir_premio(request, jogada_id):
     except CacaNiquel.DoesNotExist:
         return JsonResponse({'erro': 'Prêmio não encontrado ou já resgatado'}, status=404)
     except Exception as e:
+        if banco_bloqueado(e):
+            raise
         return JsonResponse({'erro': f'Erro interno: {str(e)}'}, status=500)
 
 
 @login_required
-def premios_pendentes(request):
+async def premios_pendentes(request):
     """Lista de prêmios ainda não resgatados"""
-    premios = CacaNiquel.objects.filter(resgatado=False).select_related('aluno').order_by('-data_jogada')
-    
-    # Calcular totais por tipo de prêmio
-    total_10_reais = premios.filter(recompensa='10_reais').count()
-    total_5_reais = premios.filter(recompensa='5_reais').count()
-    total_vale_trabalho = premios.filter(recompensa='vale_trabalho').count()
-    total_lanches = premios.filter(recompensa__in=['doce', 'salgado']).count()
+    request.user = await _usuario_carregado(request)
+    numero = numero_pagina(request.GET.get('page'))
+    
+    # Totais (geral e por prêmio, uma única consulta) e a página, leituras independentes
+    premios, consultas = consultas_pendentes(numero)
+    resultados = await consultas_independentes(request, **consultas)
+    total_pendentes, valor_pendente, resumo = resultados['resumo']
+    ultima = ultima_pagina(total_pendentes, PREMIOS_POR_PAGINA)
+    if numero > ultima:
+        # A página (vazia) foi lida junto com o total: redireciona em vez de reler a última
+        return redirect(f'{request.path}?page={ultima}')
+    # O total já veio do aggregate: evita o COUNT do paginador
+    page_obj = montar_pagina(premios, PREMIOS_POR_PAGINA, total_pendentes, numero, resultados['itens'])
     
     context = {
-        'premios': premios,
-        'total_10_reais': total_10_reais,
-        'total_5_reais': total_5_reais,
-        'total_vale_trabalho': total_vale_trabalho,
-        'total_lanches': total_lanches,
+        'page_obj': page_obj,
+        'total_pendentes': total_pendentes,
+        'valor_pendente': valor_pendente,
+        'resumo': [item for item in resumo if item[1]],
     }
     
-    return render(request, 'gamificacao/premios_pendentes.html', context)
+    return await sync_to_async(render)(request, 'gamificacao/premios_pendentes.html', context)
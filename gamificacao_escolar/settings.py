@@ -42,6 +42,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'gamificacao.middleware.OrcamentoConsultasMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -81,6 +82,102 @@ DATABASES = {
     }
 }
 
+# Perfil de produção do SQLite (DJANGO_SQLITE_PRODUCAO=1), para vários professores
+# lançando notas ao mesmo tempo em que o projetor atualiza o ranking e os alunos
+# jogam o caça-níquel:
+# - WAL: leituras não bloqueiam a escrita (nem a escrita bloqueia as leituras);
+# - synchronous=NORMAL: seguro com WAL e bem mais rápido que FULL;
+# - busy_timeout: quem encontra o banco ocupado espera até 5 s pelo lock em vez
+#   de falhar na hora com "database is locked";
+# - transaction_mode IMMEDIATE: a transação pede o lock de escrita já no BEGIN,
+#   evitando o erro sem espera ao promover uma leitura a escrita;
+# - conexões persistentes (CONN_MAX_AGE), com verificação antes do reuso.
+# Fica desligado por padrão: o modo WAL é gravado no próprio arquivo do banco (e
+# cria os arquivos -wal/-shm ao lado dele), e o desenvolvimento e os testes não
+# precisam disso. As views de escrita repetem a transação se o lock não vier a
+# tempo (gamificacao/banco.py) com ou sem o perfil. Manutenção periódica:
+# manage.py manutencao_banco.
+
+if os.environ.get('DJANGO_SQLITE_PRODUCAO') == '1':
+    DATABASES['default'].update({
+        'CONN_MAX_AGE': int(os.environ.get('DJANGO_CONN_MAX_AGE', 600)),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'transaction_mode': 'IMMEDIATE',
+            'init_command': (
+                'PRAGMA journal_mode=WAL;'
+                'PRAGMA synchronous=NORMAL;'
+                'PRAGMA busy_timeout=5000;'
+                'PRAGMA temp_store=MEMORY;'
+                'PRAGMA cache_size=-20000;'
+            ),
+        },
+    })
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# O ranking é guardado em cache com invalidação por versão (gamificacao/cache_ranking.py).
+# A versão, o lock de recálculo e os validadores dos GETs condicionais precisam valer
+# para todos os processos (workers do gunicorn/uvicorn): um cache em memória ficaria
+# preso a um processo, e os demais serviriam o ranking antigo (e 304 sobre ele) até o
+# fim do TTL. O lock (um único recálculo por falta) e os contadores dependem de
+# ``add`` e ``incr`` atômicos, que o FileBasedCache do Django não garante. Por isso o
+# padrão é um cache em arquivos com essas duas operações sob lock de arquivo
+# (gamificacao/cache_arquivos.py), compartilhado pelos processos da mesma máquina sem
+# nenhum serviço extra. Com servidores em várias máquinas, use Redis ou Memcached.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'gamificacao.cache_arquivos.CacheArquivosAtomico',
+        'LOCATION': os.environ.get('DJANGO_CACHE_DIR', BASE_DIR / 'cache'),
+        'OPTIONS': {
+            'MAX_ENTRIES': 1000,
+        },
+    }
+}
+
+# Orçamento de consultas por view (gamificacao/middleware.py)
+# Chave: nome da URL; valor: máximo de consultas SQL por requisição GET (inclui sessão e usuário).
+# Views sem orçamento só passam pela detecção de N+1.
+
+GAMIFICACAO_ORCAMENTO_CONSULTAS = {
+    'dashboard': 8,
+    'ranking_json': 8,
+    'posicao_aluno_ranking': 4,
+    'historico_notas': 6,
+    'historico_notas_fragmento': 5,
+    'gerenciar_alunos': 5,
+    'gerenciar_atividades': 5,
+    'gerenciar_notas': 4,
+    'gerenciar_notas_atividade': 7,
+    'lancar_notas_grade': 5,
+    'importar_notas': 2,
+    'exportar_ranking': 2,
+    'exportar_notas': 2,
+    'exportar_presencas': 2,
+    'gerenciar_presencas': 7,
+    'lancar_presenca_multipla': 4,
+    'gerenciar_grupos': 6,
+    'editar_grupo': 6,
+    'ranking_grupos': 3,
+    'adicionar_membros': 8,
+    'caca_niquel': 4,
+    'historico_caca_niquel': 7,
+    'premios_pendentes': 4,
+}
+
+# Quantas execuções do mesmo SQL (a menos dos parâmetros) caracterizam um N+1
+GAMIFICACAO_LIMITE_REPETICOES = 5
+
+# Em testes, use True para que estouros de orçamento levantem exceção em vez de só gerar log
+GAMIFICACAO_ORCAMENTO_ESTRITO = False
+
+# Leituras independentes das views assíncronas (dashboard, histórico e prêmios pendentes
+# do caça-níquel) em threads próprias sob ASGI (gamificacao/concorrencia.py). Desligado:
+# cada thread mantém uma conexão a mais, e só compensa com várias CPUs; compare antes
+# com manage.py bench_consultas_paralelas.
+GAMIFICACAO_CONSULTAS_PARALELAS = False
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -155,6 +155,129 @@ function configurarFiltros() {
     }
 }
 
+// Atualização automática do ranking (dashboard)
+// Com servidor ASGI, recebe as mudanças ao vivo (Server-Sent Events) e
+// atualiza só as linhas alteradas. Sem ele, consulta o ranking em JSON com
+// If-None-Match: enquanto nada mudar, o servidor responde 304 sem corpo;
+// quando muda, a página é recarregada.
+const INTERVALO_ATUALIZACAO_RANKING = 15000; // 15 segundos
+
+function configurarAtualizacaoRanking() {
+    const polling = document.getElementById('ranking-polling');
+    if (!polling) {
+        return;
+    }
+    
+    if (window.EventSource && polling.dataset.eventos) {
+        const eventos = new EventSource(polling.dataset.eventos);
+        eventos.addEventListener('ranking', (evento) => {
+            const dados = JSON.parse(evento.data);
+            aplicarLinhasRanking(polling, dados.linhas, [], true);
+        });
+        eventos.addEventListener('delta', (evento) => {
+            const dados = JSON.parse(evento.data);
+            aplicarLinhasRanking(polling, dados.alteradas, dados.removidas, false);
+        });
+        eventos.addEventListener('error', () => {
+            // Fechado de vez (ex.: 503 sob WSGI): volta ao polling; senão o navegador reconecta sozinho
+            if (eventos.readyState === EventSource.CLOSED) {
+                iniciarPollingRanking(polling);
+            }
+        });
+        return;
+    }
+    
+    iniciarPollingRanking(polling);
+}
+
+function iniciarPollingRanking(polling) {
+    let etag = polling.dataset.etag;
+    const inputBusca = document.getElementById('busca-tabela');
+    
+    setInterval(async () => {
+        // Aba em segundo plano ou busca em andamento: não atualiza
+        if (document.hidden || (inputBusca && inputBusca.value)) {
+            return;
+        }
+        try {
+            const resposta = await fetch(polling.dataset.url, {
+                cache: 'no-store',
+                credentials: 'same-origin',
+                headers: etag ? { 'If-None-Match': etag } : {}
+            });
+            if (resposta.status === 200) {
+                etag = resposta.headers.get('ETag') || etag;
+                window.location.reload();
+            }
+        } catch (erro) {
+            console.warn('Falha ao consultar o ranking:', erro);
+        }
+    }, INTERVALO_ATUALIZACAO_RANKING);
+}
+
+function badgePosicao(posicao) {
+    const icones = { 1: 'fa-crown', 2: 'fa-medal', 3: 'fa-award' };
+    if (icones[posicao]) {
+        return `<span class="ranking-badge ranking-${posicao}"><i class="fas ${icones[posicao]} me-2"></i>${posicao}º</span>`;
+    }
+    return `<span class="ranking-badge ranking-outros">${posicao}º</span>`;
+}
+
+function corNota(nota) {
+    if (nota >= 8) return 'var(--cor-success)';
+    if (nota >= 6) return 'var(--cor-accent)';
+    return 'var(--cor-danger)';
+}
+
+function formatarDecimal(valor) {
+    return valor.toLocaleString('pt-BR', { minimumFractionDigits: 1, maximumFractionDigits: 1 });
+}
+
+// Atualiza as linhas recebidas do ranking ao vivo e reordena a tabela
+function aplicarLinhasRanking(polling, linhas, removidas, completo) {
+    const tbody = document.querySelector('#tabela-ranking tbody');
+    if (!tbody) {
+        return;
+    }
+    // No modo top só as primeiras posições ficam na tabela
+    const limite = parseInt(polling.dataset.limite, 10) || Infinity;
+    const recebidos = new Set();
+    let recarregar = false;
+    
+    linhas.forEach(linha => {
+        recebidos.add(String(linha.aluno_id));
+        const tr = tbody.querySelector(`tr[data-aluno-id="${linha.aluno_id}"]`);
+        if (!tr) {
+            // Aluno que ainda não está na página: a linha completa vem do servidor
+            recarregar = recarregar || linha.posicao <= limite;
+            return;
+        }
+        tr.dataset.posicao = linha.posicao;
+        tr.classList.toggle('table-warning', linha.posicao <= 3);
+        tr.querySelector('[data-campo="posicao"]').innerHTML = badgePosicao(linha.posicao);
+        const nota = tr.querySelector('[data-campo="nota_media"]');
+        nota.textContent = formatarDecimal(linha.nota_media);
+        nota.style.color = corNota(linha.nota_media);
+        tr.querySelector('[data-campo="total_atividades"]').textContent = linha.total_atividades;
+        tr.querySelector('[data-campo="pontuacao_total"]').textContent = formatarDecimal(linha.pontuacao_total);
+    });
+    
+    tbody.querySelectorAll('tr[data-aluno-id]').forEach(tr => {
+        const saiu = completo ? !recebidos.has(tr.dataset.alunoId) : removidas.includes(Number(tr.dataset.alunoId));
+        if (saiu || Number(tr.dataset.posicao) > limite) {
+            tr.remove();
+        }
+    });
+    
+    if (recarregar) {
+        window.location.reload();
+        return;
+    }
+    Array.from(tbody.querySelectorAll('tr[data-aluno-id]'))
+        .sort((a, b) => Number(a.dataset.posicao) - Number(b.dataset.posicao))
+        .forEach(tr => tbody.appendChild(tr));
+}
+
 // Tooltips dinâmicos
 function configurarTooltips() {
     const tooltipTriggerList = [].slice.call(document.querySelectorAll('[data-bs-toggle="tooltip"]'));
@@ -243,6 +366,7 @@ document.addEventListener('DOMContentLoaded', function() {
     animarElementos();
     iniciarContador();
     configurarFiltros();
+    configurarAtualizacaoRanking();
     configurarTooltips();
     configurarConfirmacoes();
     configurarAutoHideAlerts();